@@ -1,14 +1,54 @@
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+import logging
 from .tracer import Tracer
 from .policy import PolicyEngine
 
+logger = logging.getLogger(__name__)
+
 class EnforcementError(Exception):
     pass
 
 class Enforcer:
-    def __init__(self, tracer: Tracer, policy: Optional[PolicyEngine] = None):
+    def __init__(
+        self,
+        tracer: Tracer,
+        policy: Optional[PolicyEngine] = None,
+        record_in_background: bool = True,
+    ):
         self.tracer = tracer
         self.policy = policy or PolicyEngine()
+        # Traces are recorded on one worker thread (in call order) so guarded calls never
+        # wait on ingest; flush() waits for them and raises the first that failed
+        self._recorder = ThreadPoolExecutor(max_workers=1) if record_in_background else None
+        self._pending: List[Future] = []
+
+    def _record(
+        self,
+        tool_name: str,
+        args: Dict[str, Any],
+        result: Any = None,
+        error: Optional[str] = None,
+    ) -> None:
+        if self._recorder is None:
+            self.tracer.tool(tool_name, args, result=result, error=error)
+            return
+        # Failed recordings stay until flush() reports them
+        self._pending = [f for f in self._pending if not f.done() or f.exception() is not None]
+        future = self._recorder.submit(self.tracer.tool, tool_name, args, result, error)
+        future.add_done_callback(_log_failure)
+        self._pending.append(future)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """
+        Wait until every trace recorded so far has been sent. Re-raises the first error a
+        background recording hit since the last flush (each one is also logged).
+        """
+        wait(self._pending, timeout=timeout)
+        failed = [f for f in self._pending if f.done() and f.exception() is not None]
+        self._pending = [f for f in self._pending if not f.done()]
+        if failed:
+            raise failed[0].exception()
 
     def guard_and_call(
         self,
@@ -18,13 +58,14 @@ class Enforcer:
         preview_payload: Optional[Dict[str, Any]] = None,
     ) -> Any:
         """
-        - Emits a pre-call tool trace to get a decision from the API.
-        - If block: emits a blocked tool trace and raises EnforcementError.
-        - If warn: emits a warned tool trace, proceeds with call, and logs result.
-        - If allow: proceeds and logs result.
+        - Asks the API for a pre-call decision with a stateless verify (nothing stored).
+        - If block: records a blocked tool trace and raises EnforcementError.
+        - If warn/allow: proceeds with the call and records its outcome.
+        Traces are recorded after the decision, in the background unless
+        record_in_background=False.
         """
-        # Send a pre-call trace so the API (StaticVerifier) returns decision + reasons
-        verdict = self.tracer.tool(tool_name, args, result=None)
+        # Decision-only mode answers at the first blocking rule
+        verdict = self.tracer.client.verify({"tool": tool_name, "args": args}, mode="decision")
         decision = verdict.get("decision", "allow")
         reasons = verdict.get("reasons", [])
 
@@ -34,17 +75,38 @@ class Enforcer:
             agg = decision
 
         if agg == "block":
-            # Log explicit block trace for observability and raise
-            self.tracer.tool(tool_name, args, result=None, error="blocked by policy")
+            # Record an explicit block trace for observability and raise
+            self._record(tool_name, args, error="blocked by policy")
             raise EnforcementError(f"Tool '{tool_name}' blocked by policy: {reasons}")
 
         # Proceed with call for warn/allow
         try:
             result = call_fn()
-            # Log the outcome
-            self.tracer.tool(tool_name, args, result=result)
-            return result
         except Exception as e:
-            # Log error outcome
-            self.tracer.tool(tool_name, args, result=None, error=str(e))
-            raise
\ No newline at end of file
+            # Record error outcome
+            self._record(tool_name, args, error=str(e))
+            raise
+        # Record the outcome
+        self._record(tool_name, args, result=result)
+        return result
+
+    def guard_stream(
+        self,
+        chunks: Iterable[str],
+        extra: Optional[Dict[str, Any]] = None,
+        min_chars: int = 64,
+    ) -> Iterator[str]:
+        """
+        Yield a streamed assistant reply chunk by chunk as it passes verification.
+        Raises EnforcementError as soon as a block rule fires; the source iterator is
+        closed so generation stops early.
+        """
+        stream = self.tracer.assistant_stream(chunks, extra=extra, min_chars=min_chars)
+        yield from stream
+        if stream.blocked:
+            raise EnforcementError(f"Assistant output blocked by policy: {stream.verdict.get('reasons', [])}")
+
+def _log_failure(future: Future) -> None:
+    error = future.exception()
+    if error is not None:
+        logger.warning("Recording a tool trace failed: %r", error)
@@ -1,8 +1,28 @@
 import os
 import json
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 import requests
 
+# orjson is optional: several times faster on large tool args, stdlib json otherwise
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+def _dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # e.g. integers beyond 64 bits: let json encode them
+            pass
+    return json.dumps(obj).encode()
+
+def _loads(resp: requests.Response) -> Any:
+    if orjson is not None:
+        return orjson.loads(resp.content)
+    return resp.json()
+
 class AgentSentryClient:
     def __init__(
         self,
@@ -10,17 +30,23 @@ class AgentSentryClient:
         api_key: Optional[str] = None,
         session_id: Optional[str] = None,
         timeout: float = 10.0,
+        lean: bool = False,
     ):
         # Base URL of the AgentSentry API, default local dev
         self.base_url = base_url or os.getenv("AGENTSENTRY_API_URL", "http://localhost:8000")
         self.api_key = api_key or os.getenv("AGENTSENTRY_API_KEY")
         self.session_id = session_id
         self.timeout = timeout
+        # Opt in to ingest responses without the echoed content (the caller already has it)
+        self.lean = lean
         self._session = requests.Session()
         if self.api_key:
             self._session.headers.update({"Authorization": f"Bearer {self.api_key}"})
         self._session.headers.update({"Content-Type": "application/json"})
 
+    def _ingest_params(self) -> Dict[str, str]:
+        return {"lean": "true"} if self.lean else {}
+
     def set_session(self, session_id: str):
         self.session_id = session_id
 
@@ -28,17 +54,82 @@ class AgentSentryClient:
         url = f"{self.base_url}/sessions"
         resp = self._session.post(url, timeout=self.timeout)
         resp.raise_for_status()
-        data = resp.json()
+        data = _loads(resp)
         sid = data["id"]
         self.session_id = sid
         return sid
 
-    def send_trace(self, role: str, content: Dict[str, Any], session_id: Optional[str] = None) -> Dict[str, Any]:
+    def send_trace(
+        self,
+        role: str,
+        content: Dict[str, Any],
+        session_id: Optional[str] = None,
+        mode: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Record a trace and return its verdict. With mode="decision" the server answers as
+        soon as the decision is settled; `reasons` may then be partial
+        (`reasons_complete` is False) and are completed server-side afterwards.
+        """
         sid = session_id or self.session_id
         if not sid:
             raise ValueError("session_id is required; call create_session() or pass session_id")
         payload = {"session_id": sid, "role": role, "content": content}
+        if mode:
+            payload["mode"] = mode
         url = f"{self.base_url}/traces"
-        resp = self._session.post(url, data=json.dumps(payload), timeout=self.timeout)
+        resp = self._session.post(
+            url, data=_dumps(payload), params=self._ingest_params(), timeout=self.timeout
+        )
+        resp.raise_for_status()
+        return _loads(resp)
+
+    def verify(self, content: Dict[str, Any], mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Verdict of the current rules for `content` without recording a trace (POST /verify).
+        No session is needed. mode="decision" stops at the first rule that settles it.
+        """
+        payload: Dict[str, Any] = {"content": content}
+        if mode:
+            payload["mode"] = mode
+        url = f"{self.base_url}/verify"
+        resp = self._session.post(url, data=_dumps(payload), timeout=self.timeout)
+        resp.raise_for_status()
+        return _loads(resp)
+
+    def verify_many(self, contents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Verdicts for several payloads in one request, in input order; nothing is recorded."""
+        url = f"{self.base_url}/verify/batch"
+        resp = self._session.post(url, data=_dumps({"contents": contents}), timeout=self.timeout)
+        resp.raise_for_status()
+        return _loads(resp)["results"]
+
+    def open_stream(
+        self,
+        role: str = "assistant",
+        content: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> str:
+        """Start a streamed trace; `content` holds extra fields stored alongside the text."""
+        sid = session_id or self.session_id
+        if not sid:
+            raise ValueError("session_id is required; call create_session() or pass session_id")
+        payload = {"session_id": sid, "role": role, "content": content or {}}
+        url = f"{self.base_url}/traces/stream"
+        resp = self._session.post(url, data=_dumps(payload), timeout=self.timeout)
+        resp.raise_for_status()
+        return _loads(resp)["stream_id"]
+
+    def send_chunk(self, stream_id: str, text: str) -> Dict[str, Any]:
+        """Verify the next chunk of a streamed trace; returns the verdict so far."""
+        url = f"{self.base_url}/traces/stream/{stream_id}"
+        resp = self._session.post(url, data=_dumps({"text": text}), timeout=self.timeout)
+        resp.raise_for_status()
+        return _loads(resp)
+
+    def close_stream(self, stream_id: str) -> Dict[str, Any]:
+        """Finish a streamed trace; the complete text is stored and verified as one trace."""
+        url = f"{self.base_url}/traces/stream/{stream_id}/close"
+        resp = self._session.post(url, params=self._ingest_params(), timeout=self.timeout)
         resp.raise_for_status()
-        return resp.json()
\ No newline at end of file
+        return _loads(resp)
@@ -1,6 +1,75 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 from .sdk import AgentSentryClient
 
+
+class AssistantStream:
+    """
+    Iterate over a streamed assistant reply while it is verified chunk by chunk.
+
+    Chunks are buffered until at least `min_chars` characters are pending and sent for
+    verification. A verified batch is only yielded once the next verdict (or the final
+    one on close) has also allowed it: a match ending right at the end of the text so
+    far is only reported when more text follows. So text that trips a block rule is
+    never handed out. On a block the source iterator is closed (stopping generation)
+    and iteration ends with `blocked` set. The trace is stored when iteration finishes;
+    `verdict` holds the latest verdict and `trace` the stored trace.
+    """
+
+    def __init__(
+        self,
+        client: AgentSentryClient,
+        chunks: Iterable[str],
+        extra: Optional[Dict[str, Any]] = None,
+        min_chars: int = 64,
+    ):
+        self.client = client
+        self._chunks = chunks
+        self.extra = extra
+        self.min_chars = min_chars
+        self.verdict: Dict[str, Any] = {"decision": "allow", "reasons": []}
+        self.trace: Optional[Dict[str, Any]] = None
+
+    @property
+    def blocked(self) -> bool:
+        return self.verdict.get("decision") == "block"
+
+    def _send(self, text: str) -> bool:
+        self.verdict = self.client.send_chunk(self.stream_id, text)
+        return not self.blocked
+
+    def _close(self) -> None:
+        # The stored verdict covers the complete text and is authoritative
+        self.trace = self.client.close_stream(self.stream_id)
+        self.verdict = {"decision": self.trace["decision"], "reasons": self.trace.get("reasons", [])}
+
+    def __iter__(self) -> Iterator[str]:
+        self.stream_id = self.client.open_stream(role="assistant", content=self.extra)
+        pending: List[str] = []
+        size = 0
+        # Sent and allowed, but not yet confirmed by a later verdict
+        verified: List[str] = []
+        try:
+            for chunk in self._chunks:
+                pending.append(chunk)
+                size += len(chunk)
+                if size < self.min_chars:
+                    continue
+                if not self._send("".join(pending)):
+                    close = getattr(self._chunks, "close", None)
+                    if close is not None:
+                        close()
+                    return
+                yield from verified
+                verified, pending, size = pending, [], 0
+            if pending and not self._send("".join(pending)):
+                return
+            self._close()
+            if not self.blocked:
+                yield from verified + pending
+        finally:
+            if self.trace is None:
+                self._close()
+
 class Tracer:
     def __init__(self, client: AgentSentryClient):
         self.client = client
@@ -17,10 +86,19 @@ class Tracer:
             content.update(extra)
         return self.client.send_trace(role="assistant", content=content)
 
-    def tool(self, name: str, args: Dict[str, Any], result: Any = None, error: str = None):
+    def assistant_stream(
+        self,
+        chunks: Iterable[str],
+        extra: Optional[Dict[str, Any]] = None,
+        min_chars: int = 64,
+    ) -> AssistantStream:
+        """Wrap a streamed reply (an iterator of text chunks); see AssistantStream."""
+        return AssistantStream(self.client, chunks, extra=extra, min_chars=min_chars)
+
+    def tool(self, name: str, args: Dict[str, Any], result: Any = None, error: str = None, mode: Optional[str] = None):
         content: Dict[str, Any] = {"tool": name, "args": args}
         if result is not None:
             content["result"] = result
         if error is not None:
             content["error"] = error
-        return self.client.send_trace(role="tool", content=content)
\ No newline at end of file
+        return self.client.send_trace(role="tool", content=content, mode=mode)
\ No newline at end of file
@@ -0,0 +1,66 @@
+from typing import Dict
+import base64
+import binascii
+import re
+import unicodedata
+from urllib.parse import unquote
+
+# Text views a rule can match against: the collected text as is, or decoded/normalized
+VIEWS = ("raw", "normalized")
+
+# Base64 runs of at least 8 characters (standard or URL-safe alphabet) with valid padding
+_BASE64 = re.compile(
+    r"(?<![A-Za-z0-9+/=_-])"
+    r"(?:[A-Za-z0-9+/_-]{4}){2,}(?:[A-Za-z0-9+/_-]{2}==|[A-Za-z0-9+/_-]{3}=)?"
+    r"(?![A-Za-z0-9+/=_-])"
+)
+_WHITESPACE = re.compile(r"\s+")
+
+# Latin look-alikes from Cyrillic and Greek that NFKC leaves alone
+_HOMOGLYPHS = {
+    "а": "a", "в": "b", "е": "e", "к": "k", "м": "m", "н": "h", "о": "o", "р": "p",
+    "с": "c", "т": "t", "у": "y", "х": "x", "і": "i", "ј": "j", "ѕ": "s", "ԁ": "d",
+    "ԛ": "q", "ԝ": "w", "ɡ": "g",
+    "А": "A", "В": "B", "Е": "E", "К": "K", "М": "M", "Н": "H", "О": "O", "Р": "P",
+    "С": "C", "Т": "T", "У": "Y", "Х": "X", "І": "I", "Ј": "J", "Ѕ": "S",
+    "α": "a", "ο": "o", "ρ": "p", "ν": "v", "τ": "t", "υ": "u", "χ": "x", "ι": "i",
+    "κ": "k", "ε": "e",
+    "Α": "A", "Β": "B", "Ε": "E", "Ζ": "Z", "Η": "H", "Ι": "I", "Κ": "K", "Μ": "M",
+    "Ν": "N", "Ο": "O", "Ρ": "P", "Τ": "T", "Υ": "Y", "Χ": "X",
+}
+# Zero-width and soft-hyphen characters used to split keywords invisibly
+_INVISIBLE = "\u00ad\u200b\u200c\u200d\u2060\ufeff"
+_TRANSLATION: Dict[int, object] = {
+    **{ord(k): v for k, v in _HOMOGLYPHS.items()},
+    **{ord(ch): None for ch in _INVISIBLE},
+}
+
+
+def _decode_base64(match: "re.Match[str]") -> str:
+    token = match.group(0)
+    try:
+        if "-" in token or "_" in token:
+            raw = base64.urlsafe_b64decode(token)
+        else:
+            raw = base64.b64decode(token, validate=True)
+        decoded = raw.decode("utf-8")
+    except (binascii.Error, ValueError):
+        return token
+    if not all(ch.isprintable() or ch.isspace() for ch in decoded):
+        return token
+    # Keep the token: it may be an ordinary word that happens to decode
+    return f"{token} {decoded}"
+
+
+def normalize(text: str) -> str:
+    """
+    Single-pass normalized view of collected text, for rules that opt in with
+    view="normalized": percent-decoding, base64 runs decoded next to the original token,
+    NFKC, Latin look-alike and invisible-character folding, whitespace collapsed to one
+    space.
+    """
+    if "%" in text:
+        text = unquote(text)
+    text = _BASE64.sub(_decode_base64, text)
+    text = unicodedata.normalize("NFKC", text).translate(_TRANSLATION)
+    return _WHITESPACE.sub(" ", text)
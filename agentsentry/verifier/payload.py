@@ -0,0 +1,138 @@
+from typing import Any, List, Optional, Tuple
+import os
+
+# Deeper nesting is not walked (and marks the payload as truncated)
+MAX_DEPTH = 64
+# Consecutive segments are packed into chunks of about this many characters
+PACK_CHARS = 8192
+
+
+class Segments(list):
+    """Text segments of one payload; `truncated` is set when a size cap cut text off."""
+
+    truncated = False
+    _chunks: Optional[List[Tuple[str, List[str]]]] = None
+
+    def chunks(self) -> List[Tuple[str, List[str]]]:
+        """
+        (text, members) chunks: consecutive segments joined by newlines, up to about
+        PACK_CHARS each, so a payload of many small fields takes a few regex searches per
+        rule instead of one per field. A segment longer than that is a chunk on its own.
+        """
+        if self._chunks is None:
+            chunks: List[Tuple[str, List[str]]] = []
+            members: List[str] = []
+            size = 0
+            for seg in self:
+                if members and size + len(seg) > PACK_CHARS:
+                    chunks.append(("\n".join(members), members))
+                    members, size = [], 0
+                members.append(seg)
+                size += len(seg) + 1
+            if members:
+                chunks.append(("\n".join(members), members))
+            self._chunks = chunks
+        return self._chunks
+
+
+def _limit(value: Optional[int], env: str, default: str) -> Optional[int]:
+    """Characters (argument, else env var); 0 disables the cap."""
+    if value is None:
+        value = int(os.getenv(env, default))
+    return value if value > 0 else None
+
+
+class PayloadWalker:
+    """
+    Turns trace content into bounded text segments for the matchers instead of one
+    stringified payload. Nested dicts and lists are walked leaf by leaf; every leaf
+    becomes "<dotted.path>: <value>" (e.g. "args.cmd: rm -rf /"). At most
+    `field_chars` characters of a single leaf and `total_chars` of the whole payload are
+    scanned (PAYLOAD_FIELD_MAX_CHARS / PAYLOAD_MAX_CHARS), so the text held per trace
+    stays bounded however large the payload is.
+
+    A leaf is never split further: `^`/`$` only anchor at real field boundaries, and a
+    match anywhere inside a field is found whatever its length.
+    """
+
+    def __init__(
+        self,
+        field_chars: Optional[int] = None,
+        total_chars: Optional[int] = None,
+    ):
+        self.field_chars = _limit(field_chars, "PAYLOAD_FIELD_MAX_CHARS", "65536")
+        self.total_chars = _limit(total_chars, "PAYLOAD_MAX_CHARS", "1048576")
+
+    def trace_segments(self, content: Any) -> Segments:
+        """Segments of a whole trace: text, tool name, args, result and error."""
+        out = Segments()
+        budget = [self.total_chars]
+        if not isinstance(content, dict):
+            self._walk(out, budget, content, "", 0)
+            return out
+        text = content.get("text")
+        if isinstance(text, str):
+            self._emit(out, budget, "", text)
+        tool = content.get("tool")
+        if isinstance(tool, str):
+            self._emit(out, budget, "", f"tool:{tool}")
+        args = content.get("args")
+        if isinstance(args, dict):
+            self._walk(out, budget, args, "args", 0)
+        if content.get("result") is not None:
+            self._walk(out, budget, content["result"], "result", 0)
+        error = content.get("error")
+        if isinstance(error, str):
+            self._emit(out, budget, "", error)
+        if not out and not out.truncated:
+            # No known fields: scan whatever the payload holds
+            self._walk(out, budget, content, "", 0)
+        return out
+
+    def value_segments(self, value: Any) -> Segments:
+        """Segments of a single value, e.g. the tool argument selected by a rule's arg_path."""
+        out = Segments()
+        self._walk(out, [self.total_chars], value, "", 0)
+        return out
+
+    def _walk(self, out: Segments, budget: List[Optional[int]], node: Any, path: str, depth: int) -> None:
+        if budget[0] == 0:
+            out.truncated = True
+            return
+        if isinstance(node, dict):
+            if depth >= MAX_DEPTH:
+                out.truncated = True
+                return
+            for key, value in node.items():
+                self._walk(out, budget, value, f"{path}.{key}" if path else str(key), depth + 1)
+        elif isinstance(node, (list, tuple)):
+            if depth >= MAX_DEPTH:
+                out.truncated = True
+                return
+            for i, value in enumerate(node):
+                self._walk(out, budget, value, f"{path}.{i}" if path else str(i), depth + 1)
+        elif node is None:
+            return
+        elif isinstance(node, str):
+            self._emit(out, budget, path, node)
+        elif isinstance(node, (bytes, bytearray)):
+            cap = self._cap(budget)
+            raw = node if cap is None else node[:cap]
+            if len(raw) < len(node):
+                out.truncated = True
+            self._emit(out, budget, path, raw.decode("utf-8", "replace"))
+        else:
+            self._emit(out, budget, path, str(node))
+
+    def _cap(self, budget: List[Optional[int]]) -> Optional[int]:
+        caps = [c for c in (self.field_chars, budget[0]) if c is not None]
+        return min(caps) if caps else None
+
+    def _emit(self, out: Segments, budget: List[Optional[int]], path: str, text: str) -> None:
+        cap = self._cap(budget)
+        if cap is not None and len(text) > cap:
+            text = text[:cap]
+            out.truncated = True
+        if budget[0] is not None:
+            budget[0] -= len(text)
+        out.append(f"{path}: {text}" if path else text)
@@ -0,0 +1,103 @@
+from typing import Dict, Iterable, List, Sequence, Tuple
+from collections import deque
+import re
+
+# Word runs and single punctuation marks, close to spaCy's default English tokenization
+# for plain phrases ("share SSN." -> ["share", "ssn", "."]). Like spaCy, a single space
+# only separates tokens while any other whitespace run is a token of its own, so
+# "share\nssn" does not match the phrase "share ssn".
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]|\s+")
+# Punctuation tokens are single characters; words and whitespace runs can keep growing
+_EXTENDABLE = re.compile(r"[\w\s]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased tokens, equivalent to the LOWER attribute of a spaCy token."""
+    return [t.lower() for t in _TOKEN_RE.findall(text) if t != " "]
+
+
+def tokenize_partial(text: str) -> Tuple[List[str], str]:
+    """
+    Tokenize a prefix of a longer text. A trailing word or whitespace run may continue in
+    the next chunk, so it is returned unconsumed as the second element.
+    """
+    tokens: List[str] = []
+    pending = ""
+    for m in _TOKEN_RE.finditer(text):
+        tok = m.group(0)
+        if m.end() == len(text) and _EXTENDABLE.match(tok):
+            pending = tok
+            break
+        if tok != " ":
+            tokens.append(tok.lower())
+    return tokens, pending
+
+
+class PhraseAutomaton:
+    """
+    Aho-Corasick automaton over token sequences.
+
+    Phrases are matched on whole tokens only, so "share ssn" matches "Share SSN now" but
+    not "timeshare ssn". Each phrase carries an integer label (e.g. a rule index).
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[Sequence[str], int]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # (label, phrase length in tokens) emitted when a state is reached
+        self._out: List[List[Tuple[int, int]]] = [[]]
+        for tokens, label in phrases:
+            if tokens:
+                self._add(tokens, label)
+        self._link()
+
+    def _add(self, tokens: Sequence[str], label: int) -> None:
+        state = 0
+        for tok in tokens:
+            nxt = self._goto[state].get(tok)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][tok] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((label, len(tokens)))
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for tok, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and tok not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(tok, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def step(self, state: int, tok: str) -> int:
+        goto, fail = self._goto, self._fail
+        while state and tok not in goto[state]:
+            state = fail[state]
+        return goto[state].get(tok, 0)
+
+    def outputs(self, state: int) -> List[Tuple[int, int]]:
+        return self._out[state]
+
+    def find(self, tokens: Iterable[str]) -> List[Tuple[int, int]]:
+        """Return (start token index, label) for every phrase occurrence, ordered by start."""
+        hits: List[Tuple[int, int]] = []
+        state = 0
+        for i, tok in enumerate(tokens):
+            state = self.step(state, tok)
+            for label, length in self._out[state]:
+                hits.append((i - length + 1, label))
+        hits.sort()
+        return hits
+
+
+def phrase_list(pattern: str) -> List[str]:
+    """Split an `nlp` rule pattern into its |-separated phrases."""
+    return [p.strip() for p in pattern.split("|") if p.strip()]
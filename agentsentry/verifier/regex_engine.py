@@ -0,0 +1,283 @@
+from typing import Dict, FrozenSet, List, Optional, Pattern, Set, Tuple
+import re
+import warnings
+
+try:
+    from re import _parser as sre_parse  # type: ignore[attr-defined]  # Python 3.11+
+    from re import _constants as sre_constants  # type: ignore[attr-defined]
+except ImportError:  # pragma: no cover - older interpreters
+    import sre_parse  # type: ignore
+    import sre_constants  # type: ignore
+
+# The `regex` package supports per-search timeouts; without it rules compile with `re`
+# and only the per-evaluation budget (checked between rules) applies.
+try:
+    import regex as _regex  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    _regex = None
+
+# Literals shorter than this hit almost every payload; rules relying on them always run.
+MIN_LITERAL_LEN = 2
+
+_LITERAL = sre_constants.LITERAL
+_SUBPATTERN = sre_constants.SUBPATTERN
+_BRANCH = sre_constants.BRANCH
+_REPEATS = {
+    sre_constants.MAX_REPEAT,
+    sre_constants.MIN_REPEAT,
+    getattr(sre_constants, "POSSESSIVE_REPEAT", sre_constants.MAX_REPEAT),
+}
+_ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+# Word boundaries read the same next to the newline joining packed segments
+_BOUNDARY_ONLY = {sre_constants.AT_BOUNDARY, sre_constants.AT_NON_BOUNDARY}
+
+Requirement = Optional[FrozenSet[str]]
+
+# A fuzzy constraint (`{e<=1}`, `{1<=e<=2}`, `{2i+1d<3}`): literal text for `re`
+_FUZZY = re.compile(r"(?:^|[^\\])(?:\\\\)*\{\s*(?:\d+\s*<|\d*[ides]\s*[<=+,}])")
+
+
+def _parse(pattern: str):
+    """
+    Parse a rule with `re`'s parser, raising if `regex` (which runs the rules when
+    installed) may read it differently. `re` rejects most `regex`-only syntax (\\p{..},
+    (?V1), branch resets) by itself; it only warns about nested sets and set operations
+    (`[[:alpha:]]`, `--`, `&&`) and takes fuzzy constraints (`{e<=1}`) as literals.
+    """
+    if _FUZZY.search(pattern):
+        raise ValueError("fuzzy matching is specific to the regex package")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FutureWarning)
+        return sre_parse.parse(pattern)
+
+
+def _better(a: Requirement, b: Requirement) -> Requirement:
+    """Pick the more selective of two requirements (longest shortest literal, then fewest)."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    ka = (min(len(s) for s in a), -len(a))
+    kb = (min(len(s) for s in b), -len(b))
+    return b if kb > ka else a
+
+
+def _required(parsed) -> Requirement:
+    """
+    Return a set of lowercase literals such that at least one occurs in every match
+    of the parsed (sub)pattern, or None when no useful requirement can be derived.
+    """
+    best: Requirement = None
+    run: List[str] = []
+
+    def flush() -> None:
+        nonlocal best
+        if run:
+            best = _better(best, frozenset(["".join(run).lower()]))
+            run.clear()
+
+    for op, av in parsed:
+        if op is _LITERAL:
+            run.append(chr(av))
+            continue
+        flush()
+        if op is _SUBPATTERN:
+            best = _better(best, _required(av[-1]))
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            best = _better(best, _required(av))
+        elif op in _REPEATS:
+            lo, _hi, sub = av
+            if lo >= 1:
+                best = _better(best, _required(sub))
+        elif op is _BRANCH:
+            alts: Set[str] = set()
+            for branch in av[1]:
+                req = _required(branch)
+                if req is None:
+                    alts = set()
+                    break
+                alts |= req
+            if alts:
+                best = _better(best, frozenset(alts))
+        # Anything else (classes, anchors, lookarounds, backrefs) contributes nothing.
+    flush()
+    return best
+
+
+def extract_literals(pattern: str) -> Requirement:
+    """
+    Derive a prefilter for a regex: a set of lowercase literals, at least one of which
+    must appear (case-insensitively) in any text the pattern can match. Returns None when
+    the pattern has no literal worth filtering on.
+    """
+    try:
+        req = _required(_parse(pattern))
+    except Exception:
+        return None
+    if not req or min(len(s) for s in req) < MIN_LITERAL_LEN:
+        return None
+    return req
+
+
+def _context_free(parsed) -> bool:
+    for op, av in parsed:
+        if op is sre_constants.AT:
+            ok = av in _BOUNDARY_ONLY
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            ok = False
+        elif op is _SUBPATTERN:
+            ok = _context_free(av[-1])
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            ok = _context_free(av)
+        elif op in _REPEATS:
+            ok = _context_free(av[2])
+        elif op is _BRANCH:
+            ok = all(_context_free(branch) for branch in av[1])
+        elif op is sre_constants.GROUPREF_EXISTS:
+            ok = all(_context_free(branch) for branch in av[1:] if branch is not None)
+        else:
+            ok = True
+        if not ok:
+            return False
+    return True
+
+
+def context_free(pattern: str) -> bool:
+    """
+    True when every match of the pattern inside a text is also a match inside any longer
+    text containing it after a newline and followed by one: no anchors other than word
+    boundaries and no lookarounds. Such patterns can scan several segments joined by
+    newlines at once, since no match there means no match in any of them.
+    """
+    try:
+        return _context_free(_parse(pattern))
+    except Exception:
+        return False
+
+
+def _trie_regex(literals: List[str]) -> str:
+    """Build a greedy trie-shaped alternation so the longest literal at a position wins."""
+    trie: Dict[str, dict] = {}
+    for lit in literals:
+        node = trie
+        for ch in lit:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def render(node: Dict[str, dict]) -> str:
+        terminal = "" in node
+        alts = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        if terminal:
+            return "(?:" + body + ")?"
+        return body
+
+    return render(trie)
+
+
+class RegexRuleSet:
+    """
+    Compiled set of regex rules with a shared literal prefilter.
+
+    `candidates(text)` scans the text once for every required literal and returns the
+    indices (in rule order) of the patterns that may match; patterns without a usable
+    literal are always candidates. Running the full regexes on the candidates yields
+    exactly the matches of running every regex. `context_free[i]` tells whether pattern
+    `i` can be run once over packed segments (see `context_free()`).
+    """
+
+    def __init__(self, patterns: List[Tuple[str, Pattern]], literal_cache: Optional[Dict[str, Requirement]] = None):
+        self._always: List[int] = []
+        self._by_literal: Dict[str, List[int]] = {}
+        self._size = len(patterns)
+        self.context_free = [context_free(source) for source, _compiled in patterns]
+        # Shared with the owning verifier so reloads skip re-parsing unchanged patterns
+        cache = literal_cache if literal_cache is not None else {}
+        for idx, (source, _compiled) in enumerate(patterns):
+            if source not in cache:
+                cache[source] = extract_literals(source)
+            req = cache[source]
+            if req is None:
+                self._always.append(idx)
+                continue
+            for lit in req:
+                self._by_literal.setdefault(lit, []).append(idx)
+
+        # A hit reports the longest literal starting at a position; its literal prefixes
+        # are present as well.
+        self._implied: Dict[str, List[str]] = {}
+        for lit in self._by_literal:
+            self._implied[lit] = [lit[:i] for i in range(1, len(lit) + 1) if lit[:i] in self._by_literal]
+
+        self._scanner: Optional[Pattern] = None
+        if self._by_literal:
+            self._scanner = re.compile(_trie_regex(list(self._by_literal)), re.IGNORECASE)
+
+    def candidates(self, text: str, pos: int = 0) -> List[int]:
+        if self._scanner is None:
+            return list(self._always)
+        found: Set[str] = set()
+        search = self._scanner.search
+        m = search(text, pos)
+        while m is not None:
+            key = m.group(0).lower()
+            implied = self._implied.get(key)
+            if implied is None:
+                # Unicode case folding produced a form we cannot map back; stay exact.
+                return list(range(self._size))
+            found.update(implied)
+            pos = m.start() + 1
+            m = search(text, pos)
+        if not found:
+            return list(self._always)
+        selected = set(self._always)
+        for lit in found:
+            selected.update(self._by_literal[lit])
+        return sorted(selected)
+
+
+def compile_rule(pattern: str):
+    """Compile a rule pattern, preferring the `regex` package so searches can time out."""
+    if _regex is not None:
+        try:
+            return _regex.compile(pattern)
+        except Exception:
+            pass
+    return re.compile(pattern)
+
+
+def search(compiled, text: str, timeout: Optional[float] = None, pos: int = 0):
+    """Search with an optional timeout in seconds; raises TimeoutError when it expires."""
+    if timeout and _regex is not None and isinstance(compiled, _regex.Pattern):
+        return compiled.search(text, pos, timeout=timeout)
+    return compiled.search(text, pos)
+
+
+# Characters that commonly drive nested quantifiers into catastrophic backtracking
+_ADVERSARIAL_CHARS = "a0 _-./\t:=\"'"
+
+
+def adversarial_inputs(pattern: str, size: int = 4096):
+    """Long runs of one character (and char+space pairs) ending in a non-matching tail."""
+    chars = dict.fromkeys(_ADVERSARIAL_CHARS + "".join(ch for ch in pattern if ch.isalnum()))
+    for ch in chars:
+        yield ch * size + "!"
+        yield (ch + " ") * (size // 2) + "!"
+
+
+def slow_input(pattern: str, timeout: float) -> Optional[str]:
+    """
+    Run a pattern against adversarial inputs and return a description of the first input
+    it cannot finish within `timeout` seconds, or None. Requires the `regex` package.
+    """
+    if _regex is None:
+        return None
+    compiled = compile_rule(pattern)
+    for text in adversarial_inputs(pattern):
+        try:
+            compiled.search(text, timeout=timeout)
+        except TimeoutError:
+            return f"{text[:8]!r}... ({len(text)} chars)"
+    return None
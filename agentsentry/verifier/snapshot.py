@@ -0,0 +1,89 @@
+from dataclasses import asdict
+from typing import Any, Dict, List, Tuple
+import hashlib
+import json
+import os
+import pickle
+import struct
+import tempfile
+import time
+
+from .static_rules import Rule, StaticVerifier
+
+# Snapshot layout: MAGIC, format version (u16), header length (u32), JSON header,
+# then the pickled verifier. The header can be read without unpickling anything.
+MAGIC = b"AGSNAP"
+# Bump whenever the pickled state of StaticVerifier changes; older snapshots are rejected
+FORMAT_VERSION = 7
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def ruleset_digest(rules: List[Rule]) -> str:
+    """Stable hash of a rule set; identical rules give identical digests on every host."""
+    canonical = json.dumps([asdict(r) for r in rules], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def dump_snapshot(verifier: StaticVerifier, path: str, rule_version: int = 0) -> Dict[str, Any]:
+    """
+    Write a compiled verifier to `path` (atomically) and return its header. Snapshots are
+    pickles: only load files produced by your own deployment. `rule_version` records
+    which version of a versioned rule store the rules were read at.
+    """
+    header = {
+        "digest": ruleset_digest(verifier.rules),
+        "rules": len(verifier.rules),
+        "phrase_engine": verifier.phrase_engine,
+        "rule_version": rule_version,
+        "created_at": int(time.time()),
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    payload = pickle.dumps(verifier, protocol=pickle.HIGHEST_PROTOCOL)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack(">HI", FORMAT_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            f.write(payload)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return header
+
+
+def _read(path: str, with_payload: bool):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise SnapshotError(f"{path} is not a rule-set snapshot")
+        version, header_len = struct.unpack(">HI", f.read(6))
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"unsupported snapshot format {version} (expected {FORMAT_VERSION})")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+        payload = f.read() if with_payload else b""
+    return header, payload
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    return _read(path, with_payload=False)[0]
+
+
+def open_snapshot(path: str) -> Tuple[Dict[str, Any], StaticVerifier]:
+    """Header and verifier of a snapshot, read in one pass."""
+    header, payload = _read(path, with_payload=True)
+    verifier = pickle.loads(payload)
+    if not isinstance(verifier, StaticVerifier):
+        raise SnapshotError(f"{path} does not contain a StaticVerifier")
+    if ruleset_digest(verifier.rules) != header["digest"]:
+        raise SnapshotError(f"{path} digest mismatch")
+    return header, verifier
+
+
+def load_snapshot(path: str) -> StaticVerifier:
+    return open_snapshot(path)[1]
@@ -1,17 +1,24 @@
 from dataclasses import dataclass
-from typing import List, Dict, Any, Optional, Tuple
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Set, Tuple
+import importlib.util
 import os
-import re
+import time
 import yaml
 
-_SPACY_AVAILABLE = False
-try:
-    import spacy  # type: ignore
-    from spacy.matcher import PhraseMatcher  # type: ignore
-    _SPACY_AVAILABLE = True
-except Exception:
-    # spaCy is optional at install time; NLP rules will be ignored if unavailable
-    _SPACY_AVAILABLE = False
+from .regex_engine import RegexRuleSet, compile_rule, search
+from .phrase_engine import PhraseAutomaton, phrase_list, tokenize
+from .payload import PayloadWalker, Segments
+from .normalize import normalize
+
+if TYPE_CHECKING:
+    from .stream import StreamEvaluator
+
+# spaCy is optional at install time; NLP rules will be ignored if unavailable.
+# It is imported lazily so processes using the Aho-Corasick phrase engine never pay for it.
+_SPACY_AVAILABLE = importlib.util.find_spec("spacy") is not None
+
+# Phrase backends for `nlp` rules, selected with PHRASE_ENGINE
+PHRASE_ENGINES = {"spacy", "aho"}
 
 @dataclass
 class Rule:
@@ -22,6 +29,9 @@ class Rule:
     enabled: bool = True
     description: Optional[str] = None
     rule_type: str = "regex"  # "regex" | "nlp"
+    tool: Optional[str] = None  # only evaluate traces of this tool; None = every trace
+    arg_path: Optional[str] = None  # dotted path into args (e.g. "cmd"); None = whole trace text
+    view: str = "raw"  # "raw" | "normalized" (decoded, NFKC, homoglyphs folded; see normalize())
 
 DEFAULT_RULES: List[Rule] = [
     Rule(
@@ -48,128 +58,724 @@ DEFAULT_RULES: List[Rule] = [
 ]
 
 DECISION_PRIORITY = {"block": 3, "warn": 2, "allow": 1}
+SEVERITY_PRIORITY = {"critical": 3, "warning": 2, "info": 1}
+
+# "full" reports every matching rule; "decision" stops once the decision is settled
+EVAL_MODES = ("full", "decision")
+
+# PhraseMatcher attributes computed by the tokenizer alone
+_TOKEN_ATTRS = {"LOWER", "ORTH"}
+# Trained components that a tokenizer-only pipeline can skip loading
+_PIPELINE_COMPONENTS = [
+    "tok2vec", "transformer", "tagger", "morphologizer", "parser", "senter",
+    "attribute_ruler", "lemmatizer", "ner",
+]
+
+
+def _load_nlp(model: str, tokenizer_only: bool):
+    import spacy  # type: ignore
+
+    if not tokenizer_only:
+        return spacy.load(model, disable=["ner"])  # NER not needed for phrase matching
+    try:
+        return spacy.load(model, exclude=_PIPELINE_COMPONENTS)
+    except OSError:
+        # Model package not installed: a blank pipeline of the same language tokenizes the same
+        return spacy.blank(model.split("_", 1)[0])
+
+
+def _reason(r: Rule, rtype: str) -> Dict[str, Any]:
+    return {
+        "rule": r.name,
+        "severity": r.severity,
+        "decision": r.decision,
+        "description": r.description,
+        "type": rtype,
+    }
+
+
+def _timeout_reason(r: Rule, fail_closed: bool = True, starved: bool = False) -> Dict[str, Any]:
+    # A block rule whose own search ran out of time still blocks unless failing open was
+    # chosen: the input was hostile to that rule. A rule starved by the shared
+    # per-evaluation budget says nothing about the input (load or other rules used the
+    # time), so it only warns.
+    if r.decision == "block" and fail_closed and not starved:
+        decision = "block"
+    else:
+        decision = "allow" if r.decision == "allow" else "warn"
+    return {
+        "rule": r.name,
+        "severity": r.severity,
+        "decision": decision,
+        "description": (
+            "Rule was skipped because the evaluation's regex time budget was used up."
+            if starved
+            else "Rule exceeded its regex time budget and was not fully evaluated."
+        ),
+        "type": "regex",
+        "timed_out": True,
+    }
+
+
+def _budget(ms: Optional[float], env: str, default: str) -> Optional[float]:
+    """Milliseconds (argument, else env var) to seconds; 0 disables the budget."""
+    if ms is None:
+        ms = float(os.getenv(env, default))
+    return ms / 1000.0 if ms > 0 else None
+
+
+def _truncated_reason(walker: PayloadWalker) -> Dict[str, Any]:
+    # Unverified text must not pass silently: padding a payload past the caps would
+    # otherwise hide anything after them from every rule
+    return {
+        "rule": "payload_truncated",
+        "severity": "warning",
+        "decision": "warn",
+        "description": (
+            f"Payload exceeded the scan limits ({walker.field_chars} chars per field, "
+            f"{walker.total_chars} in total); the rest was not verified."
+        ),
+        "type": "limit",
+    }
+
+
+def _verdict(matches: List[Dict[str, Any]]) -> Dict[str, Any]:
+    agg_decision = "allow"
+    for m in matches:
+        if DECISION_PRIORITY[m["decision"]] > DECISION_PRIORITY[agg_decision]:
+            agg_decision = m["decision"]
+    return {"decision": agg_decision, "reasons": matches}
+
+def _resolve_arg(args: Any, path: str) -> Any:
+    """Follow a dotted path ("files.0.path") through nested dicts/lists of tool args."""
+    node = args
+    for part in path.split("."):
+        if isinstance(node, dict):
+            if part not in node:
+                return None
+            node = node[part]
+        elif isinstance(node, list) and part.isdigit() and int(part) < len(node):
+            node = node[int(part)]
+        else:
+            return None
+    return node
+
+
+class RuleStats:
+    """Running counters for one rule (or, with `passes`, one engine)."""
+
+    __slots__ = ("evaluations", "matches", "seconds", "timeouts")
+
+    def __init__(self) -> None:
+        self.evaluations = 0
+        self.matches = 0
+        self.seconds = 0.0
+        self.timeouts = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "evaluations": self.evaluations,
+            "matches": self.matches,
+            "seconds": self.seconds,
+            "timeouts": self.timeouts,
+        }
+
+
+class _RuleGroup:
+    """Rules sharing a (tool, arg_path, view) scope, evaluated against the same text."""
+
+    def __init__(self, tool: Optional[str], arg_path: Optional[str], view: str = "raw"):
+        self.tool = tool
+        self.arg_path = arg_path
+        self.view = view
+        self.regex: List[int] = []  # indices into StaticVerifier._compiled_regex
+        self.regex_set: Optional[RegexRuleSet] = None
+        # Evaluation rank of each position in `regex` (see StaticVerifier.reorder)
+        self.rank: Optional[List[int]] = None
+        self.nlp: List[int] = []  # indices into StaticVerifier._nlp_rules
+        # Phrase labels are positions in `nlp`, so an unchanged group can be reused as is
+        self.automaton: Optional[PhraseAutomaton] = None
+        self.matcher = None  # spaCy PhraseMatcher
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # PhraseMatchers are bound to a loaded spaCy vocab and cannot be pickled
+        return {**self.__dict__, "matcher": None}
+
+    def signature(self, verifier: "StaticVerifier") -> Tuple:
+        return (
+            self.tool,
+            self.arg_path,
+            self.view,
+            tuple(verifier._compiled_regex[i][0].pattern for i in self.regex),
+            tuple(verifier._nlp_rules[i].pattern for i in self.nlp),
+        )
+
 
 class StaticVerifier:
-    def __init__(self, rules: Optional[List[Rule]] = None):
+    def __init__(
+        self,
+        rules: Optional[List[Rule]] = None,
+        phrase_engine: Optional[str] = None,
+        previous: Optional["StaticVerifier"] = None,
+        rule_timeout_ms: Optional[float] = None,
+        eval_budget_ms: Optional[float] = None,
+        fail_closed: Optional[bool] = None,
+        field_max_chars: Optional[int] = None,
+        payload_max_chars: Optional[int] = None,
+        reorder_every: Optional[int] = None,
+    ):
+        """
+        `previous` is the verifier being replaced on reload: compiled regexes, literal
+        prefilters, unchanged rule groups and the loaded spaCy pipeline are reused from it,
+        so only added or changed rules are compiled.
+
+        `rule_timeout_ms` caps a single regex search and `eval_budget_ms` all regex work of
+        one evaluation (REGEX_RULE_TIMEOUT_MS / REGEX_EVAL_BUDGET_MS, 0 disables). Rules
+        that run out of time are reported with `timed_out: True` instead of hanging. A
+        block rule whose own search times out still blocks unless `fail_closed` is False
+        (REGEX_FAIL_CLOSED=0); rules cut short or skipped by the evaluation budget warn.
+
+        Payloads are scanned as bounded segments (see PayloadWalker): at most
+        `field_max_chars` per field and `payload_max_chars` per trace
+        (PAYLOAD_FIELD_MAX_CHARS / PAYLOAD_MAX_CHARS, 0 disables). Cut-off payloads get an
+        `payload_truncated` reason that warns.
+
+        Regex rules are re-ranked from their running stats every `reorder_every`
+        evaluations (RULE_REORDER_EVERY, default 1000, 0 keeps the initial ranking); see
+        reorder().
+        """
         self.rules = rules or DEFAULT_RULES
+        self._configure(rule_timeout_ms, eval_budget_ms, fail_closed, field_max_chars, payload_max_chars, reorder_every)
+        self.phrase_engine = (phrase_engine or os.getenv("PHRASE_ENGINE", "spacy")).lower()
+        if self.phrase_engine not in PHRASE_ENGINES:
+            raise ValueError(f"phrase_engine must be one of {PHRASE_ENGINES}")
         # Pre-compile regex patterns
-        self._compiled_regex: List[Tuple[Rule, re.Pattern]] = []
+        self._compiled_regex: List[Tuple[Rule, Any]] = []
+        self._literal_cache: Dict[str, Any] = {}
         # Prepare spaCy matcher if available and rules include NLP
         self._nlp = None
-        self._nlp_matcher = None
+        self._nlp_key: Optional[Tuple[str, str]] = None
         self._nlp_rules: List[Rule] = []
-        self._prepare()
+        self._tokenizer_only = True
+        # Rules grouped by scope and indexed by tool name (None = applies to every trace)
+        self._groups: List[_RuleGroup] = []
+        self._by_tool: Dict[Optional[str], List[_RuleGroup]] = {}
+        # Counters aligned with _compiled_regex / _nlp_rules, plus one per engine; carried
+        # over from `previous` by rule name so they stay monotonic across reloads
+        self._regex_stats: List[RuleStats] = []
+        self._nlp_stats: List[RuleStats] = []
+        self._engine_stats: Dict[str, RuleStats] = {"regex": RuleStats(), "nlp": RuleStats()}
+        if previous is not None:
+            self._engine_stats = previous._engine_stats
+        self._carry_stats: Dict[Tuple[str, str], RuleStats] = {}
+        if previous is not None:
+            self._carry_stats = {
+                **{("regex", r.name): st for (r, _c), st in zip(previous._compiled_regex, previous._regex_stats)},
+                **{("nlp", r.name): st for r, st in zip(previous._nlp_rules, previous._nlp_stats)},
+            }
+        if previous is not None and previous.phrase_engine != self.phrase_engine:
+            previous = None
+        self._prepare(previous)
+
+    def _prepare(self, previous: Optional["StaticVerifier"] = None) -> None:
+        compiled_cache: Dict[str, Any] = {}
+        prev_groups: Dict[Tuple, _RuleGroup] = {}
+        if previous is not None:
+            compiled_cache = {r.pattern: c for r, c in previous._compiled_regex}
+            self._literal_cache = dict(previous._literal_cache)
+            prev_groups = {g.signature(previous): g for g in previous._groups}
 
-    def _prepare(self) -> None:
         # Compile regex rules
         self._compiled_regex = []
         self._nlp_rules = []
+        groups: Dict[Tuple[Optional[str], Optional[str], str], _RuleGroup] = {}
         for r in self.rules:
             if not r.enabled:
                 continue
+            scope = (r.tool or None, r.arg_path or None, "normalized" if r.view == "normalized" else "raw")
             if (r.rule_type or "regex") == "regex":
-                try:
-                    self._compiled_regex.append((r, re.compile(r.pattern)))
-                except re.error:
-                    # Skip invalid regex at runtime
-                    continue
+                cregex = compiled_cache.get(r.pattern)
+                if cregex is None:
+                    try:
+                        cregex = compile_rule(r.pattern)
+                    except Exception:
+                        # Skip invalid regex at runtime
+                        continue
+                self._compiled_regex.append((r, cregex))
+                groups.setdefault(scope, _RuleGroup(*scope)).regex.append(len(self._compiled_regex) - 1)
             elif r.rule_type == "nlp":
                 self._nlp_rules.append(r)
+                groups.setdefault(scope, _RuleGroup(*scope)).nlp.append(len(self._nlp_rules) - 1)
+        # Used by decision-only evaluation to skip work that cannot change the outcome
+        self._nlp_decisions = {r.decision for r in self._nlp_rules}
+        self._allow_rules = any(
+            r.decision == "allow" for r in [r for r, _c in self._compiled_regex] + self._nlp_rules
+        )
+        carry = self._carry_stats
+        self._regex_stats = [carry.get(("regex", r.name)) or RuleStats() for r, _c in self._compiled_regex]
+        self._nlp_stats = [carry.get(("nlp", r.name)) or RuleStats() for r in self._nlp_rules]
+        self._carry_stats = {}
+        # Drop literal prefilters of patterns no longer in use
+        patterns = {r.pattern for r, _c in self._compiled_regex}
+        self._literal_cache = {k: v for k, v in self._literal_cache.items() if k in patterns}
+
+        self._groups = list(groups.values())
+        self._by_tool = {}
+        reused: Dict[int, _RuleGroup] = {}
+        for g in self._groups:
+            prev = prev_groups.get(g.signature(self))
+            if prev is not None:
+                reused[id(g)] = prev
+                g.regex_set = prev.regex_set
+                g.rank = prev.rank
+            else:
+                # One literal prefilter scan per scope decides which regexes need to run
+                g.regex_set = RegexRuleSet(
+                    [(self._compiled_regex[i][0].pattern, self._compiled_regex[i][1]) for i in g.regex],
+                    self._literal_cache,
+                )
+            self._by_tool.setdefault(g.tool, []).append(g)
+            if g.rank is None:
+                self._rank(g)
 
+        if self._nlp_rules and self.phrase_engine == "aho":
+            for g in self._groups:
+                if not g.nlp:
+                    continue
+                prev = reused.get(id(g))
+                if prev is not None and prev.automaton is not None:
+                    g.automaton = prev.automaton
+                    continue
+                g.automaton = PhraseAutomaton(
+                    (tokenize(phrase), pos)
+                    for pos, idx in enumerate(g.nlp)
+                    for phrase in phrase_list(self._nlp_rules[idx].pattern)
+                )
         # Initialize spaCy matcher if needed
-        if self._nlp_rules and _SPACY_AVAILABLE:
-            model = os.getenv("SPACY_MODEL", "en_core_web_sm")
-            try:
-                self._nlp = spacy.load(model, disable=["ner"])  # NER not needed for phrase matching
-                self._nlp_matcher = PhraseMatcher(self._nlp.vocab, attr="LOWER")
+        elif self._nlp_rules and _SPACY_AVAILABLE:
+            self._prepare_spacy(previous, reused)
+
+    def _rank(self, g: _RuleGroup) -> None:
+        keys = []
+        for pos, idx in enumerate(g.regex):
+            r = self._compiled_regex[idx][0]
+            st = self._regex_stats[idx]
+            cost = st.seconds / st.evaluations if st.evaluations else 0.0
+            # Smoothed match rate; cost / rate is the expected time spent per match found
+            rate = (st.matches + 1) / (st.evaluations + 2)
+            keys.append((
+                -DECISION_PRIORITY.get(r.decision, 0),
+                -SEVERITY_PRIORITY.get(r.severity, 0),
+                cost / rate,
+                pos,
+            ))
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        rank = [0] * len(order)
+        for n, pos in enumerate(order):
+            rank[pos] = n
+        g.rank = rank
+
+    def reorder(self) -> None:
+        """
+        Re-rank regex rules so blocking, high-severity rules run first and, among equals,
+        those that are cheap and often match. This only changes which rules an evaluation
+        budget or a decision-only evaluation reaches first: full evaluations still report
+        every match in rule order, and decisions never change. The one reason of a
+        decision-only verdict is the first match in rank order, so it can differ between
+        rankings.
+        """
+        self._since_reorder = 0
+        for g in self._groups:
+            self._rank(g)
+
+    def _maybe_reorder(self, evaluations: int = 1) -> None:
+        if not self.reorder_every:
+            return
+        self._since_reorder += evaluations
+        if self._since_reorder >= self.reorder_every:
+            self.reorder()
+
+    def _prepare_spacy(
+        self,
+        previous: Optional["StaticVerifier"] = None,
+        reused: Optional[Dict[int, _RuleGroup]] = None,
+    ) -> None:
+        reused = reused or {}
+        model = os.getenv("SPACY_MODEL", "en_core_web_sm")
+        attr = os.getenv("SPACY_MATCH_ATTR", "LOWER").upper()
+        # LOWER/ORTH only depend on the tokenizer, so the trained pipeline is not needed
+        self._tokenizer_only = attr in _TOKEN_ATTRS
+        self._nlp_key = (model, attr)
+        same_nlp = previous is not None and previous._nlp is not None and previous._nlp_key == self._nlp_key
+        try:
+            from spacy.matcher import PhraseMatcher  # type: ignore
+
+            self._nlp = previous._nlp if same_nlp else _load_nlp(model, self._tokenizer_only)
+            for g in self._groups:
+                if not g.nlp:
+                    continue
+                prev = reused.get(id(g))
+                if same_nlp and prev is not None and prev.matcher is not None:
+                    g.matcher = prev.matcher
+                    continue
+                g.matcher = PhraseMatcher(self._nlp.vocab, attr=attr)
                 # Add phrase patterns
                 # Each rule's pattern is treated as a plain phrase (can be multi-word)
-                for r in self._nlp_rules:
+                for pos, idx in enumerate(g.nlp):
                     # Allow multiple phrases separated by | for convenience
-                    phrases = [p.strip() for p in r.pattern.split("|") if p.strip()]
-                    docs = [self._nlp.make_doc(p) for p in phrases]
-                    # Use unique label per rule
-                    label = f"RULE_{r.name}"
+                    docs = [self._nlp.make_doc(p) for p in phrase_list(self._nlp_rules[idx].pattern)]
+                    # Label by position in the group
                     if docs:
                         try:
-                            self._nlp_matcher.add(label, docs)
+                            g.matcher.add(f"RULE_{pos}", docs)
                         except Exception:
                             # Continue even if one rule fails to register
                             continue
-            except Exception:
-                # spaCy model failed to load; disable NLP
-                self._nlp = None
-                self._nlp_matcher = None
-
-    @staticmethod
-    def _collect_text(content: Dict[str, Any]) -> str:
-        parts: List[str] = []
-        if isinstance(content.get("text"), str):
-            parts.append(content["text"])
+        except Exception:
+            # spaCy model failed to load; disable NLP
+            self._nlp = None
+            for g in self._groups:
+                g.matcher = None
+
+    def _configure(
+        self,
+        rule_timeout_ms: Optional[float] = None,
+        eval_budget_ms: Optional[float] = None,
+        fail_closed: Optional[bool] = None,
+        field_max_chars: Optional[int] = None,
+        payload_max_chars: Optional[int] = None,
+        reorder_every: Optional[int] = None,
+    ) -> None:
+        """Runtime limits and switches; arguments left as None are read from the environment."""
+        self.rule_timeout = _budget(rule_timeout_ms, "REGEX_RULE_TIMEOUT_MS", "50")
+        self.eval_budget = _budget(eval_budget_ms, "REGEX_EVAL_BUDGET_MS", "250")
+        if fail_closed is None:
+            fail_closed = os.getenv("REGEX_FAIL_CLOSED", "1").lower() not in ("0", "false", "no")
+        self.fail_closed = fail_closed
+        self._walker = PayloadWalker(field_max_chars, payload_max_chars)
+        if reorder_every is None:
+            reorder_every = int(os.getenv("RULE_REORDER_EVERY", "1000"))
+        self.reorder_every = max(reorder_every, 0)
+        self._since_reorder = 0
+
+    # Pickling (used by rule-set snapshots) keeps compiled rules, literal prefilters and
+    # phrase automata; the spaCy pipeline and matchers are rebuilt and counters restart.
+    # Limits and switches belong to the loading process and are read from its environment.
+    _RUNTIME = ("rule_timeout", "eval_budget", "fail_closed", "_walker", "reorder_every", "_since_reorder")
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        for key in self._RUNTIME:
+            state.pop(key, None)
+        state["_nlp"] = None
+        state["_regex_stats"] = None
+        state["_nlp_stats"] = None
+        state["_engine_stats"] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._configure()
+        self._regex_stats = [RuleStats() for _ in self._compiled_regex]
+        self._nlp_stats = [RuleStats() for _ in self._nlp_rules]
+        self._engine_stats = {"regex": RuleStats(), "nlp": RuleStats()}
+        if self._nlp_rules and self.phrase_engine == "spacy" and _SPACY_AVAILABLE:
+            self._prepare_spacy()
+
+    def _plan(self, content: Dict[str, Any]) -> List[Tuple[_RuleGroup, Segments]]:
+        """Pick the rule groups that apply to this trace and the text segments each one scans."""
         tool = content.get("tool")
-        if isinstance(tool, str):
-            parts.append(f"tool:{tool}")
-        args = content.get("args")
-        if isinstance(args, dict):
-            parts.append(str(args))
-        error = content.get("error")
-        if isinstance(error, str):
-            parts.append(error)
-        return "\n".join(parts) if parts else str(content)
-
-    def evaluate(self, content: Dict[str, Any]) -> Dict[str, Any]:
-        text = self._collect_text(content)
-        matches: List[Dict[str, Any]] = []
-        agg_decision = "allow"
-
-        # Regex evaluation
-        for r, cregex in self._compiled_regex:
-            try:
-                if cregex.search(text):
-                    matches.append({
-                        "rule": r.name,
-                        "severity": r.severity,
-                        "decision": r.decision,
-                        "description": r.description,
-                        "type": "regex",
-                    })
-                    if DECISION_PRIORITY[r.decision] > DECISION_PRIORITY[agg_decision]:
-                        agg_decision = r.decision
-            except Exception:
-                continue
+        groups = self._by_tool.get(None, [])
+        if isinstance(tool, str) and tool in self._by_tool:
+            groups = groups + self._by_tool[tool]
+        # Each text (and its normalized view) is built at most once per trace, on first use
+        texts: Dict[Tuple[Optional[str], str], Optional[Segments]] = {}
+        plan: List[Tuple[_RuleGroup, Segments]] = []
+        for g in groups:
+            raw_key = (g.arg_path, "raw")
+            if raw_key not in texts:
+                if g.arg_path is None:
+                    texts[raw_key] = self._walker.trace_segments(content)
+                else:
+                    value = _resolve_arg(content.get("args"), g.arg_path)
+                    texts[raw_key] = None if value is None else self._walker.value_segments(value)
+            key = (g.arg_path, g.view)
+            if key not in texts:
+                raw = texts[raw_key]
+                view = None
+                if raw is not None:
+                    view = Segments(normalize(seg) for seg in raw)
+                    view.truncated = raw.truncated
+                texts[key] = view
+            segments = texts[key]
+            if segments is not None:
+                plan.append((g, segments))
+        return plan
 
-        # NLP phrase evaluation
-        if self._nlp and self._nlp_matcher and self._nlp_rules:
-            try:
-                doc = self._nlp(text)
-                spans = self._nlp_matcher(doc)
-                # spans are tuples (match_id, start, end); map back to rules by label
-                seen_rules: set[str] = set()
-                for match_id, start, end in spans:
-                    label = self._nlp.vocab.strings[match_id]
-                    # label format: RULE_<name>
-                    rname = label.removeprefix("RULE_")
-                    if rname in seen_rules:
+    def _limit_reasons(self, plan: List[Tuple[_RuleGroup, Segments]]) -> List[Dict[str, Any]]:
+        if any(segments.truncated for _g, segments in plan):
+            return [_truncated_reason(self._walker)]
+        return []
+
+    def _regex_hits(
+        self,
+        plan: List[Tuple[_RuleGroup, List[str]]],
+        start: int = 0,
+        skip: Optional[Set[int]] = None,
+        decision: Optional[str] = None,
+        first: bool = False,
+        hold_from: Optional[int] = None,
+    ) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        (rule index, reason) for every regex rule matching any segment at or after
+        `start`; rules in `skip` are not run. Segments are scanned in packed chunks:
+        context-free rules search a chunk once and only confirm a chunk match per
+        segment, other rules search each segment. Text before `start` is context for anchors
+        and lookbehinds. A rule is reported as timed out only if no segment matched.
+        `decision` restricts the pass to rules with that decision and `first` stops it
+        at the first match, in rank order. With `hold_from` (streams), a match that ends
+        at the end of the text and starts at or after `hold_from` is not reported: more
+        text may still undo it (`\\b`, `$`, lookaheads).
+        """
+        hits: List[Tuple[int, Dict[str, Any]]] = []
+        clock = time.perf_counter
+        started = clock()
+        deadline = started + self.eval_budget if self.eval_budget else None
+        stop = False
+        # Streams scan one text with context before `start`; it is never packed
+        packed = start == 0 and hold_from is None
+        for g, segments in plan:
+            matched: Dict[int, Dict[str, Any]] = {}
+            timed_out: Dict[int, Dict[str, Any]] = {}
+            if packed and isinstance(segments, Segments):
+                chunks = segments.chunks()
+            else:
+                chunks = [(text, [text]) for text in segments]
+            for chunk, members in chunks:
+                if stop:
+                    break
+                # Only rules whose required literals occur in the text need a full regex run
+                candidates = g.regex_set.candidates(chunk, start)
+                if g.rank is not None:
+                    candidates.sort(key=g.rank.__getitem__)
+                for pos in candidates:
+                    idx = g.regex[pos]
+                    if idx in matched or (skip and idx in skip):
                         continue
-                    seen_rules.add(rname)
-                    # find rule by name
-                    for r in self._nlp_rules:
-                        if r.name == rname:
-                            matches.append({
-                                "rule": r.name,
-                                "severity": r.severity,
-                                "decision": r.decision,
-                                "description": r.description,
-                                "type": "nlp",
-                            })
-                            if DECISION_PRIORITY[r.decision] > DECISION_PRIORITY[agg_decision]:
-                                agg_decision = r.decision
+                    r, cregex = self._compiled_regex[idx]
+                    if decision is not None and r.decision != decision:
+                        continue
+                    st = self._regex_stats[idx]
+                    timeout = self.rule_timeout
+                    # True when the search is cut short by the shared budget, not its own limit
+                    starved = False
+                    if deadline is not None:
+                        remaining = deadline - clock()
+                        if remaining <= 0:
+                            st.timeouts += 1
+                            timed_out[idx] = _timeout_reason(r, self.fail_closed, starved=True)
+                            continue
+                        if not timeout or remaining < timeout:
+                            timeout, starved = remaining, True
+                    t0 = clock()
+                    try:
+                        if len(members) == 1:
+                            texts = members
+                        elif g.regex_set.context_free[pos]:
+                            # No match in the chunk rules out every member
+                            texts = members if search(cregex, chunk, timeout) else []
+                        else:
+                            texts = members
+                        found = None
+                        for text in texts:
+                            found = search(cregex, text, timeout, start)
+                            if hold_from is not None:
+                                while found and found.end() == len(text) and found.start() >= hold_from:
+                                    # Held back; a later match that ends earlier is final
+                                    found = search(cregex, text, timeout, found.start() + 1)
+                            if found:
+                                break
+                    except TimeoutError:
+                        st.timeouts += 1
+                        timed_out[idx] = _timeout_reason(r, self.fail_closed, starved)
+                        continue
+                    except Exception:
+                        continue
+                    finally:
+                        st.evaluations += 1
+                        st.seconds += clock() - t0
+                    if found:
+                        st.matches += 1
+                        matched[idx] = _reason(r, "regex")
+                        if first:
+                            stop = True
                             break
-            except Exception:
-                # Do not fail if spaCy processing errors
-                pass
+            hits.extend(matched.items())
+            hits.extend((idx, reason) for idx, reason in timed_out.items() if idx not in matched)
+            if stop:
+                break
+        engine = self._engine_stats["regex"]
+        engine.evaluations += 1
+        engine.matches += len(hits)
+        engine.seconds += clock() - started
+        return hits
+
+    def _regex_matches(self, plan: List[Tuple[_RuleGroup, List[str]]]) -> List[Dict[str, Any]]:
+        hits = self._regex_hits(plan)
+        # Report in rule order regardless of scope
+        hits.sort(key=lambda h: h[0])
+        return [reason for _idx, reason in hits]
+
+    def _nlp_enabled(self) -> bool:
+        return any(g.automaton is not None or g.matcher is not None for g in self._groups)
+
+    def _make_doc(self, text: str):
+        if self._tokenizer_only:
+            return self._nlp.make_doc(text)
+        return self._nlp(text)
+
+    def _nlp_docs(self, texts: List[str], batch_size: int):
+        if self._tokenizer_only:
+            return self._nlp.tokenizer.pipe(texts, batch_size=batch_size)
+        return self._nlp.pipe(texts, batch_size=batch_size)
+
+    def _phrase_matches(self, g: _RuleGroup, segments: List[str], docs: Dict[str, Any]) -> List[Dict[str, Any]]:
+        hits: List[int] = []
+        for text in segments:
+            if g.automaton is not None:
+                hits.extend(g.nlp[pos] for _start, pos in g.automaton.find(tokenize(text)))
+            elif g.matcher is not None:
+                doc = docs.get(text)
+                if doc is None:
+                    doc = docs[text] = self._make_doc(text)
+                # spans are tuples (match_id, start, end); map back to rules by label
+                hits.extend(
+                    g.nlp[int(self._nlp.vocab.strings[match_id].removeprefix("RULE_"))]
+                    for match_id, _start, _end in g.matcher(doc)
+                )
+            else:
+                return []
+        # Report each rule once, in order of its first occurrence
+        matches: List[Dict[str, Any]] = []
+        seen: set[int] = set()
+        for idx in hits:
+            if idx not in seen:
+                seen.add(idx)
+                self._nlp_stats[idx].matches += 1
+                matches.append(_reason(self._nlp_rules[idx], "nlp"))
+        return matches
+
+    def _nlp_matches(self, plan: List[Tuple[_RuleGroup, List[str]]], docs: Dict[str, Any]) -> List[Dict[str, Any]]:
+        matches: List[Dict[str, Any]] = []
+        started = time.perf_counter()
+        for g, segments in plan:
+            if g.nlp:
+                # One phrase pass covers every rule of the group
+                for idx in g.nlp:
+                    self._nlp_stats[idx].evaluations += 1
+                try:
+                    matches.extend(self._phrase_matches(g, segments, docs))
+                except Exception:
+                    # Do not fail if spaCy processing errors
+                    continue
+        engine = self._engine_stats["nlp"]
+        engine.evaluations += 1
+        engine.matches += len(matches)
+        engine.seconds += time.perf_counter() - started
+        return matches
+
+    def _decide(self, plan: List[Tuple[_RuleGroup, Segments]]) -> Dict[str, Any]:
+        """
+        Short-circuit evaluation: block rules first, then warn rules, each tier stopping
+        at its first match. The decision equals that of a full evaluation; the reasons
+        only justify it and the verdict is marked `partial` when others may be missing.
+        """
+        phrases: Optional[List[Dict[str, Any]]] = None
+        timeouts: List[Dict[str, Any]] = []
+        for decision in ("block", "warn"):
+            hits = self._regex_hits(plan, decision=decision, first=True)
+            found = [r for _idx, r in hits if not r.get("timed_out")]
+            timeouts += [r for _idx, r in hits if r.get("timed_out")]
+            if not found and decision in self._nlp_decisions and self._nlp_enabled():
+                if phrases is None:
+                    # One phrase pass serves both tiers
+                    phrases = self._nlp_matches(plan, {})
+                found = [r for r in phrases if r["decision"] == decision][:1]
+            if found or timeouts:
+                # A block rule that timed out on its own blocks (failing closed); other
+                # timeouts report `warn`, which settles the decision once no rule blocks
+                return {**_verdict(found + timeouts + self._limit_reasons(plan)), "partial": True}
+        verdict = _verdict(self._limit_reasons(plan))
+        if self._allow_rules:
+            # Matching allow rules were not collected
+            verdict["partial"] = True
+        return verdict
+
+    def evaluate(self, content: Dict[str, Any], mode: str = "full") -> Dict[str, Any]:
+        """
+        Evaluate one trace. `mode="decision"` stops at the first rule that settles the
+        decision (see _decide) instead of collecting every matching rule.
+        """
+        if mode not in EVAL_MODES:
+            raise ValueError(f"mode must be one of {EVAL_MODES}")
+        self._maybe_reorder()
+        plan = self._plan(content)
+        if mode == "decision":
+            return self._decide(plan)
+        matches = self._regex_matches(plan)
+
+        # NLP phrase evaluation
+        if self._nlp_enabled():
+            matches.extend(self._nlp_matches(plan, {}))
+
+        return _verdict(matches + self._limit_reasons(plan))
+
+    def evaluate_many(self, contents: List[Dict[str, Any]], batch_size: int = 64) -> List[Dict[str, Any]]:
+        """
+        Evaluate several payloads at once. Results are in input order and identical to
+        calling evaluate() on each; spaCy documents are produced in batches via pipe().
+        """
+        self._maybe_reorder(len(contents))
+        plans = [self._plan(c) for c in contents]
+        results = [self._regex_matches(plan) for plan in plans]
+
+        if self._nlp_enabled():
+            docs: Dict[str, Any] = {}
+            if self._nlp is not None:
+                texts = list(dict.fromkeys(
+                    t for plan in plans for g, segments in plan if g.matcher is not None for t in segments
+                ))
+                try:
+                    docs = dict(zip(texts, self._nlp_docs(texts, batch_size)))
+                except Exception:
+                    # Do not fail if spaCy processing errors
+                    docs = {}
+            for matches, plan in zip(results, plans):
+                matches.extend(self._nlp_matches(plan, docs))
+
+        return [_verdict(m + self._limit_reasons(plan)) for m, plan in zip(results, plans)]
+
+    def stream(self, overlap: Optional[int] = None) -> "StreamEvaluator":
+        """Start incremental evaluation of one text trace delivered in chunks."""
+        from .stream import StreamEvaluator
+
+        return StreamEvaluator(self, overlap=overlap)
 
-        return {"decision": agg_decision, "reasons": matches}
+    def stats(self) -> Dict[str, Any]:
+        """
+        Per-rule and per-engine counters: full evaluations, matches, cumulative seconds and
+        timeouts. Regex rules skipped by the literal prefilter are not counted as evaluated;
+        phrase time is only attributed per engine since one pass serves a whole group.
+        """
+        rules = [
+            {"rule": r.name, "engine": "regex", **st.as_dict()}
+            for (r, _c), st in zip(self._compiled_regex, self._regex_stats)
+        ] + [
+            {"rule": r.name, "engine": "nlp", **st.as_dict()}
+            for r, st in zip(self._nlp_rules, self._nlp_stats)
+        ]
+        engines = {name: st.as_dict() for name, st in self._engine_stats.items()}
+        return {"rules": rules, "engines": engines}
 
     @classmethod
     def from_yaml(cls, yaml_text: str) -> "StaticVerifier":
@@ -184,5 +790,8 @@ class StaticVerifier:
                 enabled=bool(it.get("enabled", True)),
                 description=it.get("description"),
                 rule_type=it.get("type", "regex"),
+                tool=it.get("tool"),
+                arg_path=it.get("arg_path"),
+                view=it.get("view", "raw"),
             ))
         return cls(rules=rules)
@@ -0,0 +1,139 @@
+from typing import Any, Dict, List, Optional
+import os
+
+from .phrase_engine import tokenize, tokenize_partial
+from .static_rules import StaticVerifier, _reason, _verdict
+
+
+class StreamEvaluator:
+    """
+    Incremental evaluation of one text trace (e.g. a streamed assistant reply) delivered
+    in chunks, using the raw-view rules that apply to every trace and scan its whole
+    text. For those rules the result equals evaluating {"text": <all chunks joined>},
+    except that a regex or spaCy match is missed if it starts more than `overlap`
+    characters before the chunk that completes it (STREAM_OVERLAP_CHARS, default 1024).
+
+    - Regex rules rescan the last `overlap` characters of the previous chunks together
+      with the new chunk, so a match split across chunks is found once it completes.
+      A match ending exactly at the end of the text so far is only reported once the
+      next chunk (or close()) confirms it, since `\\b`, `$` or a lookahead may fail on
+      the text that follows. A rule that matched is not run again.
+    - Aho-Corasick phrase rules keep the automaton state and the trailing, possibly
+      incomplete token between chunks; no text is rescanned.
+    - spaCy phrase rules match on the same overlapping window as regex rules.
+
+    `feed()` returns the verdict so far; once it is "block" callers can stop generating.
+    """
+
+    def __init__(self, verifier: StaticVerifier, overlap: Optional[int] = None):
+        self.verifier = verifier
+        if overlap is None:
+            overlap = int(os.getenv("STREAM_OVERLAP_CHARS", "1024"))
+        self.overlap = max(overlap, 0)
+        self._group = next(
+            (g for g in verifier._by_tool.get(None, []) if g.arg_path is None and g.view == "raw"), None
+        )
+        # Last overlap+1 characters already scanned; the extra one is anchor/\b context
+        self._tail = ""
+        self._length = 0
+        self._state = 0  # automaton state after the consumed tokens
+        self._pending = ""  # trailing token that may continue in the next chunk
+        self._regex_hits: Dict[int, Dict[str, Any]] = {}
+        self._timeouts: Dict[int, Dict[str, Any]] = {}
+        self._phrase_hits: Dict[int, Dict[str, Any]] = {}
+        self.closed = False
+
+    @property
+    def blocked(self) -> bool:
+        return self.verdict()["decision"] == "block"
+
+    def verdict(self) -> Dict[str, Any]:
+        timeouts = {i: r for i, r in self._timeouts.items() if i not in self._regex_hits}
+        regex = {**self._regex_hits, **timeouts}
+        reasons = [dict(regex[i]) for i in sorted(regex)] + [dict(r) for r in self._phrase_hits.values()]
+        return _verdict(reasons)
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        if self.closed:
+            raise ValueError("stream is closed")
+        g = self._group
+        if g is None or not chunk:
+            self._length += len(chunk)
+            return self.verdict()
+        window = self._tail + chunk
+        # The first character is context only once earlier text has been cut off
+        start = 1 if self._length > len(self._tail) else 0
+        if g.regex:
+            self._scan_regex(g, window, start)
+        if g.automaton is not None:
+            tokens, self._pending = tokenize_partial(self._pending + chunk)
+            self._scan_phrases(g, tokens)
+        elif g.matcher is not None:
+            self._scan_spacy(g, window, start)
+        self._length += len(chunk)
+        self._tail = window[-(self.overlap + 1):]
+        return self.verdict()
+
+    def close(self) -> Dict[str, Any]:
+        """Finish the stream (flushing a trailing phrase token) and return the verdict."""
+        if not self.closed:
+            g = self._group
+            if g is not None and g.regex and self._tail:
+                # Confirm matches held back at the end of the last chunk
+                start = 1 if self._length > len(self._tail) else 0
+                self._scan_regex(g, self._tail, start, final=True)
+            if g is not None and g.automaton is not None and self._pending:
+                self._scan_phrases(g, tokenize(self._pending))
+                self._pending = ""
+            elif g is not None and g.matcher is not None and self._tail:
+                start = 1 if self._length > len(self._tail) else 0
+                self._scan_spacy(g, self._tail, start, final=True)
+            self.closed = True
+        return self.verdict()
+
+    def _scan_regex(self, g, window: str, start: int, final: bool = False) -> None:
+        v = self.verifier
+        # Matches starting in the part of the window kept for the next chunk can be held
+        # back; one starting earlier would not be seen again, so it is reported as is
+        hold_from = None if final else max(len(window) - self.overlap, start)
+        hits = v._regex_hits([(g, [window])], start, skip=set(self._regex_hits), hold_from=hold_from)
+        for idx, reason in hits:
+            if reason.get("timed_out"):
+                self._timeouts[idx] = reason
+            else:
+                self._regex_hits[idx] = reason
+
+    def _scan_phrases(self, g, tokens: List[str]) -> None:
+        automaton = g.automaton
+        state = self._state
+        for tok in tokens:
+            state = automaton.step(state, tok)
+            for pos, _length in automaton.outputs(state):
+                self._add_phrase(g.nlp[pos])
+        self._state = state
+
+    def _scan_spacy(self, g, window: str, start: int, final: bool = False) -> None:
+        v = self.verifier
+        if start:
+            # Do not let a word cut in half at the window edge look like a whole token
+            cut = next((i for i, ch in enumerate(window) if ch.isspace()), len(window))
+            window = window[cut:]
+        # Until the stream is closed, a phrase ending on the last word may still grow
+        # into a different word ("database" -> "databases")
+        open_end = not final and window[-1:].isalnum()
+        try:
+            doc = v._make_doc(window)
+            for match_id, _start, end in g.matcher(doc):
+                if open_end and end == len(doc):
+                    continue
+                pos = int(v._nlp.vocab.strings[match_id].removeprefix("RULE_"))
+                self._add_phrase(g.nlp[pos])
+        except Exception:
+            # Do not fail if spaCy processing errors
+            return
+
+    def _add_phrase(self, idx: int) -> None:
+        if idx not in self._phrase_hits:
+            v = self.verifier
+            v._nlp_stats[idx].matches += 1
+            self._phrase_hits[idx] = _reason(v._nlp_rules[idx], "nlp")
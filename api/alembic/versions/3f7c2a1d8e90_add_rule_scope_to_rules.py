@@ -0,0 +1,29 @@
+"""
+add_rule_scope_to_rules
+
+Revision ID: 3f7c2a1d8e90
+Revises: 9b1a0b2c3d45
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3f7c2a1d8e90'
+down_revision = '9b1a0b2c3d45'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Optional scope: rules with NULL tool/arg_path keep applying to the whole trace
+    with op.batch_alter_table('rules') as batch_op:
+        batch_op.add_column(sa.Column('tool', sa.String(length=128), nullable=True))
+        batch_op.add_column(sa.Column('arg_path', sa.String(length=256), nullable=True))
+        batch_op.create_index('ix_rules_tool', ['tool'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('rules') as batch_op:
+        batch_op.drop_index('ix_rules_tool')
+        batch_op.drop_column('arg_path')
+        batch_op.drop_column('tool')
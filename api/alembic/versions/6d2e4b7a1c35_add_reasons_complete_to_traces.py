@@ -0,0 +1,25 @@
+"""
+add_reasons_complete_to_traces
+
+Revision ID: 6d2e4b7a1c35
+Revises: 3f7c2a1d8e90
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '6d2e4b7a1c35'
+down_revision = '3f7c2a1d8e90'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Existing traces were evaluated in full
+    with op.batch_alter_table('traces') as batch_op:
+        batch_op.add_column(sa.Column('reasons_complete', sa.Boolean(), nullable=False, server_default=sa.true()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('traces') as batch_op:
+        batch_op.drop_column('reasons_complete')
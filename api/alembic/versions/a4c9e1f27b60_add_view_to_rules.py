@@ -0,0 +1,25 @@
+"""
+add_view_to_rules
+
+Revision ID: a4c9e1f27b60
+Revises: 6d2e4b7a1c35
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a4c9e1f27b60'
+down_revision = '6d2e4b7a1c35'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Existing rules keep matching the raw text
+    with op.batch_alter_table('rules') as batch_op:
+        batch_op.add_column(sa.Column('view', sa.String(length=16), nullable=False, server_default='raw'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('rules') as batch_op:
+        batch_op.drop_column('view')
@@ -0,0 +1,33 @@
+"""
+add_rule_set_version
+
+Revision ID: c3b8d5f0a912
+Revises: a4c9e1f27b60
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c3b8d5f0a912'
+down_revision = 'a4c9e1f27b60'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    table = op.create_table(
+        'rule_set_version',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.bulk_insert(table, [{'id': 1, 'version': 0}])
+    # Traces recorded before this revision have no version
+    with op.batch_alter_table('traces') as batch_op:
+        batch_op.add_column(sa.Column('rule_version', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('traces') as batch_op:
+        batch_op.drop_column('rule_version')
+    op.drop_table('rule_set_version')
@@ -1,13 +1,51 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from api.settings import settings
 
 engine = create_engine(settings.database_url, echo=False, future=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False, future=True)
 
+# Async drivers for the same database, used by the hot ingest/read endpoints
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with its driver swapped for the async one (psycopg2 -> asyncpg, sqlite -> aiosqlite)."""
+    u = make_url(url)
+    driver = _ASYNC_DRIVERS.get(u.get_backend_name())
+    if driver is None or u.drivername == driver:
+        return url
+    return u.set(drivername=driver).render_as_string(hide_password=False)
+
+_async_url = async_database_url(settings.database_url)
+async_engine = create_async_engine(
+    _async_url,
+    echo=False,
+    # SQLite connections are cheap to open and must not outlive the event loop they were made on
+    **({"poolclass": NullPool} if _async_url.startswith("sqlite") else {}),
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+def _sqlite_foreign_keys(dbapi_connection, _connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+# SQLite only enforces foreign keys when asked to, per connection. Ingest trusts cached
+# session ids and relies on the insert failing for a session deleted meanwhile.
+for _engine in (engine, async_engine.sync_engine):
+    if _engine.dialect.name == "sqlite":
+        event.listen(_engine, "connect", _sqlite_foreign_keys)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,7 +1,13 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from api.metrics import CONTENT_TYPE, render_all
 
 router = APIRouter(tags=["health"])
 
 @router.get("/healthz")
 def healthz():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_all(), media_type=CONTENT_TYPE)
\ No newline at end of file
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Body, Request, Response
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session as OrmSession
 from sqlalchemy import select
 from api.db import get_db
 from api.models import Rule as RuleModel, AuditLog
-from api.schemas import RuleCreate, RuleUpdate, RuleOut
+from api.schemas import RuleCreate, RuleUpdate, RuleOut, RulePreview
 import re
 import yaml
 from api.auth import require_api_key
+from api.settings import settings
+from agentsentry.verifier.regex_engine import slow_input
+from agentsentry.verifier.normalize import VIEWS
+from agentsentry.verifier.static_rules import Rule
+from api.rule_preview import apply_diff, run_preview, trace_chunks
+from api.verifier_store import store
+from api import rule_version
+from api.responses import dumps
+from api.rule_loader import db_rule_version
 
 router = APIRouter(prefix="/rules", tags=["rules"])
 
@@ -16,23 +25,66 @@ def _validate_regex(pattern: str):
         re.compile(pattern)
     except re.error as e:
         raise HTTPException(status_code=422, detail=f"Invalid regex: {e}")
+    # Reject patterns that backtrack catastrophically on adversarial input
+    limit_ms = settings.regex_save_check_ms
+    if limit_ms > 0:
+        slow = slow_input(pattern, timeout=limit_ms / 1000.0)
+        if slow:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Regex too slow: exceeded {limit_ms:g} ms on input {slow}",
+            )
+
+def _rule_out(r: RuleModel) -> RuleOut:
+    return RuleOut(
+        id=r.id,
+        name=r.name,
+        pattern=r.pattern,
+        rule_type=getattr(r, "rule_type", "regex") or "regex",
+        severity=r.severity,
+        decision=r.decision,
+        enabled=bool(r.enabled),
+        description=r.description,
+        tool=r.tool,
+        arg_path=r.arg_path,
+        view=r.view or "raw",
+    )
+
+# Serialized GET /rules and /rules/export bodies by name, with the rule-set version they
+# were built for. Every rule write bumps the version, which invalidates them.
+_rendered: Dict[str, Tuple[int, bytes]] = {}
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    # Weak comparison, as for any GET
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+def _versioned(request: Request, db: OrmSession, name: str, build: Callable[[], Any]) -> Response:
+    """
+    Answer a rule read from the rule-set version alone when possible: 304 if the client
+    already holds this version, else the cached body for it (built on the first miss).
+    """
+    version = db_rule_version(db)
+    etag = f'"{name}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    cached = _rendered.get(name)
+    if cached is None or cached[0] != version:
+        cached = (version, dumps(build()))
+        _rendered[name] = cached
+    return Response(content=cached[1], media_type="application/json", headers=headers)
+
+def _all_rules(db: OrmSession) -> List[RuleModel]:
+    return db.execute(select(RuleModel).order_by(RuleModel.id.asc())).scalars().all()
 
 @router.get("", response_model=List[RuleOut])
-def list_rules(db: OrmSession = Depends(get_db)):
-    rows = db.execute(select(RuleModel).order_by(RuleModel.id.asc())).scalars().all()
-    return [
-        RuleOut(
-            id=r.id,
-            name=r.name,
-            pattern=r.pattern,
-            rule_type=getattr(r, "rule_type", "regex") or "regex",
-            severity=r.severity,
-            decision=r.decision,
-            enabled=bool(r.enabled),
-            description=r.description,
-        )
-        for r in rows
-    ]
+def list_rules(request: Request, db: OrmSession = Depends(get_db)):
+    return _versioned(
+        request, db, "rules", lambda: [_rule_out(r).model_dump(mode="json") for r in _all_rules(db)]
+    )
 
 @router.post("", response_model=RuleOut, dependencies=[Depends(require_api_key)])
 def create_rule(payload: RuleCreate, db: OrmSession = Depends(get_db)):
@@ -51,21 +103,16 @@ def create_rule(payload: RuleCreate, db: OrmSession = Depends(get_db)):
         decision=payload.decision,
         enabled=1 if payload.enabled else 0,
         description=payload.description,
+        tool=payload.tool or None,
+        arg_path=payload.arg_path or None,
+        view=payload.view,
     )
-    db.add(row); db.commit(); db.refresh(row)
+    db.add(row); rule_version.bump(db); db.commit(); db.refresh(row)
     # audit
     db.add(AuditLog(actor="api", action="rule_create", target_type="rule", target_id=str(row.id), details={"name": row.name}))
     db.commit()
-    return RuleOut(
-        id=row.id,
-        name=row.name,
-        pattern=row.pattern,
-        rule_type=getattr(row, "rule_type", "regex") or "regex",
-        severity=row.severity,
-        decision=row.decision,
-        enabled=bool(row.enabled),
-        description=row.description,
-    )
+    rule_version.changed(db)
+    return _rule_out(row)
 
 @router.put("/{rule_id}", response_model=RuleOut, dependencies=[Depends(require_api_key)])
 def update_rule(rule_id: int, payload: RuleUpdate, db: OrmSession = Depends(get_db)):
@@ -95,20 +142,21 @@ def update_rule(rule_id: int, payload: RuleUpdate, db: OrmSession = Depends(get_
         row.enabled = 1 if payload.enabled else 0
     if payload.description is not None:
         row.description = payload.description
-    db.add(row); db.commit(); db.refresh(row)
+    # Empty string clears the scope
+    if payload.tool is not None:
+        row.tool = payload.tool or None
+    if payload.arg_path is not None:
+        row.arg_path = payload.arg_path or None
+    if payload.view is not None:
+        if payload.view not in VIEWS:
+            raise HTTPException(status_code=422, detail=f"view must be one of {list(VIEWS)}")
+        row.view = payload.view
+    db.add(row); rule_version.bump(db); db.commit(); db.refresh(row)
     # audit
     db.add(AuditLog(actor="api", action="rule_update", target_type="rule", target_id=str(row.id), details={"name": row.name}))
     db.commit()
-    return RuleOut(
-        id=row.id,
-        name=row.name,
-        pattern=row.pattern,
-        rule_type=getattr(row, "rule_type", "regex") or "regex",
-        severity=row.severity,
-        decision=row.decision,
-        enabled=bool(row.enabled),
-        description=row.description,
-    )
+    rule_version.changed(db)
+    return _rule_out(row)
 
 @router.patch("/{rule_id}/toggle", response_model=RuleOut, dependencies=[Depends(require_api_key)])
 def toggle_rule(rule_id: int, enabled: bool = Body(..., embed=True), db: OrmSession = Depends(get_db)):
@@ -116,30 +164,23 @@ def toggle_rule(rule_id: int, enabled: bool = Body(..., embed=True), db: OrmSess
     if not row:
         raise HTTPException(status_code=404, detail="rule not found")
     row.enabled = 1 if enabled else 0
-    db.add(row); db.commit(); db.refresh(row)
+    db.add(row); rule_version.bump(db); db.commit(); db.refresh(row)
     # audit
     db.add(AuditLog(actor="api", action="rule_toggle", target_type="rule", target_id=str(row.id), details={"enabled": bool(row.enabled)}))
     db.commit()
-    return RuleOut(
-        id=row.id,
-        name=row.name,
-        pattern=row.pattern,
-        rule_type=getattr(row, "rule_type", "regex") or "regex",
-        severity=row.severity,
-        decision=row.decision,
-        enabled=bool(row.enabled),
-        description=row.description,
-    )
+    rule_version.changed(db)
+    return _rule_out(row)
 
 @router.delete("/{rule_id}", dependencies=[Depends(require_api_key)])
 def delete_rule(rule_id: int, db: OrmSession = Depends(get_db)):
     row = db.get(RuleModel, rule_id)
     if not row:
         raise HTTPException(status_code=404, detail="rule not found")
-    db.delete(row); db.commit()
+    db.delete(row); rule_version.bump(db); db.commit()
     # audit
     db.add(AuditLog(actor="api", action="rule_delete", target_type="rule", target_id=str(rule_id), details=None))
     db.commit()
+    rule_version.changed(db)
     return {"ok": True}
 
 @router.post("/import", dependencies=[Depends(require_api_key)])
@@ -158,8 +199,13 @@ def import_rules(yaml_text: str = Body(..., media_type="text/plain"), db: OrmSes
         decision = it.get("decision", "warn")
         enabled = bool(it.get("enabled", True))
         description = it.get("description")
+        tool = it.get("tool") or None
+        arg_path = it.get("arg_path") or None
+        view = it.get("view") or "raw"
         if not name or not pattern:
             continue
+        if view not in VIEWS:
+            raise HTTPException(status_code=422, detail=f"Rule {name}: view must be one of {list(VIEWS)}")
         if rule_type == "regex":
             _validate_regex(pattern)
         exists = db.execute(select(RuleModel).where(RuleModel.name == name)).scalar_one_or_none()
@@ -173,17 +219,78 @@ def import_rules(yaml_text: str = Body(..., media_type="text/plain"), db: OrmSes
             decision=decision,
             enabled=1 if enabled else 0,
             description=description,
+            tool=tool,
+            arg_path=arg_path,
+            view=view,
         )
         db.add(row); created += 1
+    if created:
+        rule_version.bump(db)
     db.commit()
     # audit
     db.add(AuditLog(actor="api", action="rule_import", target_type="rule", target_id="*", details={"created": created}))
     db.commit()
+    if created:
+        rule_version.changed(db)
     return {"created": created}
 
+def _proposed_rule(payload: RuleCreate) -> Rule:
+    if payload.rule_type == "regex":
+        _validate_regex(payload.pattern)
+    return Rule(
+        name=payload.name,
+        pattern=payload.pattern,
+        severity=payload.severity,
+        decision=payload.decision,
+        enabled=payload.enabled,
+        description=payload.description,
+        rule_type=payload.rule_type,
+        tool=payload.tool or None,
+        arg_path=payload.arg_path or None,
+        view=payload.view,
+    )
+
+@router.post("/preview", dependencies=[Depends(require_api_key)])
+def preview_rules(payload: RulePreview, db: OrmSession = Depends(get_db)):
+    """
+    Re-evaluate recent stored traces with the current rules and with a proposed rule set
+    (or a diff against the current one) and report how the decisions would change.
+    """
+    current = list(store.get().rules)
+    if payload.rules is not None:
+        proposed = [_proposed_rule(r) for r in payload.rules]
+    else:
+        proposed = apply_diff(current, [_proposed_rule(r) for r in payload.add], payload.remove)
+    # Disabled rules are not loaded, so they don't count either
+    proposed = [r for r in proposed if r.enabled]
+    limit = max(0, min(payload.limit, settings.rule_preview_max_traces))
+    budget_ms = settings.rule_preview_budget_ms
+    if payload.budget_ms is not None:
+        budget_ms = max(0.0, min(payload.budget_ms, budget_ms))
+    chunks = trace_chunks(
+        db,
+        chunk_size=max(1, settings.rule_preview_chunk),
+        limit=limit,
+        since=payload.since,
+        until=payload.until,
+        session_id=payload.session_id,
+    )
+    result = run_preview(
+        chunks,
+        before=current,
+        after=proposed,
+        workers=settings.rule_preview_workers,
+        budget_s=budget_ms / 1000.0,
+        examples=max(0, payload.examples),
+    )
+    return {**result, "rules_before": len(current), "rules_after": len(proposed)}
+
 @router.get("/export")
-def export_rules(db: OrmSession = Depends(get_db)):
-    rows = db.execute(select(RuleModel).order_by(RuleModel.id.asc())).scalars().all()
+def export_rules(request: Request, db: OrmSession = Depends(get_db)):
+    return _versioned(request, db, "export", lambda: _export(db))
+
+def _export(db: OrmSession) -> Dict[str, str]:
+    rows = _all_rules(db)
     payload = {
         "rules": [
             {
@@ -194,6 +301,10 @@ def export_rules(db: OrmSession = Depends(get_db)):
                 "decision": r.decision,
                 "enabled": bool(r.enabled),
                 "description": r.description,
+                # Scope keys only for scoped rules, keeping exports of global rules unchanged
+                **({"tool": r.tool} if r.tool else {}),
+                **({"arg_path": r.arg_path} if r.arg_path else {}),
+                **({"view": r.view} if r.view and r.view != "raw" else {}),
             }
             for r in rows
         ]
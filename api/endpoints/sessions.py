@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session as OrmSession
 from sqlalchemy import select
-from api.db import get_db
+from api.db import get_db, get_async_db
 from api.models import Session as SessionModel, Trace as TraceModel
+from api.session_cache import known_sessions
 import uuid
 from datetime import datetime
 
@@ -46,6 +48,7 @@ def create_session(
     db.add(obj)
     db.commit()
     db.refresh(obj)
+    known_sessions.add([obj.id])
     return {
         "id": obj.id,
         "title": obj.title,
@@ -72,17 +75,18 @@ def delete_session(session_id: str, db: OrmSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="session not found")
     db.delete(obj)
     db.commit()
+    known_sessions.invalidate(session_id)
     return {"id": session_id, "deleted": True}
 
 @router.get("/{session_id}/traces", response_model=List[Dict])
-def list_traces_for_session(
+async def list_traces_for_session(
     session_id: str,
-    db: OrmSession = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     limit: int = Query(50, ge=1, le=200),
     cursor: Optional[str] = Query(None, description="Return items created before this ISO timestamp"),
 ):
     # If session not found, return empty list (avoids UX errors for stale links)
-    if not db.get(SessionModel, session_id):
+    if session_id not in known_sessions and not await db.get(SessionModel, session_id):
         return []
 
     stmt = (
@@ -97,13 +101,14 @@ def list_traces_for_session(
         except ValueError:
             raise HTTPException(status_code=422, detail="Invalid cursor timestamp format; use ISO 8601")
 
-    rows = db.execute(stmt.limit(limit)).scalars().all()
+    rows = (await db.execute(stmt.limit(limit))).scalars().all()
     return [
         {
             "id": t.id,
             "role": t.role,
             "decision": t.decision.value,
             "reasons": t.reasons or [],
+            "reasons_complete": t.reasons_complete,
             "created_at": t.created_at.isoformat() if t.created_at else None,
         }
         for t in rows
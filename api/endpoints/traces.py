@@ -1,76 +1,355 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from typing import Dict, Any, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session as OrmSession
-from sqlalchemy import select
-from api.db import get_db
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from api.db import get_db, get_async_db
 from api.models import Trace as TraceModel, Session as SessionModel, DecisionEnum, AuditLog
 import uuid
-from agentsentry.verifier.static_rules import StaticVerifier
+from agentsentry.verifier.static_rules import StaticVerifier, EVAL_MODES
+from api.settings import settings
 from api.verifier_store import store
+from api.stream_registry import OpenStream, streams
+from api import job_queue
+from api.session_cache import known_sessions
+from api.write_behind import writer
 
 router = APIRouter(prefix="/traces", tags=["traces"])
 
-@router.post("", response_model=Dict)
-def ingest_trace(payload: Dict[str, Any], db: OrmSession = Depends(get_db)):
-    session_id = payload.get("session_id")
+# Known session ids skip the lookup; unknown ones are checked in the DB and then cached
+
+def _require_session(db: OrmSession, session_id: Optional[str]) -> str:
     if not session_id:
         raise HTTPException(status_code=422, detail="session_id is required")
-    if not db.get(SessionModel, session_id):
-        raise HTTPException(status_code=404, detail="session not found")
+    if session_id not in known_sessions:
+        if not db.get(SessionModel, session_id):
+            raise HTTPException(status_code=404, detail="session not found")
+        known_sessions.add([session_id])
+    return session_id
 
-    role = payload.get("role", "assistant")
-    content = payload.get("content", {})
+async def _require_session_async(db: AsyncSession, session_id: Optional[str]) -> str:
+    if not session_id:
+        raise HTTPException(status_code=422, detail="session_id is required")
+    if session_id not in known_sessions:
+        if not await db.get(SessionModel, session_id):
+            raise HTTPException(status_code=404, detail="session not found")
+        known_sessions.add([session_id])
+    return session_id
 
-    # Static verification
-    # Always fetch current verifier (supports /rules/reload)
-    verifier = store.get()
-    verdict = verifier.evaluate(content)
-    decision = verdict["decision"]
-    reasons = verdict["reasons"]
-
-    tid = uuid.uuid4().hex[:16]
-    row = TraceModel(
-        id=tid,
-        session_id=session_id,
-        role=role,
-        content=content,
-        decision=DecisionEnum(decision),
-        reasons=reasons,
-    )
+def _trace_values(session_id: str, role: str, content: Any, verdict: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": uuid.uuid4().hex[:16],
+        "session_id": session_id,
+        "role": role,
+        "content": content,
+        "decision": DecisionEnum(verdict["decision"]),
+        "reasons": verdict["reasons"],
+        "reasons_complete": not verdict.get("partial"),
+        "rule_version": verdict.get("rule_version"),
+    }
+
+def _audit_values(trace_id: str, reasons: Any) -> Dict[str, Any]:
+    return {
+        "actor": "system",
+        "action": "trace_block",
+        "target_type": "trace",
+        "target_id": trace_id,
+        "details": {"reasons": reasons},
+    }
+
+def _trace_row(session_id: str, role: str, content: Dict[str, Any], verdict: Dict[str, Any]) -> TraceModel:
+    return TraceModel(**_trace_values(session_id, role, content, verdict))
+
+def _block_audit(row: TraceModel) -> AuditLog:
+    return AuditLog(**_audit_values(row.id, row.reasons))
+
+def _enqueue_dynamic_check(trace_id: str) -> None:
+    # Buffered and sent in pipelined batches; never waits on Redis unless enqueuing inline
+    job_queue.enqueue("worker.jobs.dynamic_check_trace", trace_id)
+
+def _enqueue_dynamic_checks(trace_ids: List[str]) -> None:
+    job_queue.enqueue_batch("worker.jobs.dynamic_check_trace", [(tid,) for tid in trace_ids])
+
+def _record_trace(
+    db: OrmSession,
+    session_id: str,
+    role: str,
+    content: Dict[str, Any],
+    verdict: Dict[str, Any],
+) -> TraceModel:
+    """Persist a verified trace, audit blocks and enqueue the dynamic check."""
+    row = _trace_row(session_id, role, content, verdict)
     db.add(row); db.commit(); db.refresh(row)
 
     # Audit 'block' decisions
-    if decision == "block":
+    if row.decision == DecisionEnum.block:
         try:
-            db.add(
-                AuditLog(
-                    actor="system",
-                    action="trace_block",
-                    target_type="trace",
-                    target_id=row.id,
-                    details={"reasons": reasons},
-                )
-            )
+            db.add(_block_audit(row))
             db.commit()
         except Exception:
             db.rollback()
 
-    # Enqueue dynamic check
+    _enqueue_dynamic_check(row.id)
+    return row
+
+async def _record_trace_async(
+    db: AsyncSession,
+    session_id: str,
+    role: str,
+    content: Dict[str, Any],
+    verdict: Dict[str, Any],
+) -> TraceModel:
+    """Persist a verified trace, audit blocks and enqueue the dynamic check."""
+    row = _trace_row(session_id, role, content, verdict)
+    db.add(row)
+    await db.commit()
+
+    # Audit 'block' decisions
+    if row.decision == DecisionEnum.block:
+        try:
+            db.add(_block_audit(row))
+            await db.commit()
+        except Exception:
+            await db.rollback()
+
+    if job_queue.batcher.inline:
+        # ENQUEUE_FLUSH_MS=0 makes this a Redis round trip: keep it off the event loop
+        await run_in_threadpool(_enqueue_dynamic_check, row.id)
+    else:
+        _enqueue_dynamic_check(row.id)
+    return row
+
+def _merge_reasons(row: TraceModel, verdict: Dict[str, Any]) -> None:
+    full = verdict["reasons"]
+    names = {r.get("rule") for r in full}
+    # Keep reasons added meanwhile (e.g. by the dynamic check); the decision is left as is
+    row.reasons = full + [r for r in (row.reasons or []) if r.get("rule") not in names]
+    row.reasons_complete = True
+
+def _complete_reasons(db: OrmSession, row: TraceModel) -> None:
+    """Replace the reasons of a decision-only evaluation with the full list."""
+    if row.reasons_complete:
+        return
+    _merge_reasons(row, store.evaluate(row.content or {}))
+    db.add(row); db.commit()
+
+async def _complete_reasons_async(db: AsyncSession, row: TraceModel) -> None:
+    if row.reasons_complete:
+        return
+    _merge_reasons(row, await run_in_threadpool(store.evaluate, row.content or {}))
+    await db.commit()
+
+def _complete_reasons_later(trace_id: str) -> None:
+    from api.db import SessionLocal
+    db = SessionLocal()
     try:
-        from api.job_queue import get_queue
-        q = get_queue()
-        q.enqueue("worker.jobs.dynamic_check_trace", row.id)
+        row = db.get(TraceModel, trace_id)
+        if row is not None:
+            _complete_reasons(db, row)
     except Exception:
-        # Do not fail the request if queue is not available
-        pass
+        # GET /traces/{id} completes it on request instead
+        db.rollback()
+    finally:
+        db.close()
+
+def _ingest_result(
+    trace_id: str,
+    decision: str,
+    reasons: List[Dict[str, Any]],
+    content: Any,
+    lean: bool,
+    **extra: Any,
+) -> Dict[str, Any]:
+    # The echoed payload can be as large as the request itself; lean callers skip it
+    result = {"id": trace_id, "decision": decision, "reasons": reasons, **extra}
+    if not lean:
+        result["payload"] = content
+    return result
+
+# The hot endpoints (ingest, single-trace read, session listing) are async: DB waits no
+# longer hold a threadpool worker, and only the CPU-bound verification runs in one.
+
+@router.post("", response_model=Dict)
+async def ingest_trace(
+    payload: Dict[str, Any],
+    background: BackgroundTasks,
+    lean: bool = Query(False, description="Omit the echoed payload from the response"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    session_id = await _require_session_async(db, payload.get("session_id"))
+
+    role = payload.get("role", "assistant")
+    content = payload.get("content", {})
+    # "decision" answers as soon as the decision is known (e.g. enforcement pre-call checks);
+    # the full reasons are filled in after the response is sent
+    mode = payload.get("mode", "full")
+    if mode not in EVAL_MODES:
+        raise HTTPException(status_code=422, detail=f"mode must be one of {list(EVAL_MODES)}")
+
+    # Static verification
+    # Always use the current verifier (supports /rules/reload); identical payloads hit the cache
+    verdict = await run_in_threadpool(store.evaluate, content, mode)
+    if settings.trace_write_behind:
+        return await _buffer_trace(session_id, role, content, verdict, lean)
+    try:
+        row = await _record_trace_async(db, session_id, role, content, verdict)
+    except IntegrityError:
+        # Session deleted while still cached here (e.g. a missed broadcast)
+        await db.rollback()
+        known_sessions.discard(session_id)
+        raise HTTPException(status_code=404, detail="session not found")
+    if not row.reasons_complete:
+        background.add_task(_complete_reasons_later, row.id)
+
+    return _ingest_result(
+        row.id, row.decision.value, row.reasons or [], content, lean, reasons_complete=row.reasons_complete
+    )
+
+async def _buffer_trace(
+    session_id: str,
+    role: str,
+    content: Any,
+    verdict: Dict[str, Any],
+    lean: bool = False,
+) -> Dict[str, Any]:
+    """
+    Write-behind ingest: answer now, persist with the next group commit. The flusher
+    completes decision-only reasons after writing the row.
+    """
+    trace = _trace_values(session_id, role, content, verdict)
+    audit = _audit_values(trace["id"], trace["reasons"]) if verdict["decision"] == "block" else None
+    seq = writer.offer(trace, audit)
+    if seq is None:
+        # Buffer full: wait for the flusher off the event loop, then shed load
+        wait = settings.write_behind_wait_ms / 1000.0
+        seq = await run_in_threadpool(writer.put, trace, audit, wait)
+        if seq is None:
+            raise HTTPException(status_code=503, detail="ingest buffer full", headers={"Retry-After": "1"})
+    return _ingest_result(
+        trace["id"], verdict["decision"], trace["reasons"], content, lean,
+        reasons_complete=trace["reasons_complete"],
+    )
+
+@router.post("/batch", response_model=Dict)
+def ingest_trace_batch(payload: Dict[str, Any], db: OrmSession = Depends(get_db)):
+    """
+    Ingest many traces, possibly across sessions, in one request: one lookup of the
+    sessions not already known, one batched evaluation, one transaction for the traces
+    and their audit rows, and one hand-off of all dynamic checks to the enqueue batcher.
+    Results are in input order. The batch is rejected as a whole if any trace names a
+    missing session.
+    """
+    items = payload.get("traces")
+    if not isinstance(items, list) or not all(isinstance(it, dict) for it in items):
+        raise HTTPException(status_code=422, detail="traces must be a list of objects")
+    if len(items) > settings.trace_batch_max:
+        raise HTTPException(status_code=413, detail=f"at most {settings.trace_batch_max} traces per batch")
+    if not items:
+        return {"results": []}
+
+    session_ids = {it.get("session_id") for it in items}
+    if None in session_ids or "" in session_ids:
+        raise HTTPException(status_code=422, detail="session_id is required")
+    unknown = {sid for sid in session_ids if sid not in known_sessions}
+    if unknown:
+        found = set(db.execute(select(SessionModel.id).where(SessionModel.id.in_(unknown))).scalars())
+        missing = unknown - found
+        if missing:
+            raise HTTPException(status_code=404, detail=f"session not found: {sorted(missing)[0]}")
+        known_sessions.add(found)
+
+    contents = [it.get("content", {}) for it in items]
+    verdicts = store.evaluate_many(contents)
+
+    traces: List[Dict[str, Any]] = []
+    audits: List[Dict[str, Any]] = []
+    for it, content, verdict in zip(items, contents, verdicts):
+        trace = _trace_values(it["session_id"], it.get("role", "assistant"), content, verdict)
+        traces.append(trace)
+        if verdict["decision"] == "block":
+            audits.append(_audit_values(trace["id"], verdict["reasons"]))
+    try:
+        db.execute(insert(TraceModel), traces)
+        if audits:
+            db.execute(insert(AuditLog), audits)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        for sid in session_ids:
+            known_sessions.discard(sid)
+        raise HTTPException(status_code=404, detail="session not found")
+
+    _enqueue_dynamic_checks([t["id"] for t in traces])
+
+    return {
+        "results": [
+            {
+                "id": t["id"],
+                "decision": t["decision"].value,
+                "reasons": t["reasons"],
+                "reasons_complete": True,
+            }
+            for t in traces
+        ]
+    }
+
+# Streamed traces: open a stream, post text chunks as they are generated, then close it.
+# Each chunk is verified incrementally and answered with the verdict so far, so callers
+# can stop generating as soon as a block rule fires. Closing persists the trace with a
+# full evaluation of the complete text.
+
+@router.post("/stream", response_model=Dict)
+def open_trace_stream(payload: Dict[str, Any], db: OrmSession = Depends(get_db)):
+    session_id = _require_session(db, payload.get("session_id"))
+    role = payload.get("role", "assistant")
+    extra = payload.get("content") or {}
+    if not isinstance(extra, dict):
+        raise HTTPException(status_code=422, detail="content must be an object")
+    stream = streams.open(session_id, role, store.get().stream(), extra)
+    return {"stream_id": stream.id, "decision": "allow", "reasons": [], "blocked": False}
+
+def _open_stream(stream_id: str) -> OpenStream:
+    stream = streams.get(stream_id)
+    if stream is None:
+        raise HTTPException(status_code=404, detail="stream not found or expired")
+    return stream
+
+@router.post("/stream/{stream_id}", response_model=Dict)
+def append_trace_stream(stream_id: str, payload: Dict[str, Any]):
+    text = payload.get("text")
+    if not isinstance(text, str):
+        raise HTTPException(status_code=422, detail="text must be a string")
+    stream = _open_stream(stream_id)
+    with stream.lock:
+        if stream.length + len(text) > settings.stream_max_chars:
+            raise HTTPException(status_code=413, detail="stream text too large")
+        stream.chunks.append(text)
+        stream.length += len(text)
+        verdict = stream.evaluator.feed(text)
+    return {"stream_id": stream.id, **verdict, "blocked": verdict["decision"] == "block"}
 
-    return {"id": row.id, "decision": row.decision.value, "reasons": row.reasons or [], "payload": content}
+@router.post("/stream/{stream_id}/close", response_model=Dict)
+def close_trace_stream(stream_id: str, lean: bool = Query(False), db: OrmSession = Depends(get_db)):
+    stream = _open_stream(stream_id)
+    with stream.lock:
+        if streams.pop(stream_id) is None:
+            raise HTTPException(status_code=404, detail="stream not found or expired")
+        stream.evaluator.close()
+        content = {**stream.extra, "text": stream.text()}
+    # Regex matches spanning more than the stream overlap are only seen on the full text
+    verdict = store.evaluate(content)
+    row = _record_trace(db, stream.session_id, stream.role, content, verdict)
+    return _ingest_result(row.id, row.decision.value, row.reasons or [], content, lean)
 
 @router.get("/{trace_id}", response_model=Dict)
-def get_trace(trace_id: str, db: OrmSession = Depends(get_db)):
-    row = db.get(TraceModel, trace_id)
+async def get_trace(trace_id: str, db: AsyncSession = Depends(get_async_db)):
+    row = await db.get(TraceModel, trace_id)
     if not row:
         raise HTTPException(status_code=404, detail="trace not found")
+    if not row.reasons_complete:
+        await _complete_reasons_async(db, row)
     return {
         "id": row.id,
         "session_id": row.session_id,
@@ -78,6 +357,7 @@ def get_trace(trace_id: str, db: OrmSession = Depends(get_db)):
         "content": row.content,
         "decision": row.decision.value,
         "reasons": row.reasons or [],
+        "rule_version": row.rule_version,
         "created_at": str(row.created_at),
     }
 
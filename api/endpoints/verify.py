@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from typing import Any, Dict
+from agentsentry.verifier.static_rules import EVAL_MODES
+from api.settings import settings
+from api.verifier_store import store
+
+# Stateless verification: the current rule set's verdict for a payload, with nothing
+# stored or enqueued. Meant for pre-call enforcement checks; record the trace itself
+# with POST /traces afterwards.
+router = APIRouter(prefix="/verify", tags=["verify"])
+
+def _mode(payload: Dict[str, Any]) -> str:
+    mode = payload.get("mode", "full")
+    if mode not in EVAL_MODES:
+        raise HTTPException(status_code=422, detail=f"mode must be one of {list(EVAL_MODES)}")
+    return mode
+
+def _result(verdict: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "decision": verdict["decision"],
+        "reasons": verdict["reasons"],
+        "reasons_complete": not verdict.get("partial"),
+        "rule_version": verdict.get("rule_version"),
+    }
+
+@router.post("", response_model=Dict)
+async def verify(payload: Dict[str, Any]):
+    mode = _mode(payload)
+    verdict = await run_in_threadpool(store.evaluate, payload.get("content", {}), mode)
+    return _result(verdict)
+
+@router.post("/batch", response_model=Dict)
+async def verify_batch(payload: Dict[str, Any]):
+    """Verdicts for several payloads, in input order (always full evaluations)."""
+    contents = payload.get("contents")
+    if not isinstance(contents, list):
+        raise HTTPException(status_code=422, detail="contents must be a list")
+    if len(contents) > settings.trace_batch_max:
+        raise HTTPException(status_code=413, detail=f"at most {settings.trace_batch_max} payloads per batch")
+    verdicts = await run_in_threadpool(store.evaluate_many, contents)
+    return {"results": [_result(v) for v in verdicts]}
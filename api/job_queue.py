@@ -1,8 +1,209 @@
-import os
+"""
+RQ queue for the dynamic checks. One pooled Redis client and queue are shared by the
+whole process, a circuit breaker skips Redis while it is unreachable, and request
+handlers only hand jobs to a background batcher, so ingest latency never includes a
+Redis connect or round trip.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from collections import deque
+import atexit
+import threading
+import time
 import redis
 from rq import Queue
+from api.settings import settings
+
+QUEUE_NAME = "agentsentry"
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive errors. While open, calls are refused without
+    touching Redis, except for one probe every `reset_after` seconds; a successful probe
+    closes it again.
+    """
+
+    def __init__(self, failures: int = 3, reset_after: float = 10.0):
+        self.failures = max(failures, 1)
+        self.reset_after = reset_after
+        self._errors = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_after:
+                self._opened_at = time.monotonic()  # one probe per interval
+                return True
+            return False
+
+    def success(self) -> None:
+        with self._lock:
+            self._errors = 0
+            self._opened_at = None
+
+    def failure(self) -> None:
+        with self._lock:
+            self._errors += 1
+            if self._errors >= self.failures:
+                self._opened_at = time.monotonic()
+
+_redis: Optional[redis.Redis] = None
+_queue: Optional[Queue] = None
+_lock = threading.Lock()
+# Shared by everything in the API process that talks to Redis
+breaker = CircuitBreaker(settings.redis_breaker_failures, settings.redis_breaker_reset)
+
+def get_redis() -> redis.Redis:
+    """Process-wide pooled client; connections are opened on demand and reused."""
+    global _redis
+    if _redis is None:
+        with _lock:
+            if _redis is None:
+                pool = redis.ConnectionPool.from_url(
+                    settings.redis_url,
+                    max_connections=settings.redis_max_connections,
+                    socket_connect_timeout=settings.redis_connect_timeout,
+                    socket_timeout=settings.redis_socket_timeout,
+                    health_check_interval=30,
+                )
+                _redis = redis.Redis(connection_pool=pool)
+    return _redis
 
 def get_queue() -> Queue:
-    url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-    conn = redis.from_url(url)
-    return Queue("agentsentry", connection=conn, default_timeout=60)
+    global _queue
+    if _queue is None:
+        _queue = Queue(QUEUE_NAME, connection=get_redis(), default_timeout=60)
+    return _queue
+
+def enqueue_many(func: str, args_list: List[Tuple[Any, ...]]) -> int:
+    """
+    Enqueue one job per argument tuple in a single pipelined Redis round trip. Returns
+    the number of jobs enqueued: 0 if Redis failed or the breaker is open.
+    """
+    if not args_list:
+        return 0
+    if not breaker.allow():
+        return 0
+    try:
+        get_queue().enqueue_many([Queue.prepare_data(func, args=args) for args in args_list])
+    except (redis.RedisError, OSError):
+        breaker.failure()
+        return 0
+    breaker.success()
+    return len(args_list)
+
+class EnqueueBatcher:
+    """
+    Buffers jobs submitted by request handlers and enqueues them from a background
+    thread, `batch_size` jobs per pipelined round trip and at least every `flush_ms`.
+    The buffer holds at most `max_pending` jobs; beyond that new jobs are dropped, as
+    are batches that Redis rejects: dynamic checks are best-effort. With `flush_ms` 0,
+    jobs are enqueued synchronously in the caller (see `inline`).
+    """
+
+    def __init__(self, batch_size: int = 100, flush_ms: float = 50, max_pending: int = 10000):
+        self.batch_size = max(batch_size, 1)
+        self.flush_ms = flush_ms
+        self.max_pending = max_pending
+        self._pending: "deque[Tuple[str, Tuple[Any, ...]]]" = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.enqueued = 0
+        self.skipped = 0
+        self.dropped = 0
+
+    @property
+    def inline(self) -> bool:
+        """True when submitting talks to Redis in the caller (flush_ms 0, or closed)."""
+        return self.flush_ms <= 0 or self._closed
+
+    def submit(self, func: str, *args: Any) -> bool:
+        """Hand a job to the batcher; False if it was dropped right away."""
+        return self.submit_many(func, [args]) > 0
+
+    def submit_many(self, func: str, args_list: List[Tuple[Any, ...]]) -> int:
+        """
+        Hand one job per argument tuple to the batcher at once; returns how many were
+        accepted. Inline, they are enqueued in a single pipelined round trip.
+        """
+        if not args_list:
+            return 0
+        if self.inline:
+            return self._send([(func, args) for args in args_list])
+        with self._cond:
+            accepted = args_list[:max(self.max_pending - len(self._pending), 0)]
+            self.dropped += len(args_list) - len(accepted)
+            self._pending.extend((func, args) for args in accepted)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="enqueue-batcher", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        return len(accepted)
+
+    def flush(self) -> None:
+        """Enqueue everything buffered so far from the calling thread."""
+        while True:
+            batch = self._take()
+            if not batch:
+                return
+            self._send(batch)
+
+    def close(self) -> None:
+        """Stop the background thread after enqueuing what is left (e.g. on shutdown)."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def _take(self) -> List[Tuple[str, Tuple[Any, ...]]]:
+        with self._cond:
+            n = min(self.batch_size, len(self._pending))
+            return [self._pending.popleft() for _ in range(n)]
+
+    def _send(self, batch: List[Tuple[str, Tuple[Any, ...]]]) -> int:
+        by_func: Dict[str, List[Tuple[Any, ...]]] = {}
+        for func, args in batch:
+            by_func.setdefault(func, []).append(args)
+        sent = sum(enqueue_many(func, args_list) for func, args_list in by_func.items())
+        self.enqueued += sent
+        self.skipped += len(batch) - sent
+        return sent
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if len(self._pending) < self.batch_size and not self._closed:
+                    self._cond.wait(self.flush_ms / 1000.0)
+                if self._closed:
+                    return
+            self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enqueued": self.enqueued,
+            "skipped": self.skipped,
+            "dropped": self.dropped,
+            "pending": len(self._pending),
+            "breaker_open": breaker.open,
+        }
+
+batcher = EnqueueBatcher(settings.enqueue_batch_size, settings.enqueue_flush_ms, settings.enqueue_max_pending)
+
+def enqueue(func: str, *args: Any) -> bool:
+    """Queue a job without waiting on Redis (see EnqueueBatcher)."""
+    return batcher.submit(func, *args)
+
+def enqueue_batch(func: str, args_list: List[Tuple[Any, ...]]) -> int:
+    """Queue one job per argument tuple in one hand-off (see EnqueueBatcher.submit_many)."""
+    return batcher.submit_many(func, args_list)
@@ -1,20 +1,26 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+import os
+import time
 from api.settings import settings
 from api.endpoints.health import router as health_router
 from api.endpoints.sessions import router as sessions_router
 from api.endpoints.traces import router as traces_router
 from api.endpoints.rules import router as rules_router
 from api.endpoints.audit import router as audit_router
+from api.endpoints.verify import router as verify_router
 from api.db import get_db
 from api.verifier_store import store
 from api.auth import require_api_key
+from api.metrics import REQUEST_SECONDS
+from api.responses import DefaultResponse
 
 app = FastAPI(
     title=settings.app_name,
     version="0.1.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=DefaultResponse,
 )
 
 origins = [
@@ -30,10 +36,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the UI revalidate rule listings with If-None-Match
+    expose_headers=["ETag"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template (e.g. /traces/{trace_id}) to keep cardinality bounded
+    route = request.scope.get("route")
+    path = getattr(route, "path", None) or "unmatched"
+    REQUEST_SECONDS.observe(time.perf_counter() - started, path, request.method, str(response.status_code))
+    return response
+
+@app.on_event("startup")
+def listen_for_session_deletions():
+    from api.session_cache import known_sessions
+    known_sessions.start_listener()
+
 @app.on_event("startup")
 def load_rules_on_startup():
+    # A precompiled snapshot skips the DB query and rule compilation entirely
+    snapshot = getattr(settings, "rules_snapshot_path", None)
+    if snapshot and os.path.exists(snapshot):
+        try:
+            store.load_snapshot(snapshot)
+            return
+        except Exception:
+            # Unreadable or stale format: fall back to the DB
+            pass
     # Load rules from DB once the app starts
     try:
         from fastapi import Depends
@@ -48,28 +80,55 @@ def load_rules_on_startup():
         # Keep default verifier on failure
         store.get()
 
+@app.on_event("startup")
+def watch_rule_version():
+    # Registered after load_rules_on_startup, so it starts from the loaded version
+    from api.rule_version import watcher
+    watcher.start()
+
+@app.on_event("shutdown")
+def flush_buffers_on_shutdown():
+    # Write buffered traces first: their dynamic checks are enqueued once the rows exist
+    from api.write_behind import writer
+    from api.job_queue import batcher
+    writer.close()
+    batcher.close()
+
 @app.get("/")
 def index():
     return {
         "name": settings.app_name,
         "status": "ok",
-        "endpoints": ["/healthz", "/sessions", "/traces", "/rules"],
+        "endpoints": ["/healthz", "/metrics", "/sessions", "/traces", "/verify", "/rules"],
     }
 
 # Simple reload endpoint
 @app.post("/rules/reload")
 def reload_rules(_: None = Depends(require_api_key)):
     from api.db import SessionLocal
+    from api import rule_version
     db = SessionLocal()
     try:
+        previous = store.get()
         v = store.load_from_db(db)
-        return {"ok": True, "count": len(v.rules)}
+        if v is not previous:
+            # Rules were changed directly in the DB: move the version so every API
+            # process (and every rule-listing ETag) picks them up
+            rule_version.bump(db)
+            db.commit()
+            rule_version.changed(db)
+        return {"ok": True, "count": len(v.rules), "rule_version": store.rule_version}
     finally:
         db.close()
 
+@app.get("/rules/cache")
+def verdict_cache_stats():
+    return store.cache.stats()
+
 # Routers
 app.include_router(health_router)
 app.include_router(sessions_router)
 app.include_router(traces_router)
 app.include_router(rules_router)
 app.include_router(audit_router)
+app.include_router(verify_router)
@@ -0,0 +1,146 @@
+from typing import Dict, Iterable, List, Tuple
+import bisect
+import threading
+
+# Prometheus text exposition (format 0.0.4) without a client-library dependency.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram keyed by a fixed set of label names."""
+
+    def __init__(self, name: str, doc: str, label_names: Tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # one slot per bucket, then +Inf, count, sum
+                series = self._series[label_values] = [0.0] * (len(self.buckets) + 3)
+            series[idx] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for label_values, series in items:
+            base = dict(zip(self.label_names, label_values))
+            cumulative = 0.0
+            for bound, n in zip(self.buckets + (float("inf"),), series):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels({**base, 'le': le})} {cumulative:g}")
+            lines.append(f"{self.name}_count{_labels(base)} {series[-2]:g}")
+            lines.append(f"{self.name}_sum{_labels(base)} {series[-1]!r}")
+        return lines
+
+
+def render_metric(name: str, kind: str, doc: str, samples: Iterable[Tuple[Dict[str, str], float]]) -> List[str]:
+    lines = [f"# HELP {name} {doc}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labels)} {value}")
+    return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "agentsentry_request_seconds",
+    "HTTP request latency by route template and method.",
+    ("route", "method", "status"),
+)
+VERIFY_SECONDS = Histogram(
+    "agentsentry_verify_seconds",
+    "Static verification latency per trace, including verdict cache lookups.",
+    ("cache",),
+)
+
+
+def render_all() -> str:
+    """Collect request histograms, verifier rule/engine counters, verdict/session cache, rule version, write-behind and job queue stats."""
+    from api.verifier_store import store
+
+    lines: List[str] = []
+    lines += REQUEST_SECONDS.render()
+    lines += VERIFY_SECONDS.render()
+
+    stats = store.get().stats()
+    rule_metrics = [
+        ("evaluations", "counter", "Full rule evaluations (prefiltered-out regex rules excluded)."),
+        ("matches", "counter", "Rule matches."),
+        ("seconds", "counter", "Cumulative regex search time per rule."),
+        ("timeouts", "counter", "Rule evaluations that hit a time budget."),
+    ]
+    for key, kind, doc in rule_metrics:
+        lines += render_metric(
+            f"agentsentry_rule_{key}_total", kind, doc,
+            (({"rule": r["rule"], "engine": r["engine"]}, r[key]) for r in stats["rules"]),
+        )
+    for key, doc in (("evaluations", "Engine passes."), ("matches", "Engine matches."), ("seconds", "Cumulative engine time.")):
+        lines += render_metric(
+            f"agentsentry_engine_{key}_total", "counter", doc,
+            (({"engine": name}, e[key]) for name, e in stats["engines"].items()),
+        )
+
+    cache = store.cache.stats()
+    for key in ("hits", "misses", "evictions", "expirations"):
+        lines += render_metric(f"agentsentry_verdict_cache_{key}_total", "counter", f"Verdict cache {key}.", [({}, cache[key])])
+    lines += render_metric("agentsentry_verdict_cache_size", "gauge", "Verdict cache entries.", [({}, cache["size"])])
+
+    from api.rule_version import watcher
+    lines += render_metric("agentsentry_rule_version", "gauge", "Rule-set version loaded by this process.", [({}, store.rule_version)])
+    lines += render_metric(
+        "agentsentry_rule_version_reloads_total", "counter", "Reloads after another process changed the rules.",
+        [({}, watcher.reloads)],
+    )
+
+    from api.session_cache import known_sessions
+    known = known_sessions.stats()
+    for key in ("hits", "misses", "evictions", "invalidations"):
+        lines += render_metric(f"agentsentry_session_cache_{key}_total", "counter", f"Known-session cache {key}.", [({}, known[key])])
+    lines += render_metric("agentsentry_session_cache_size", "gauge", "Known-session cache entries.", [({}, known["size"])])
+
+    from api.write_behind import writer
+    buffered = writer.stats()
+    for key, doc in (
+        ("written", "Traces written by write-behind group commits."),
+        ("failed", "Buffered traces that could not be written."),
+        ("rejected", "Ingests answered 503 because the write-behind buffer was full."),
+        ("flushes", "Write-behind group commits."),
+    ):
+        lines += render_metric(f"agentsentry_write_behind_{key}_total", "counter", doc, [({}, buffered[key])])
+    lines += render_metric("agentsentry_write_behind_pending", "gauge", "Traces waiting to be written.", [({}, buffered["pending"])])
+
+    from api.job_queue import batcher
+    jobs = batcher.stats()
+    for key, doc in (
+        ("enqueued", "Dynamic-check jobs enqueued."),
+        ("skipped", "Jobs not enqueued because Redis failed or the breaker was open."),
+        ("dropped", "Jobs dropped because the enqueue buffer was full."),
+    ):
+        lines += render_metric(f"agentsentry_jobs_{key}_total", "counter", doc, [({}, jobs[key])])
+    lines += render_metric("agentsentry_jobs_pending", "gauge", "Jobs buffered for enqueue.", [({}, jobs["pending"])])
+    lines += render_metric(
+        "agentsentry_redis_breaker_open", "gauge", "1 while Redis is skipped after failures.",
+        [({}, int(jobs["breaker_open"]))],
+    )
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Text, JSON, Integer, ForeignKey, DateTime, func, Index, Enum
+from sqlalchemy import String, Text, JSON, Integer, Boolean, ForeignKey, DateTime, func, Index, Enum, true
 import enum
 
 class Base(DeclarativeBase):
@@ -31,6 +31,10 @@ class Trace(Base):
     content: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     decision: Mapped[DecisionEnum] = mapped_column(Enum(DecisionEnum), default=DecisionEnum.allow)
     reasons: Mapped[list[str] | None] = mapped_column(JSON, nullable=True)
+    # False while only the reasons of a decision-only evaluation are stored
+    reasons_complete: Mapped[bool] = mapped_column(Boolean, default=True, server_default=true())
+    # Rule-set version the decision was made with (see api/rule_version.py)
+    rule_version: Mapped[int | None] = mapped_column(Integer, nullable=True)
     created_at: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     session: Mapped["Session"] = relationship(back_populates="traces")
@@ -49,8 +53,18 @@ class Rule(Base):
     severity: Mapped[str] = mapped_column(String(16))  # "info" | "warning" | "critical"
     decision: Mapped[str] = mapped_column(String(16), default="warn")  # "allow" | "warn" | "block"
     enabled: Mapped[int] = mapped_column(Integer, default=1)
+    tool: Mapped[str | None] = mapped_column(String(128), nullable=True, index=True)  # scope to one tool
+    arg_path: Mapped[str | None] = mapped_column(String(256), nullable=True)  # dotted path into args
+    view: Mapped[str] = mapped_column(String(16), default="raw", server_default="raw")  # raw | normalized
     created_at: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
+class RuleSetVersion(Base):
+    # Single row (id 1), bumped in the same transaction as every rule change
+    __tablename__ = "rule_set_version"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped["DateTime"] = mapped_column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -0,0 +1,27 @@
+from typing import Any
+import json
+from fastapi.responses import JSONResponse
+
+# orjson serializes several times faster than the stdlib encoder; it is optional, and
+# without it responses are encoded with the standard json module.
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+def dumps(obj: Any) -> bytes:
+    """JSON bytes for response bodies, including ones rendered ahead of time (e.g. cached)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Integers beyond 64 bits and other values orjson rejects; json handles them
+            pass
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class DefaultResponse(JSONResponse):
+    """JSONResponse encoded with orjson when available, falling back to json per response."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -2,7 +2,12 @@ from typing import List
 from sqlalchemy.orm import Session as OrmSession
 from sqlalchemy import select
 from agentsentry.verifier.static_rules import Rule
-from api.models import Rule as RuleModel
+from api.models import Rule as RuleModel, RuleSetVersion
+
+def db_rule_version(db: OrmSession) -> int:
+    """Current rule-set version (0 until the first rule change)."""
+    version = db.execute(select(RuleSetVersion.version).where(RuleSetVersion.id == 1)).scalar_one_or_none()
+    return version or 0
 
 def db_rules_to_static(db: OrmSession) -> List[Rule]:
     rows = (
@@ -26,6 +31,9 @@ def db_rules_to_static(db: OrmSession) -> List[Rule]:
                     enabled=bool(r.enabled),
                     description=r.description,
                     rule_type=getattr(r, "rule_type", "regex") or "regex",
+                    tool=r.tool or None,
+                    arg_path=r.arg_path or None,
+                    view=r.view or "raw",
                 )
             )
         except Exception:
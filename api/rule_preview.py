@@ -0,0 +1,185 @@
+"""
+Impact preview of a rule change: re-evaluate stored traces with the current and the
+proposed rule set and count how their decisions would move. Traces are read from the
+DB in chunks and each chunk is evaluated in a process pool worker that holds both
+verifiers, so a large preview neither holds all traces in memory nor ties up the API
+process's CPU.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime
+import multiprocessing
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session as OrmSession
+
+from agentsentry.verifier.static_rules import Rule, StaticVerifier
+from api.models import Trace as TraceModel
+
+DECISIONS = ("allow", "warn", "block")
+
+# (trace id, content) pairs of one chunk
+Chunk = List[Tuple[str, Dict[str, Any]]]
+
+# The API process runs threads, so workers are not forked from it directly
+_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Verifiers of the current worker process, built once by _init_worker
+_worker_verifiers: Optional[Tuple[StaticVerifier, StaticVerifier]] = None
+
+
+def _build(before: List[Rule], after: List[Rule]) -> Tuple[StaticVerifier, StaticVerifier]:
+    current = StaticVerifier(rules=before)
+    # Unchanged rules are compiled once and shared by both verifiers
+    return current, StaticVerifier(rules=after, previous=current)
+
+
+def _init_worker(before: List[Rule], after: List[Rule]) -> None:
+    global _worker_verifiers
+    _worker_verifiers = _build(before, after)
+
+
+def _evaluate_chunk(chunk: Chunk) -> List[Tuple[str, str, str]]:
+    assert _worker_verifiers is not None
+    return _compare(_worker_verifiers, chunk)
+
+
+def _compare(
+    verifiers: Tuple[StaticVerifier, StaticVerifier], chunk: Chunk
+) -> List[Tuple[str, str, str]]:
+    """(trace id, decision before, decision after) for every trace of the chunk."""
+    before, after = verifiers
+    contents = [content for _tid, content in chunk]
+    old = before.evaluate_many(contents)
+    new = after.evaluate_many(contents)
+    return [(tid, o["decision"], n["decision"]) for (tid, _c), o, n in zip(chunk, old, new)]
+
+
+def apply_diff(current: List[Rule], add: Sequence[Rule] = (), remove: Sequence[str] = ()) -> List[Rule]:
+    """
+    The rule set after removing the rules named in `remove` and adding `add`; an added
+    rule replaces the current rule with the same name in place.
+    """
+    added = {r.name: r for r in add}
+    dropped = set(remove)
+    rules = [added.pop(r.name, r) for r in current if r.name not in dropped]
+    return rules + list(added.values())
+
+
+def trace_chunks(
+    db: OrmSession,
+    chunk_size: int,
+    limit: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    session_id: Optional[str] = None,
+) -> Iterator[Chunk]:
+    """Most recent traces first, fetched from the DB `chunk_size` rows at a time."""
+    stmt = (
+        select(TraceModel.id, TraceModel.content)
+        .order_by(TraceModel.created_at.desc())
+        .limit(limit)
+    )
+    if since is not None:
+        stmt = stmt.where(TraceModel.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(TraceModel.created_at < until)
+    if session_id is not None:
+        stmt = stmt.where(TraceModel.session_id == session_id)
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        yield [(tid, content or {}) for tid, content in rows]
+
+
+class PreviewReport:
+    """Decision counts before/after and example trace ids per changed decision."""
+
+    def __init__(self, examples: int):
+        self.examples = examples
+        self.evaluated = 0
+        self.before = {d: 0 for d in DECISIONS}
+        self.after = {d: 0 for d in DECISIONS}
+        self.changed: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, rows: List[Tuple[str, str, str]]) -> None:
+        for tid, old, new in rows:
+            self.evaluated += 1
+            self.before[old] += 1
+            self.after[new] += 1
+            if old == new:
+                continue
+            entry = self.changed.setdefault(f"{old}->{new}", {"count": 0, "examples": []})
+            entry["count"] += 1
+            if len(entry["examples"]) < self.examples:
+                entry["examples"].append(tid)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "evaluated": self.evaluated,
+            "before": self.before,
+            "after": self.after,
+            "changed": self.changed,
+        }
+
+
+def run_preview(
+    chunks: Iterator[Chunk],
+    before: List[Rule],
+    after: List[Rule],
+    workers: int,
+    budget_s: float,
+    examples: int = 5,
+) -> Dict[str, Any]:
+    """
+    Evaluate `chunks` with both rule sets until they run out or `budget_s` seconds have
+    passed; `complete` is False when the budget cut the sample short. With `workers`
+    0 chunks are evaluated in this process.
+    """
+    started = time.monotonic()
+    deadline = started + budget_s
+    report = PreviewReport(examples)
+    complete = True
+    if workers <= 0:
+        verifiers = _build(before, after)
+        for chunk in chunks:
+            if time.monotonic() >= deadline:
+                complete = False
+                break
+            report.add(_compare(verifiers, chunk))
+    else:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(_START_METHOD),
+            initializer=_init_worker,
+            initargs=(before, after),
+        )
+        pending: set[Future] = set()
+        try:
+            for chunk in chunks:
+                # Keep a couple of chunks queued per worker so DB reads stay bounded
+                while len(pending) >= workers * 2:
+                    left = max(deadline - time.monotonic(), 0)
+                    done, pending = wait(pending, timeout=left, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        report.add(future.result())
+                    if time.monotonic() >= deadline:
+                        break
+                if time.monotonic() >= deadline:
+                    complete = False
+                    break
+                pending.add(pool.submit(_evaluate_chunk, chunk))
+            if pending:
+                done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0))
+                for future in done:
+                    report.add(future.result())
+                if pending:
+                    complete = False
+        finally:
+            # Chunks still running past the budget are dropped, not waited for
+            pool.shutdown(wait=False, cancel_futures=True)
+    return {
+        **report.as_dict(),
+        "complete": complete,
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+    }
@@ -0,0 +1,132 @@
+"""
+Cluster-wide rule-set version. Every rule write bumps a counter row in the same
+transaction, reloads the verifier of the process that handled it and publishes the new
+version on Redis. Every other API process reloads when it hears of a newer version, or
+at the latest when it polls the counter row (RULE_VERSION_POLL_S), so no process reads
+the rules themselves unless they changed. Verdicts carry the version they were
+evaluated against (`rule_version`), which ingest stores with each trace.
+"""
+from typing import Any, Optional
+import threading
+import time
+import redis
+from sqlalchemy import update
+from sqlalchemy.orm import Session as OrmSession
+from api.job_queue import breaker, get_redis
+from api.models import RuleSetVersion
+from api.rule_loader import db_rule_version
+from api.settings import settings
+from api.verifier_store import store
+
+# New versions are published here so every API process reloads
+CHANNEL = "agentsentry:rules:version"
+
+def bump(db: OrmSession) -> None:
+    """Count a rule change; call before committing it so both land in one transaction."""
+    result = db.execute(
+        update(RuleSetVersion).where(RuleSetVersion.id == 1).values(version=RuleSetVersion.version + 1)
+    )
+    if not result.rowcount:
+        # Tables created without the migration start without the counter row
+        db.add(RuleSetVersion(id=1, version=1))
+
+def publish(version: int) -> None:
+    if not breaker.allow():
+        return
+    try:
+        get_redis().publish(CHANNEL, str(version))
+    except (redis.RedisError, OSError):
+        breaker.failure()
+        return
+    breaker.success()
+
+def changed(db: OrmSession) -> int:
+    """After a committed rule change: reload here and tell the other processes."""
+    store.load_from_db(db)
+    publish(store.rule_version)
+    return store.rule_version
+
+
+class RuleVersionWatcher:
+    """
+    Background thread that hot-reloads the verifier when the rule-set version moves:
+    immediately on a published version, and every `poll_s` seconds (0 disables) by
+    reading the counter row, which also covers missed messages and Redis outages.
+    """
+
+    def __init__(self, poll_s: float = 5.0):
+        self.poll_s = poll_s
+        self.reloads = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="rule-version-watcher", daemon=True)
+        self._thread.start()
+
+    def sync(self) -> bool:
+        """Reload if the DB holds a newer version than the one loaded; True if it did."""
+        from api.db import SessionLocal
+        db = SessionLocal()
+        try:
+            if db_rule_version(db) <= store.rule_version:
+                return False
+            store.load_from_db(db)
+            self.reloads += 1
+            return True
+        finally:
+            db.close()
+
+    def _sync_quietly(self) -> None:
+        try:
+            self.sync()
+        except Exception:
+            # DB unreachable: keep serving the loaded rules and try again later
+            pass
+
+    def _run(self) -> None:
+        pubsub: Any = None
+        retry_at = 0.0
+        next_poll = time.monotonic() + self.poll_s
+        while True:
+            if pubsub is None and time.monotonic() >= retry_at:
+                try:
+                    pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(CHANNEL)
+                    # Catch up on versions published while we were not subscribed
+                    self._sync_quietly()
+                except (redis.RedisError, OSError):
+                    pubsub = self._close(pubsub)
+                    retry_at = time.monotonic() + settings.redis_breaker_reset
+            if pubsub is None:
+                time.sleep(1.0)
+            else:
+                try:
+                    message = pubsub.get_message(timeout=1.0)
+                except (redis.RedisError, OSError):
+                    message = pubsub = self._close(pubsub)
+                    retry_at = time.monotonic() + settings.redis_breaker_reset
+                if message and message.get("type") == "message" and _newer(message["data"]):
+                    self._sync_quietly()
+            if self.poll_s > 0 and time.monotonic() >= next_poll:
+                self._sync_quietly()
+                next_poll = time.monotonic() + self.poll_s
+
+    @staticmethod
+    def _close(pubsub: Any) -> None:
+        if pubsub is not None:
+            try:
+                pubsub.close()
+            except (redis.RedisError, OSError):
+                pass
+        return None
+
+
+def _newer(data: Any) -> bool:
+    try:
+        return int(data) > store.rule_version
+    except (TypeError, ValueError):
+        return True  # unexpected payload: let the DB decide
+
+watcher = RuleVersionWatcher(poll_s=settings.rule_version_poll_s)
@@ -1,5 +1,7 @@
 from pydantic import BaseModel, field_validator
-from typing import Optional
+from typing import List, Optional
+from datetime import datetime
+from agentsentry.verifier.normalize import VIEWS
 
 class RuleBase(BaseModel):
     name: str
@@ -9,6 +11,9 @@ class RuleBase(BaseModel):
     decision: str  # allow | warn | block
     enabled: bool = True
     description: Optional[str] = None
+    tool: Optional[str] = None  # evaluate only for traces of this tool
+    arg_path: Optional[str] = None  # dotted path into tool args, e.g. "cmd"
+    view: str = "raw"  # raw | normalized (match decoded/normalized text)
 
     @field_validator("severity")
     @classmethod
@@ -34,6 +39,13 @@ class RuleBase(BaseModel):
             raise ValueError(f"type must be one of {allowed}")
         return v
 
+    @field_validator("view")
+    @classmethod
+    def validate_view(cls, v: str) -> str:
+        if v not in VIEWS:
+            raise ValueError(f"view must be one of {set(VIEWS)}")
+        return v
+
 class RuleCreate(RuleBase):
     pass
 
@@ -45,6 +57,22 @@ class RuleUpdate(BaseModel):
     decision: Optional[str] = None
     enabled: Optional[bool] = None
     description: Optional[str] = None
+    tool: Optional[str] = None
+    arg_path: Optional[str] = None
+    view: Optional[str] = None
 
 class RuleOut(RuleBase):
-    id: int
\ No newline at end of file
+    id: int
+
+class RulePreview(BaseModel):
+    # Either the complete proposed rule set, or a diff against the current one
+    rules: Optional[List[RuleCreate]] = None
+    add: List[RuleCreate] = []  # replaces a current rule with the same name
+    remove: List[str] = []  # rule names
+    # Which stored traces to re-evaluate (most recent first)
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    session_id: Optional[str] = None
+    limit: int = 1000
+    budget_ms: Optional[float] = None  # capped by RULE_PREVIEW_BUDGET_MS
+    examples: int = 5  # trace ids listed per changed decision
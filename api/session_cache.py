@@ -0,0 +1,123 @@
+from typing import Any, Dict, Iterable, Optional
+from collections import OrderedDict
+import threading
+import time
+import redis
+from api.job_queue import breaker, get_redis
+from api.settings import settings
+
+# Deleted session ids are published here so every API process drops them
+CHANNEL = "agentsentry:sessions:deleted"
+
+
+class SessionCache:
+    """
+    Bounded LRU set of session ids known to exist, with a per-entry TTL, so ingest can
+    skip the session lookup. Ids are only added after the DB confirmed them; the TTL
+    bounds how long a process may miss a deletion broadcast.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._listener: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            stored_at = self._data.get(session_id)
+            if stored_at is None or (self.ttl and time.monotonic() - stored_at > self.ttl):
+                self._data.pop(session_id, None)
+                self.misses += 1
+                return False
+            self._data.move_to_end(session_id)
+            self.hits += 1
+            return True
+
+    def add(self, session_ids: Iterable[str]) -> None:
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for sid in session_ids:
+                self._data[sid] = now
+                self._data.move_to_end(sid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, session_id: str) -> None:
+        with self._lock:
+            if self._data.pop(session_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def invalidate(self, session_id: str) -> None:
+        """Forget a deleted session here and in every other API process."""
+        self.discard(session_id)
+        if not breaker.allow():
+            return
+        try:
+            get_redis().publish(CHANNEL, session_id)
+        except (redis.RedisError, OSError):
+            breaker.failure()
+            return
+        breaker.success()
+
+    def start_listener(self) -> None:
+        """Apply deletions published by other processes (background thread, reconnects)."""
+        if self._listener is not None or not self.enabled:
+            return
+        self._listener = threading.Thread(target=self._listen, name="session-cache-listener", daemon=True)
+        self._listener.start()
+
+    def _listen(self) -> None:
+        while True:
+            pubsub = None
+            subscribed = False
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                subscribed = True
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        data = message["data"]
+                        self.discard(data.decode() if isinstance(data, bytes) else str(data))
+            except (redis.RedisError, OSError):
+                if subscribed:
+                    # Deletions may be missed until we resubscribe; start over from the DB
+                    self.clear()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except (redis.RedisError, OSError):
+                        pass
+                time.sleep(settings.redis_breaker_reset)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+known_sessions = SessionCache(maxsize=settings.session_cache_size, ttl=settings.session_cache_ttl)
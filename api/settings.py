@@ -7,7 +7,49 @@ class Settings(BaseSettings):
     environment: str = "dev"
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./agentsentry.db")
     redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    # Known-session cache for ingest (0 disables); deletions are broadcast over Redis pub/sub
+    session_cache_size: int = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+    session_cache_ttl: float = float(os.getenv("SESSION_CACHE_TTL", "60"))
+    # Pooled Redis client for the job queue; timeouts in seconds
+    redis_max_connections: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "20"))
+    redis_connect_timeout: float = float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.5"))
+    redis_socket_timeout: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1"))
+    # Skip Redis after this many consecutive failures, probing again every REDIS_BREAKER_RESET s
+    redis_breaker_failures: int = int(os.getenv("REDIS_BREAKER_FAILURES", "3"))
+    redis_breaker_reset: float = float(os.getenv("REDIS_BREAKER_RESET", "10"))
+    # Dynamic-check jobs are enqueued in background batches (ENQUEUE_FLUSH_MS=0 enqueues inline)
+    enqueue_batch_size: int = int(os.getenv("ENQUEUE_BATCH_SIZE", "100"))
+    enqueue_flush_ms: float = float(os.getenv("ENQUEUE_FLUSH_MS", "50"))
+    enqueue_max_pending: int = int(os.getenv("ENQUEUE_MAX_PENDING", "10000"))
     api_key: str | None = os.getenv("AGENTSENTRY_API_KEY")
+    # Verdict cache for identical trace payloads (0 disables)
+    verdict_cache_size: int = int(os.getenv("VERDICT_CACHE_SIZE", "4096"))
+    verdict_cache_ttl: float = float(os.getenv("VERDICT_CACHE_TTL", "300"))
+    # Time limit for the adversarial-input check run when a regex rule is saved (0 disables)
+    regex_save_check_ms: float = float(os.getenv("REGEX_SAVE_CHECK_MS", "100"))
+    # Precompiled rule-set snapshot loaded at startup instead of the DB (see api/snapshot.py)
+    rules_snapshot_path: str | None = os.getenv("RULES_SNAPSHOT_PATH")
+    # Seconds between checks of the rule-set version row, on top of the Redis broadcast (0 disables)
+    rule_version_poll_s: float = float(os.getenv("RULE_VERSION_POLL_S", "5"))
+    # Streamed traces (/traces/stream): open streams per process, idle timeout, text cap
+    stream_max_open: int = int(os.getenv("STREAM_MAX_OPEN", "1024"))
+    stream_ttl: float = float(os.getenv("STREAM_TTL", "300"))
+    stream_max_chars: int = int(os.getenv("STREAM_MAX_CHARS", "1000000"))
+    # Write-behind ingest (see api/write_behind.py): rows per group commit, flush interval,
+    # buffer size and how long ingest waits for room before answering 503
+    trace_write_behind: bool = os.getenv("TRACE_WRITE_BEHIND", "0").lower() in ("1", "true", "yes")
+    write_behind_batch: int = int(os.getenv("WRITE_BEHIND_BATCH", "500"))
+    write_behind_flush_ms: float = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "20"))
+    write_behind_max_pending: int = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+    write_behind_wait_ms: float = float(os.getenv("WRITE_BEHIND_WAIT_MS", "1000"))
+    # Most traces accepted by one POST /traces/batch
+    trace_batch_max: int = int(os.getenv("TRACE_BATCH_MAX", "1000"))
+    # Rule change previews (/rules/preview): worker processes (0 = in-process), traces per
+    # chunk, most traces per preview and time budget
+    rule_preview_workers: int = int(os.getenv("RULE_PREVIEW_WORKERS", "2"))
+    rule_preview_chunk: int = int(os.getenv("RULE_PREVIEW_CHUNK", "200"))
+    rule_preview_max_traces: int = int(os.getenv("RULE_PREVIEW_MAX_TRACES", "20000"))
+    rule_preview_budget_ms: float = float(os.getenv("RULE_PREVIEW_BUDGET_MS", "10000"))
 
     model_config = SettingsConfigDict(env_file="../.env.dev", env_file_encoding="utf-8", extra="ignore")
 
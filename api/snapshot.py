@@ -0,0 +1,36 @@
+"""
+Compile the active rule set once into an on-disk snapshot:
+
+    python -m api.snapshot /srv/agentsentry/rules.snap
+
+Point RULES_SNAPSHOT_PATH at the file and every API process loads it at startup
+instead of querying the DB and compiling rules.
+"""
+import argparse
+import json
+from agentsentry.verifier.static_rules import StaticVerifier, DEFAULT_RULES
+from agentsentry.verifier.snapshot import dump_snapshot
+from api.db import SessionLocal
+from api.rule_loader import db_rule_version, db_rules_to_static
+
+
+def build_snapshot(path: str) -> dict:
+    db = SessionLocal()
+    try:
+        # Version before rules, as in VerifierStore.load_from_db
+        rule_version = db_rule_version(db)
+        rules = db_rules_to_static(db) or list(DEFAULT_RULES)
+    finally:
+        db.close()
+    return dump_snapshot(StaticVerifier(rules=rules), path, rule_version=rule_version)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write a precompiled rule-set snapshot.")
+    parser.add_argument("path", help="output file")
+    args = parser.parse_args()
+    print(json.dumps(build_snapshot(args.path)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+import threading
+import time
+import uuid
+
+from agentsentry.verifier.stream import StreamEvaluator
+from api.settings import settings
+
+
+class OpenStream:
+    """One in-flight streamed trace: its evaluator and the text received so far."""
+
+    def __init__(
+        self,
+        session_id: str,
+        role: str,
+        evaluator: StreamEvaluator,
+        extra: Optional[Dict[str, Any]] = None,
+    ):
+        self.id = uuid.uuid4().hex[:16]
+        self.session_id = session_id
+        self.role = role
+        # Additional content fields stored with the final trace
+        self.extra = extra or {}
+        self.evaluator = evaluator
+        self.chunks: List[str] = []
+        self.length = 0
+        self.touched = time.monotonic()
+        # Chunks of one stream are fed in order, one request at a time
+        self.lock = threading.Lock()
+
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+
+class StreamRegistry:
+    """
+    Bounded, in-process registry of open streams. Streams idle for longer than `ttl`
+    seconds are dropped, and opening one beyond `maxsize` drops the least recently used.
+    Streams live in the worker that opened them, so multi-worker deployments need
+    sticky routing for /traces/stream.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._streams: "OrderedDict[str, OpenStream]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(
+        self,
+        session_id: str,
+        role: str,
+        evaluator: StreamEvaluator,
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> OpenStream:
+        stream = OpenStream(session_id, role, evaluator, extra)
+        with self._lock:
+            self._expire()
+            self._streams[stream.id] = stream
+            while len(self._streams) > self.maxsize:
+                self._streams.popitem(last=False)
+        return stream
+
+    def get(self, stream_id: str) -> Optional[OpenStream]:
+        with self._lock:
+            self._expire()
+            stream = self._streams.get(stream_id)
+            if stream is not None:
+                stream.touched = time.monotonic()
+                self._streams.move_to_end(stream_id)
+            return stream
+
+    def pop(self, stream_id: str) -> Optional[OpenStream]:
+        with self._lock:
+            return self._streams.pop(stream_id, None)
+
+    def _expire(self) -> None:
+        if not self.ttl:
+            return
+        cutoff = time.monotonic() - self.ttl
+        while self._streams:
+            oldest = next(iter(self._streams.values()))
+            if oldest.touched >= cutoff:
+                break
+            self._streams.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"open": len(self._streams), "maxsize": self.maxsize, "ttl": self.ttl}
+
+
+streams = StreamRegistry(maxsize=settings.stream_max_open, ttl=settings.stream_ttl)
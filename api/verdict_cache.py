@@ -0,0 +1,103 @@
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+
+
+# Large strings are hashed in slices so a multi-MB payload is never copied whole
+_HASH_SLICE = 1 << 16
+
+
+def _feed(h: Any, node: Any) -> None:
+    """Hash a JSON-like value canonically: type tag and length, then content; dict keys sorted."""
+    if isinstance(node, str):
+        h.update(b"s%d:" % len(node))
+        for i in range(0, len(node), _HASH_SLICE):
+            h.update(node[i:i + _HASH_SLICE].encode("utf-8", "surrogatepass"))
+    elif isinstance(node, dict):
+        h.update(b"d%d:" % len(node))
+        for key in sorted(node, key=str):
+            _feed(h, str(key))
+            _feed(h, node[key])
+    elif isinstance(node, (list, tuple)):
+        h.update(b"l%d:" % len(node))
+        for value in node:
+            _feed(h, value)
+    else:
+        h.update(b"v" + repr(node).encode("utf-8"))
+
+
+def content_key(content: Any, version: int) -> str:
+    """Canonical hash of a trace payload, scoped to a rule-set version."""
+    h = hashlib.sha256()
+    _feed(h, content)
+    return f"{version}:{h.hexdigest()}"
+
+
+class VerdictCache:
+    """
+    Bounded LRU cache of verifier verdicts with a per-entry TTL.
+    Thread-safe; sync endpoints call it from Starlette's threadpool.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            stored_at, verdict = item
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        return _copy(verdict)
+
+    def put(self, key: str, verdict: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), _copy(verdict))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def _copy(verdict: Dict[str, Any]) -> Dict[str, Any]:
+    # Callers store reasons on ORM rows; never hand out the cached objects themselves
+    return {**verdict, "reasons": [dict(r) for r in verdict.get("reasons", [])]}
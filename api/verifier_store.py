@@ -1,24 +1,137 @@
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
 from sqlalchemy.orm import Session as OrmSession
 from agentsentry.verifier.static_rules import StaticVerifier, DEFAULT_RULES, Rule
-from .rule_loader import db_rules_to_static
+from agentsentry.verifier.snapshot import open_snapshot
+from api.settings import settings
+from .rule_loader import db_rule_version, db_rules_to_static
+from .verdict_cache import VerdictCache, content_key
+from .metrics import VERIFY_SECONDS
 
 class VerifierStore:
     def __init__(self) -> None:
         self._verifier: Optional[StaticVerifier] = None
+        # Bumped on every load so cached verdicts never outlive their rule set
+        self.version = 0
+        # Cluster-wide rule-set version the loaded rules correspond to (see api/rule_version.py)
+        self.rule_version = 0
+        self._lock = threading.Lock()
+        # Serializes reloads; evaluations never wait on it
+        self._reload_lock = threading.Lock()
+        self.cache = VerdictCache(maxsize=settings.verdict_cache_size, ttl=settings.verdict_cache_ttl)
 
     def get(self) -> StaticVerifier:
         if self._verifier is None:
             self._verifier = StaticVerifier()
         return self._verifier
 
+    def _current(self) -> Tuple[StaticVerifier, int, int]:
+        with self._lock:
+            return self.get(), self.version, self.rule_version
+
+    def evaluate(self, content: Dict[str, Any], mode: str = "full") -> Dict[str, Any]:
+        """
+        Evaluate with the current verifier, reusing cached verdicts for identical payloads.
+        A cached full verdict also answers decision-only requests; a cached partial one
+        does not answer full requests.
+        """
+        started = time.perf_counter()
+        verifier, version, rule_version = self._current()
+        if not self.cache.enabled:
+            verdict = verifier.evaluate(content, mode)
+            verdict["rule_version"] = rule_version
+            VERIFY_SECONDS.observe(time.perf_counter() - started, "off")
+            return verdict
+        key = content_key(content, version)
+        verdict = self.cache.get(key)
+        if verdict is not None and not (mode == "full" and verdict.get("partial")):
+            VERIFY_SECONDS.observe(time.perf_counter() - started, "hit")
+            return verdict
+        verdict = verifier.evaluate(content, mode)
+        verdict["rule_version"] = rule_version
+        # Timeouts depend on load; let the next identical payload try again
+        if not any(r.get("timed_out") for r in verdict["reasons"]):
+            self.cache.put(key, verdict)
+        VERIFY_SECONDS.observe(time.perf_counter() - started, "miss")
+        return verdict
+
+    def evaluate_many(self, contents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Full verdicts for several payloads, in input order. Cached verdicts are reused and
+        the remaining distinct payloads are evaluated in one StaticVerifier.evaluate_many().
+        """
+        started = time.perf_counter()
+        verifier, version, rule_version = self._current()
+        if not self.cache.enabled:
+            verdicts = verifier.evaluate_many(contents)
+            for verdict in verdicts:
+                verdict["rule_version"] = rule_version
+            per_trace = (time.perf_counter() - started) / max(len(contents), 1)
+            for _ in contents:
+                VERIFY_SECONDS.observe(per_trace, "off")
+            return verdicts
+        keys = [content_key(c, version) for c in contents]
+        verdicts: List[Optional[Dict[str, Any]]] = []
+        for key in keys:
+            cached = self.cache.get(key)
+            verdicts.append(None if cached is None or cached.get("partial") else cached)
+        # Identical payloads within the batch are evaluated once
+        missing: Dict[str, int] = {}
+        for i, key in enumerate(keys):
+            if verdicts[i] is None:
+                missing.setdefault(key, i)
+        if missing:
+            fresh = verifier.evaluate_many([contents[i] for i in missing.values()])
+            by_key = dict(zip(missing, fresh))
+            for key, verdict in by_key.items():
+                verdict["rule_version"] = rule_version
+                if not any(r.get("timed_out") for r in verdict["reasons"]):
+                    self.cache.put(key, verdict)
+            verdicts = [v if v is not None else by_key[k] for v, k in zip(verdicts, keys)]
+        per_trace = (time.perf_counter() - started) / max(len(contents), 1)
+        for i in range(len(contents)):
+            VERIFY_SECONDS.observe(per_trace, "miss" if keys[i] in missing else "hit")
+        return verdicts  # type: ignore[return-value]
+
     def load_from_db(self, db: OrmSession) -> StaticVerifier:
-        rules = db_rules_to_static(db)
-        if not rules:
-            # Fallback to defaults
-            self._verifier = StaticVerifier(rules=list(DEFAULT_RULES))
-        else:
-            self._verifier = StaticVerifier(rules=rules)
-        return self._verifier
+        with self._reload_lock:
+            # Read the version before the rules: a change committed in between is at worst
+            # loaded again by the next reload, never recorded under an older version
+            rule_version = db_rule_version(db)
+            previous = self._verifier
+            if previous is not None and rule_version < self.rule_version:
+                # A concurrent reload already installed a newer rule set
+                return previous
+            rules = db_rules_to_static(db)
+            if not rules:
+                # Fallback to defaults
+                rules = list(DEFAULT_RULES)
+            if previous is not None and previous.rules == rules:
+                # Nothing changed: keep the verifier and its cached verdicts
+                with self._lock:
+                    self.rule_version = rule_version
+                return previous
+            # Build off to the side, reusing everything unchanged, then swap atomically;
+            # in-flight requests finish on the verifier they already hold
+            verifier = StaticVerifier(rules=rules, previous=previous)
+            self._swap(verifier, rule_version)
+        return verifier
+
+    def load_snapshot(self, path: str) -> StaticVerifier:
+        """Install a precompiled verifier written by `python -m api.snapshot`."""
+        header, verifier = open_snapshot(path)
+        with self._reload_lock:
+            # The rule version the snapshot was built at, so the watcher only reloads
+            # once the rules change after that
+            self._swap(verifier, int(header.get("rule_version", 0)))
+        return verifier
+
+    def _swap(self, verifier: StaticVerifier, rule_version: int) -> None:
+        with self._lock:
+            self._verifier = verifier
+            self.rule_version = rule_version
+            self.version += 1
+        self.cache.clear()
 
 store = VerifierStore()
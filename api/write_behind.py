@@ -0,0 +1,192 @@
+"""
+Optional write-behind for ingested traces (TRACE_WRITE_BEHIND=1). Ingest answers with
+the verdict as soon as it is computed and hands the trace row (and its audit row for
+blocks) to a bounded in-process buffer. A background thread writes the buffer in
+group commits of up to WRITE_BEHIND_BATCH rows, at least every WRITE_BEHIND_FLUSH_MS,
+enqueues the dynamic checks once the rows exist and then completes the reasons of
+rows ingested in decision mode. Rows still buffered when the
+process dies are lost; a clean shutdown flushes them.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import deque
+import atexit
+import threading
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from api import job_queue
+from api.models import AuditLog, Trace as TraceModel
+from api.settings import settings
+
+# (sequence number, trace values, audit values or None)
+Entry = Tuple[int, Dict[str, Any], Optional[Dict[str, Any]]]
+
+
+class WriteBehindBuffer:
+    """Bounded buffer of trace/audit rows written by a background thread in group commits."""
+
+    def __init__(
+        self,
+        batch_size: int = 500,
+        flush_ms: float = 20,
+        max_pending: int = 10000,
+        session_factory: Optional[Callable[[], Any]] = None,
+        complete_reasons: Optional[Callable[[str], None]] = None,
+    ):
+        self.batch_size = max(batch_size, 1)
+        self.flush_ms = flush_ms
+        self.max_pending = max(max_pending, 1)
+        self._session_factory = session_factory
+        self._complete_reasons = complete_reasons
+        self._entries: "deque[Entry]" = deque()
+        self._cond = threading.Condition()
+        # Flushes run one at a time so `flushed` only ever covers rows already written
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._seq = 0
+        self.flushed = 0  # highest sequence number written (or given up on)
+        self.written = 0
+        self.failed = 0
+        self.rejected = 0
+        self.flushes = 0
+
+    def offer(self, trace: Dict[str, Any], audit: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """Buffer one trace row (and its audit row) if there is room, without waiting."""
+        with self._cond:
+            if self._closed or len(self._entries) >= self.max_pending:
+                self._cond.notify_all()  # make sure the flusher is draining
+                return None
+            return self._append(trace, audit)
+
+    def put(
+        self,
+        trace: Dict[str, Any],
+        audit: Optional[Dict[str, Any]] = None,
+        timeout: float = 0,
+    ) -> Optional[int]:
+        """
+        Like offer(), but waits up to `timeout` seconds for room. Returns the entry's
+        sequence number, or None if the buffer is still full (the caller should shed
+        load) or closed.
+        """
+        with self._cond:
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: len(self._entries) < self.max_pending or self._closed, timeout)
+            if self._closed or len(self._entries) >= self.max_pending:
+                self.rejected += 1
+                return None
+            return self._append(trace, audit)
+
+    def _append(self, trace: Dict[str, Any], audit: Optional[Dict[str, Any]]) -> int:
+        # Called with self._cond held
+        self._seq += 1
+        self._entries.append((self._seq, trace, audit))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trace-write-behind", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        if len(self._entries) >= self.batch_size:
+            self._cond.notify_all()
+        return self._seq
+
+    def flush(self) -> None:
+        """Write everything buffered so far from the calling thread."""
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    n = min(self.batch_size, len(self._entries))
+                    batch = [self._entries.popleft() for _ in range(n)]
+                    if batch:
+                        self._cond.notify_all()  # room for waiting producers
+                if not batch:
+                    return
+                written = self._write(batch)
+                with self._cond:
+                    self.flushed = batch[-1][0]
+                    self.flushes += 1
+                    self.written += len(written)
+                    self.failed += len(batch) - len(written)
+                    self._cond.notify_all()
+                job_queue.enqueue_batch("worker.jobs.dynamic_check_trace", [(tid,) for tid in written])
+                partial = {trace["id"] for _seq, trace, _audit in batch if not trace["reasons_complete"]}
+                self._complete([tid for tid in written if tid in partial])
+
+    def close(self) -> None:
+        """Stop accepting rows, write what is buffered and stop the flusher."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=10)
+        self.flush()
+
+    def _session(self) -> Any:
+        if self._session_factory is None:
+            from api.db import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def _complete(self, trace_ids: List[str]) -> None:
+        """Fill in the full reasons of rows written with a decision-only verdict."""
+        if not trace_ids:
+            return
+        if self._complete_reasons is None:
+            from api.endpoints.traces import _complete_reasons_later
+            self._complete_reasons = _complete_reasons_later
+        for tid in trace_ids:
+            self._complete_reasons(tid)
+
+    def _write(self, batch: List[Entry]) -> List[str]:
+        """Group-commit a batch; if it fails, retry row by row and skip the rows that fail."""
+        db = self._session()
+        try:
+            try:
+                self._insert(db, batch)
+                db.commit()
+                return [trace["id"] for _seq, trace, _audit in batch]
+            except SQLAlchemyError:
+                db.rollback()
+            written = []
+            for entry in batch:
+                try:
+                    self._insert(db, [entry])
+                    db.commit()
+                    written.append(entry[1]["id"])
+                except SQLAlchemyError:
+                    # e.g. the session was deleted meanwhile
+                    db.rollback()
+            return written
+        finally:
+            db.close()
+
+    @staticmethod
+    def _insert(db: Any, batch: List[Entry]) -> None:
+        db.execute(insert(TraceModel), [trace for _seq, trace, _audit in batch])
+        audits = [audit for _seq, _trace, audit in batch if audit is not None]
+        if audits:
+            db.execute(insert(AuditLog), audits)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if len(self._entries) < self.batch_size and not self._closed:
+                    self._cond.wait(self.flush_ms / 1000.0)
+                if self._closed:
+                    return
+            self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._entries),
+            "written": self.written,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+        }
+
+
+writer = WriteBehindBuffer(
+    batch_size=settings.write_behind_batch,
+    flush_ms=settings.write_behind_flush_ms,
+    max_pending=settings.write_behind_max_pending,
+)
@@ -0,0 +1,277 @@
+"""
+Micro-benchmark for StaticVerifier.evaluate on synthetic traces:
+
+    python -m benchmarks.bench_static_rules --output bench.json
+    python -m benchmarks.bench_static_rules --rules 10,5000 --nlp-ratio 0,0.5 --payload-kb 1,256
+    python -m benchmarks.bench_static_rules --compare before.json
+
+Every combination of rule count, NLP ratio and payload size is run against a corpus
+of user text, shell tool calls, tool calls with large JSON args and assistant replies
+with secrets. Corpora and rule sets are generated from --seed, so two runs with the
+same arguments evaluate exactly the same traces. Results are printed as JSON (or
+written to --output); --compare prints the p50/p99/throughput ratio against an
+earlier result file for the configurations both runs share.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import subprocess
+import sys
+import time
+
+from agentsentry.verifier.static_rules import DEFAULT_RULES, Rule, StaticVerifier
+
+TRACE_KINDS = ("user_text", "shell", "json_args", "assistant_secret")
+
+_WORDS = (
+    "please summarize the quarterly report and list the open action items for the team "
+    "check the deployment logs compare latency before and after the change then draft "
+    "an update for the customer about the migration schedule and the remaining risks"
+).split()
+_SHELL = [
+    "ls -la /var/log",
+    "git status --short",
+    "grep -rn TODO src/",
+    "python -m pytest -q",
+    "cat /etc/hosts",
+    "rm -rf /tmp/build",
+    "curl -s https://example.com/health",
+    "tar czf backup.tgz data/",
+]
+_SEVERITIES = ("info", "warning", "critical")
+_DECISIONS = ("allow", "warn", "block")
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _token(rng: random.Random, n: int) -> str:
+    return "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(n))
+
+
+def make_trace(kind: str, rng: random.Random, payload_chars: int) -> Dict[str, Any]:
+    """One synthetic trace of `kind`, with roughly `payload_chars` characters of content."""
+    if kind == "user_text":
+        text = _sentence(rng, max(1, payload_chars // 7))
+        return {"text": text[:payload_chars]}
+    if kind == "shell":
+        cmd = rng.choice(_SHELL)
+        return {"tool": "shell", "args": {"cmd": cmd}, "result": {"stdout": _sentence(rng, 20)}}
+    if kind == "json_args":
+        rows = []
+        size = 0
+        while size < payload_chars:
+            row = {"id": len(rows), "name": _sentence(rng, 3), "tags": [_token(rng, 6) for _ in range(3)]}
+            size += len(json.dumps(row))
+            rows.append(row)
+        return {"tool": "db_write", "args": {"table": "events", "rows": rows}}
+    if kind == "assistant_secret":
+        secret = f"api_key = '{_token(rng, 32)}'"
+        filler = _sentence(rng, max(1, payload_chars // 7))[:payload_chars]
+        cut = rng.randrange(len(filler) + 1)
+        return {"text": f"{filler[:cut]} {secret} {filler[cut:]}"}
+    raise ValueError(f"unknown trace kind: {kind}")
+
+
+def make_corpus(size: int, payload_chars: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [make_trace(TRACE_KINDS[i % len(TRACE_KINDS)], rng, payload_chars) for i in range(size)]
+
+
+def make_rules(count: int, nlp_ratio: float, seed: int) -> List[Rule]:
+    """
+    `count` rules: the built-in defaults plus synthetic ones, `nlp_ratio` of them phrase
+    rules. Synthetic regex rules mix plain words, alternations, character classes and
+    tool-scoped patterns so both the literal prefilter and full scans are exercised.
+    """
+    rng = random.Random(seed)
+    rules = list(DEFAULT_RULES[:count])
+    n_nlp = round((count - len(rules)) * nlp_ratio)
+    for i in range(count - len(rules)):
+        severity = rng.choice(_SEVERITIES)
+        decision = rng.choice(_DECISIONS)
+        if i < n_nlp:
+            pattern = f"{_token(rng, 7).lower()} {rng.choice(_WORDS)}"
+            rules.append(Rule(f"bench_nlp_{i}", pattern, severity, decision, rule_type="nlp"))
+            continue
+        shape = i % 4
+        word = _token(rng, 8).lower()
+        if shape == 0:
+            pattern = rf"\b{word}\b"
+        elif shape == 1:
+            pattern = rf"(?i)\b(?:{word}|{_token(rng, 6).lower()})[_-]?id\b"
+        elif shape == 2:
+            pattern = rf"{word[:4]}[0-9]{{3,}}"
+        else:
+            rules.append(
+                Rule(f"bench_regex_{i}", rf"\b{word}\s+-\w+", severity, decision, tool="shell", arg_path="cmd")
+            )
+            continue
+        rules.append(Rule(f"bench_regex_{i}", pattern, severity, decision))
+    return rules
+
+
+def run_case(
+    rule_count: int,
+    nlp_ratio: float,
+    payload_chars: int,
+    corpus_size: int,
+    repeat: int,
+    seed: int,
+    phrase_engine: Optional[str],
+    budget_ms: Optional[float],
+) -> Dict[str, Any]:
+    rules = make_rules(rule_count, nlp_ratio, seed)
+    corpus = make_corpus(corpus_size, payload_chars, seed)
+    started = time.perf_counter()
+    verifier = StaticVerifier(
+        rules=rules,
+        phrase_engine=phrase_engine,
+        rule_timeout_ms=budget_ms,
+        eval_budget_ms=budget_ms,
+    )
+    build_seconds = time.perf_counter() - started
+    for content in corpus[: len(TRACE_KINDS)]:
+        verifier.evaluate(content)  # warm-up: lazy pipelines, first-use caches
+    latencies: List[float] = []
+    by_kind: Dict[str, List[float]] = {k: [] for k in TRACE_KINDS}
+    decisions: Dict[str, int] = {}
+    timeouts = 0
+    wall = time.perf_counter()
+    for _ in range(repeat):
+        for i, content in enumerate(corpus):
+            t0 = time.perf_counter()
+            verdict = verifier.evaluate(content)
+            elapsed = time.perf_counter() - t0
+            latencies.append(elapsed)
+            by_kind[TRACE_KINDS[i % len(TRACE_KINDS)]].append(elapsed)
+            decisions[verdict["decision"]] = decisions.get(verdict["decision"], 0) + 1
+            timeouts += sum(1 for r in verdict["reasons"] if r.get("timed_out"))
+    wall = time.perf_counter() - wall
+    return {
+        "rules": rule_count,
+        "nlp_ratio": nlp_ratio,
+        "payload_chars": payload_chars,
+        "evaluations": len(latencies),
+        "build_ms": round(build_seconds * 1000, 3),
+        "throughput_per_s": round(len(latencies) / wall, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 4),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 4),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 4),
+        "by_kind_p50_ms": {k: round(_percentile(v, 0.50) * 1000, 4) for k, v in by_kind.items() if v},
+        "decisions": decisions,
+        "timeouts": timeouts,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _case_key(case: Dict[str, Any]) -> tuple:
+    return (case["rules"], case["nlp_ratio"], case["payload_chars"])
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Ratios current/baseline per shared configuration (>1 means slower / higher)."""
+    before = {_case_key(c): c for c in baseline["results"]}
+    rows = []
+    for case in current["results"]:
+        old = before.get(_case_key(case))
+        if old is None:
+            continue
+        rows.append({
+            "rules": case["rules"],
+            "nlp_ratio": case["nlp_ratio"],
+            "payload_chars": case["payload_chars"],
+            "p50_ratio": round(case["p50_ms"] / old["p50_ms"], 3) if old["p50_ms"] else None,
+            "p99_ratio": round(case["p99_ms"] / old["p99_ms"], 3) if old["p99_ms"] else None,
+            "throughput_ratio": round(case["throughput_per_s"] / old["throughput_per_s"], 3),
+        })
+    return rows
+
+
+def _floats(value: str) -> List[float]:
+    return [float(v) for v in value.split(",") if v]
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark StaticVerifier.evaluate on synthetic traces.")
+    parser.add_argument("--rules", type=_ints, default=[10, 100, 1000, 5000], help="rule counts, comma-separated")
+    parser.add_argument("--nlp-ratio", type=_floats, default=[0.0, 0.2], help="share of phrase rules, comma-separated")
+    parser.add_argument("--payload-kb", type=_floats, default=[1, 64], help="payload sizes in KB, comma-separated")
+    parser.add_argument("--corpus", type=int, default=200, help="traces per configuration")
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the corpus")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--phrase-engine", choices=["spacy", "aho"], default=None,
+                        help="defaults to PHRASE_ENGINE")
+    parser.add_argument("--budget-ms", type=float, default=0,
+                        help="regex rule timeout and eval budget (0 disables, so latencies are not capped)")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args(argv)
+
+    results = []
+    for rule_count in args.rules:
+        for nlp_ratio in args.nlp_ratio:
+            for kb in args.payload_kb:
+                case = run_case(
+                    rule_count, nlp_ratio, int(kb * 1024), args.corpus, args.repeat,
+                    args.seed, args.phrase_engine, args.budget_ms,
+                )
+                results.append(case)
+                print(
+                    f"rules={rule_count} nlp={nlp_ratio} payload={kb}KB "
+                    f"p50={case['p50_ms']}ms p99={case['p99_ms']}ms {case['throughput_per_s']}/s",
+                    file=sys.stderr,
+                )
+    report: Dict[str, Any] = {
+        "benchmark": "static_rules.evaluate",
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "phrase_engine": args.phrase_engine or os.getenv("PHRASE_ENGINE", "spacy"),
+            "seed": args.seed,
+            "corpus": args.corpus,
+            "repeat": args.repeat,
+            "budget_ms": args.budget_ms,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["compare"] = {"baseline": args.compare, "rows": compare(json.load(f), report)}
+    out = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(out + "\n")
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
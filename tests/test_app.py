@@ -11,6 +11,12 @@ try:
 except Exception:
     _SPACY_OK = False
 
+try:
+    import regex  # type: ignore
+    _REGEX_OK = True
+except Exception:
+    _REGEX_OK = False
+
 # Ensure repo root on sys.path
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
@@ -156,3 +162,724 @@ def test_nlp_rule_blocks_plain_text_when_enabled():
     assert data["decision"] in {"warn", "block"}
     # Ensure reasons include our rule
     assert any((rule["name"] == rsn.get("rule")) for rsn in data.get("reasons", []))
+
+
+def test_verdict_cache_hits_and_reload_invalidates():
+    c = get_client()
+    from api.verifier_store import store
+    r = c.post("/sessions")
+    sid = r.json()["id"]
+    payload = {"session_id": sid, "role": "tool", "content": {"tool": "shell", "args": {"cmd": "rm -rf /tmp/x"}}}
+
+    before = c.get("/rules/cache").json()
+    first = c.post("/traces", json=payload).json()
+    second = c.post("/traces", json=payload).json()
+    after = c.get("/rules/cache").json()
+    assert first["decision"] == second["decision"]
+    assert first["reasons"] == second["reasons"]
+    assert after["hits"] >= before["hits"] + 1
+    assert after["size"] >= 1
+
+    from api.settings import settings as live_settings
+    live_settings.api_key = "secret"
+    headers = {"Authorization": "Bearer secret"}
+    c.post("/rules/reload", headers=headers)
+    c.post("/traces", json=payload)
+    # Reloading an unchanged rule set keeps the cache
+    version = store.version
+    r = c.post("/rules/reload", headers=headers)
+    assert r.status_code == 200
+    assert store.version == version
+    assert c.get("/rules/cache").json()["size"] >= 1
+
+    import uuid
+    rule = {"name": f"cache_rule_{uuid.uuid4().hex[:8]}", "pattern": "cachetest", "severity": "info", "decision": "warn"}
+    assert c.post("/rules", json=rule, headers=headers).status_code == 200
+    r = c.post("/rules/reload", headers=headers)
+    assert r.status_code == 200
+    assert store.version == version + 1
+    assert c.get("/rules/cache").json()["size"] == 0
+
+
+def test_rule_scope_roundtrips_through_api_and_yaml():
+    c = get_client()
+    from api.settings import settings as live_settings
+    live_settings.api_key = "secret"
+    headers = {"Authorization": "Bearer secret"}
+    import uuid
+    name = f"scoped_rule_{uuid.uuid4().hex[:8]}"
+    rule = {
+        "name": name,
+        "pattern": r"\bcurl\b",
+        "severity": "warning",
+        "decision": "warn",
+        "tool": "shell",
+        "arg_path": "cmd",
+    }
+    r = c.post("/rules", json=rule, headers=headers)
+    assert r.status_code == 200, r.text
+    out = r.json()
+    assert out["tool"] == "shell" and out["arg_path"] == "cmd"
+
+    r = c.put(f"/rules/{out['id']}", json={"arg_path": ""}, headers=headers)
+    assert r.status_code == 200
+    assert r.json()["arg_path"] is None and r.json()["tool"] == "shell"
+
+    import yaml
+    exported = yaml.safe_load(c.get("/rules/export").json()["yaml"])
+    item = next(it for it in exported["rules"] if it["name"] == name)
+    assert item["tool"] == "shell" and "arg_path" not in item
+    assert "view" not in item
+
+
+def test_normalized_view_rule_catches_encoded_payloads():
+    c = get_client()
+    from api.settings import settings as live_settings
+    live_settings.api_key = "secret"
+    headers = {"Authorization": "Bearer secret"}
+    import uuid
+    tag = uuid.uuid4().hex[:8]
+    rule = {
+        "name": f"norm_rule_{tag}",
+        "pattern": rf"\bpurge {tag}\b",
+        "severity": "critical",
+        "decision": "block",
+        "view": "normalized",
+    }
+    r = c.post("/rules", json=rule, headers=headers)
+    assert r.status_code == 200, r.text
+    assert r.json()["view"] == "normalized"
+    assert c.post("/rules", json={**rule, "name": f"bad_{tag}", "view": "decoded"}, headers=headers).status_code == 422
+    assert c.post("/rules/reload", headers=headers).status_code == 200
+
+    sid = c.post("/sessions").json()["id"]
+    r = c.post("/traces", json={"session_id": sid, "content": {"text": f"please purge%20%20{tag} now"}})
+    assert r.json()["decision"] == "block"
+
+    import yaml
+    exported = yaml.safe_load(c.get("/rules/export").json()["yaml"])
+    assert next(it for it in exported["rules"] if it["name"] == rule["name"])["view"] == "normalized"
+
+
+@pytest.mark.skipif(not _REGEX_OK, reason="regex package not installed")
+def test_rule_create_rejects_catastrophic_regex():
+    c = get_client()
+    from api.settings import settings as live_settings
+    live_settings.api_key = "secret"
+    import uuid
+    rule = {
+        "name": f"slow_rule_{uuid.uuid4().hex[:8]}",
+        "pattern": r"^(a|aa)+$",
+        "severity": "warning",
+        "decision": "warn",
+    }
+    r = c.post("/rules", json=rule, headers={"Authorization": "Bearer secret"})
+    assert r.status_code == 422
+    assert "too slow" in r.text
+
+
+def test_metrics_endpoint_exposes_rule_and_latency_metrics():
+    c = get_client()
+    sid = c.post("/sessions").json()["id"]
+    payload = {"session_id": sid, "role": "tool", "content": {"tool": "shell", "args": {"cmd": "rm -rf /srv"}}}
+    assert c.post("/traces", json=payload).status_code == 200
+
+    r = c.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    body = r.text
+    assert 'agentsentry_request_seconds_bucket{route="/traces",method="POST",status="200",le="+Inf"}' in body
+    assert 'agentsentry_rule_evaluations_total{rule=' in body
+    assert 'agentsentry_engine_seconds_total{engine="regex"}' in body
+    assert "agentsentry_verdict_cache_hits_total" in body
+
+
+def test_trace_stream_blocks_early_and_persists_full_text():
+    c = get_client()
+    from api.settings import settings as live_settings
+    live_settings.api_key = "secret"
+    headers = {"Authorization": "Bearer secret"}
+    import uuid
+    rule = {
+        "name": f"stream_rule_{uuid.uuid4().hex[:8]}",
+        "pattern": r"\bwipe\s+--all\b",
+        "severity": "critical",
+        "decision": "block",
+    }
+    assert c.post("/rules", json=rule, headers=headers).status_code == 200
+    assert c.post("/rules/reload", headers=headers).status_code == 200
+
+    sid = c.post("/sessions").json()["id"]
+    r = c.post("/traces/stream", json={"session_id": sid, "role": "assistant"})
+    assert r.status_code == 200
+    stream_id = r.json()["stream_id"]
+
+    chunks = ["Sure, I will clean up. Running wi", "pe --a", "ll on the build dir."]
+    decisions = [c.post(f"/traces/stream/{stream_id}", json={"text": ch}).json()["decision"] for ch in chunks]
+    assert decisions == ["allow", "allow", "block"]
+
+    r = c.post(f"/traces/stream/{stream_id}/close")
+    assert r.status_code == 200
+    data = r.json()
+    assert data["decision"] == "block"
+    assert data["payload"]["text"] == "".join(chunks)
+    assert c.get(f"/traces/{data['id']}").json()["decision"] == "block"
+
+    # Closed streams are gone
+    assert c.post(f"/traces/stream/{stream_id}", json={"text": "more"}).status_code == 404
+    assert c.post("/traces/stream", json={"session_id": "missing"}).status_code == 404
+
+
+def test_decision_mode_ingest_completes_reasons_later():
+    c = get_client()
+    from api.settings import settings as live_settings
+    live_settings.api_key = "secret"
+    headers = {"Authorization": "Bearer secret"}
+    import uuid
+    tag = uuid.uuid4().hex[:8]
+    for name, pattern, decision in (("dm_block", r"\bnuke_" + tag, "block"), ("dm_warn", r"\bwarnme_" + tag, "warn")):
+        rule = {"name": f"{name}_{tag}", "pattern": pattern, "severity": "warning", "decision": decision}
+        assert c.post("/rules", json=rule, headers=headers).status_code == 200
+    assert c.post("/rules/reload", headers=headers).status_code == 200
+
+    sid = c.post("/sessions").json()["id"]
+    content = {"text": f"warnme_{tag} then nuke_{tag}"}
+    r = c.post("/traces", json={"session_id": sid, "role": "assistant", "content": content, "mode": "decision"})
+    assert r.status_code == 200
+    data = r.json()
+    assert data["decision"] == "block"
+    assert [x["rule"] for x in data["reasons"]] == [f"dm_block_{tag}"]
+    assert data["reasons_complete"] is False
+
+    trace = c.get(f"/traces/{data['id']}").json()
+    assert {f"dm_block_{tag}", f"dm_warn_{tag}"} <= {x["rule"] for x in trace["reasons"]}
+    listed = next(t for t in c.get(f"/sessions/{sid}/traces").json() if t["id"] == data["id"])
+    assert listed["reasons_complete"] is True
+
+    bad = c.post("/traces", json={"session_id": sid, "content": content, "mode": "fast"})
+    assert bad.status_code == 422
+
+
+def test_rule_preview_counts_decision_changes():
+    c = get_client()
+    from api.settings import settings as live_settings
+    live_settings.api_key = "secret"
+    headers = {"Authorization": "Bearer secret"}
+    import uuid
+    tag = uuid.uuid4().hex[:8]
+    sid = c.post("/sessions").json()["id"]
+    ids = []
+    for text in (f"deploy_{tag} now", f"deploy_{tag} later", "nothing to see"):
+        r = c.post("/traces", json={"session_id": sid, "role": "assistant", "content": {"text": text}})
+        ids.append(r.json()["id"])
+
+    proposal = {
+        "add": [{"name": f"pv_{tag}", "pattern": rf"\bdeploy_{tag}\b", "severity": "critical", "decision": "block"}],
+        "session_id": sid,
+    }
+    r = c.post("/rules/preview", json=proposal)
+    assert r.status_code == 401
+    for workers in (0, 1):
+        live_settings.rule_preview_workers = workers
+        r = c.post("/rules/preview", json=proposal, headers=headers)
+        assert r.status_code == 200
+        data = r.json()
+        assert data["evaluated"] == 3 and data["complete"] is True
+        assert data["after"]["block"] - data["before"]["block"] == 2
+        assert set(data["changed"]["allow->block"]["examples"]) == set(ids[:2])
+        assert data["rules_after"] == data["rules_before"] + 1
+    r = c.post("/rules/preview", json=dict(proposal, budget_ms=0), headers=headers)
+    assert r.json()["complete"] is False
+    live_settings.rule_preview_workers = 2
+
+    # Nothing was saved
+    assert not any(x["name"] == f"pv_{tag}" for x in c.get("/rules").json())
+    bad = dict(proposal, add=[dict(proposal["add"][0], pattern="(a+)+$")])
+    assert c.post("/rules/preview", json=bad, headers=headers).status_code == 422
+
+
+def test_trace_batch_ingest_across_sessions():
+    c = get_client()
+    from api.settings import settings as live_settings
+    live_settings.api_key = "secret"
+    headers = {"Authorization": "Bearer secret"}
+    import uuid
+    tag = uuid.uuid4().hex[:8]
+    rule = {"name": f"batch_{tag}", "pattern": rf"\bpurge_{tag}\b", "severity": "critical", "decision": "block"}
+    assert c.post("/rules", json=rule, headers=headers).status_code == 200
+    assert c.post("/rules/reload", headers=headers).status_code == 200
+    s1 = c.post("/sessions").json()["id"]
+    s2 = c.post("/sessions").json()["id"]
+    batch = [
+        {"session_id": s1, "role": "tool", "content": {"tool": "shell", "args": {"cmd": f"purge_{tag} /"}}},
+        {"session_id": s2, "role": "user", "content": {"text": "hello"}},
+        {"session_id": s1, "role": "tool", "content": {"tool": "shell", "args": {"cmd": f"purge_{tag} /"}}},
+    ]
+    r = c.post("/traces/batch", json={"traces": batch})
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert [x["decision"] for x in results] == ["block", "allow", "block"]
+    assert len({x["id"] for x in results}) == 3
+
+    listed = c.get(f"/sessions/{s1}/traces").json()
+    assert {t["id"] for t in listed} == {results[0]["id"], results[2]["id"]}
+    assert c.get(f"/traces/{results[1]['id']}").json()["role"] == "user"
+    logs = c.get("/audit/logs", params={"action": "trace_block", "limit": 200}).json()
+    assert results[0]["id"] in {x["target_id"] for x in logs}
+
+    # One unknown session rejects the whole batch
+    bad = batch + [{"session_id": "nope", "content": {"text": "x"}}]
+    assert c.post("/traces/batch", json={"traces": bad}).status_code == 404
+    assert len(c.get(f"/sessions/{s2}/traces").json()) == 1
+
+
+def test_async_ingest_handles_concurrent_requests():
+    import asyncio
+    import httpx
+    from api.main import app
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            sid = (await ac.post("/sessions")).json()["id"]
+            posts = [
+                ac.post("/traces", json={"session_id": sid, "role": "user", "content": {"text": f"msg {i}"}})
+                for i in range(20)
+            ]
+            responses = await asyncio.gather(*posts)
+            assert all(r.status_code == 200 for r in responses)
+            listed = (await ac.get(f"/sessions/{sid}/traces", params={"limit": 50})).json()
+            assert {t["id"] for t in listed} == {r.json()["id"] for r in responses}
+            one = (await ac.get(f"/traces/{responses[0].json()['id']}")).json()
+            assert one["session_id"] == sid and one["content"] == {"text": "msg 0"}
+            assert (await ac.post("/traces", json={"session_id": "missing", "content": {}})).status_code == 404
+
+    asyncio.run(run())
+
+
+def test_job_queue_batches_enqueues_and_breaks_while_redis_is_down(monkeypatch):
+    import redis
+    from api import job_queue
+
+    calls = []
+
+    class Down:
+        def enqueue_many(self, jobs):
+            calls.append(len(jobs))
+            raise redis.ConnectionError("down")
+
+    class Up:
+        def enqueue_many(self, jobs):
+            calls.append([j.args for j in jobs])
+
+    monkeypatch.setattr(job_queue, "breaker", job_queue.CircuitBreaker(failures=2, reset_after=60))
+    monkeypatch.setattr(job_queue, "get_queue", lambda: Down())
+    b = job_queue.EnqueueBatcher(batch_size=10, flush_ms=10_000)
+    for i in range(35):
+        assert b.submit("worker.jobs.dynamic_check_trace", str(i))
+    b.close()
+    # Two failed round trips open the breaker; the other batches skip Redis entirely
+    assert calls == [10, 10]
+    assert b.stats()["skipped"] == 35 and b.stats()["breaker_open"] is True
+
+    calls.clear()
+    monkeypatch.setattr(job_queue, "breaker", job_queue.CircuitBreaker(failures=2, reset_after=60))
+    monkeypatch.setattr(job_queue, "get_queue", lambda: Up())
+    b = job_queue.EnqueueBatcher(batch_size=100, flush_ms=10_000, max_pending=3)
+    results = [b.submit("worker.jobs.dynamic_check_trace", str(i)) for i in range(4)]
+    assert results == [True, True, True, False]
+    b.close()
+    assert calls == [[("0",), ("1",), ("2",)]]
+    assert b.stats()["enqueued"] == 3 and b.stats()["dropped"] == 1
+
+
+def test_batch_ingest_hands_off_checks_at_once_and_inline_enqueues_leave_the_loop(monkeypatch):
+    import asyncio
+    from api import job_queue
+
+    calls = []
+
+    class Up:
+        def enqueue_many(self, jobs):
+            try:
+                asyncio.get_running_loop()
+                on_loop = True
+            except RuntimeError:
+                on_loop = False
+            calls.append((len(jobs), on_loop))
+
+    monkeypatch.setattr(job_queue, "breaker", job_queue.CircuitBreaker())
+    monkeypatch.setattr(job_queue, "get_queue", lambda: Up())
+    b = job_queue.EnqueueBatcher(batch_size=100, flush_ms=10_000, max_pending=5)
+    assert b.submit_many("worker.jobs.dynamic_check_trace", [(str(i),) for i in range(7)]) == 5
+    b.close()
+    assert calls == [(5, False)] and b.stats()["dropped"] == 2
+
+    calls.clear()
+    monkeypatch.setattr(job_queue, "batcher", job_queue.EnqueueBatcher(flush_ms=0))
+    c = get_client()
+    sid = c.post("/sessions").json()["id"]
+    batch = [{"session_id": sid, "content": {"text": f"hi {i}"}} for i in range(4)]
+    assert c.post("/traces/batch", json={"traces": batch}).status_code == 200
+    # Inline: the whole batch in one round trip
+    assert calls == [(4, False)]
+    calls.clear()
+    assert c.post("/traces", json={"session_id": sid, "content": {"text": "one"}}).status_code == 200
+    assert calls == [(1, False)]
+
+
+def test_known_session_cache_skips_lookup_and_invalidates_on_delete(monkeypatch):
+    from api import session_cache
+    from api.job_queue import CircuitBreaker
+    from api.session_cache import known_sessions
+
+    published = []
+
+    class FakeRedis:
+        def publish(self, channel, message):
+            published.append((channel, message))
+
+    monkeypatch.setattr(session_cache, "get_redis", lambda: FakeRedis())
+    monkeypatch.setattr(session_cache, "breaker", CircuitBreaker())
+    c = get_client()
+    sid = c.post("/sessions").json()["id"]
+    hits = known_sessions.stats()["hits"]
+    for i in range(3):
+        r = c.post("/traces", json={"session_id": sid, "role": "user", "content": {"text": f"hi {i}"}})
+        assert r.status_code == 200
+    assert known_sessions.stats()["hits"] >= hits + 3
+
+    assert c.delete(f"/sessions/{sid}").status_code == 200
+    assert sid not in known_sessions
+    assert published == [(session_cache.CHANNEL, sid)]
+    r = c.post("/traces", json={"session_id": sid, "role": "user", "content": {"text": "late"}})
+    assert r.status_code == 404
+    assert c.post("/traces", json={"session_id": "never-existed", "content": {}}).status_code == 404
+
+
+def test_session_deleted_by_another_process_while_cached_is_not_found():
+    from api.db import SessionLocal
+    from api.models import Session as SessionModel, Trace as TraceModel
+    from api.session_cache import known_sessions
+    c = get_client()
+    sids = [c.post("/sessions").json()["id"] for _ in range(2)]
+    for sid in sids:
+        r = c.post("/traces", json={"session_id": sid, "role": "user", "content": {"text": "hi"}})
+        assert r.status_code == 200
+        assert sid in known_sessions
+
+    # Deleted behind this process's back: no broadcast reaches its cache
+    db = SessionLocal()
+    for sid in sids:
+        db.delete(db.get(SessionModel, sid))
+    db.commit()
+    assert all(sid in known_sessions for sid in sids)
+
+    r = c.post("/traces", json={"session_id": sids[0], "role": "user", "content": {"text": "late"}})
+    assert r.status_code == 404
+    assert sids[0] not in known_sessions
+    r = c.post("/traces/batch", json={"traces": [{"session_id": sids[1], "content": {"text": "late"}}]})
+    assert r.status_code == 404
+    assert db.query(TraceModel).filter(TraceModel.session_id.in_(sids)).count() == 0
+    db.close()
+
+
+def test_write_behind_ingest_group_commits_and_sheds_load(monkeypatch):
+    c = get_client()
+    from api.settings import settings as live_settings
+    from api.endpoints import traces as traces_module
+    from api.write_behind import WriteBehindBuffer
+
+    sid = c.post("/sessions").json()["id"]
+    buffer = WriteBehindBuffer(batch_size=100, flush_ms=60_000, max_pending=3)
+    monkeypatch.setattr(traces_module, "writer", buffer)
+    monkeypatch.setattr(live_settings, "trace_write_behind", True)
+    monkeypatch.setattr(live_settings, "write_behind_wait_ms", 0)
+
+    # Stall the flusher so the buffer stays full
+    buffer._flush_lock.acquire()
+    ids = []
+    for i in range(3):
+        r = c.post("/traces", json={"session_id": sid, "role": "user", "content": {"text": f"wb {i}"}})
+        assert r.status_code == 200 and r.json()["decision"] == "allow"
+        ids.append(r.json()["id"])
+    # Answered, but not written yet
+    assert c.get(f"/sessions/{sid}/traces").json() == []
+    r = c.post("/traces", json={"session_id": sid, "role": "user", "content": {"text": "wb 3"}})
+    assert r.status_code == 503 and r.headers["retry-after"] == "1"
+
+    buffer._flush_lock.release()
+    buffer.close()
+    listed = c.get(f"/sessions/{sid}/traces").json()
+    assert {t["id"] for t in listed} == set(ids)
+    assert buffer.stats() == {"pending": 0, "written": 3, "failed": 0, "rejected": 1, "flushes": 1}
+    assert c.get(f"/traces/{ids[0]}").json()["content"] == {"text": "wb 0"}
+
+
+def test_write_behind_flusher_completes_decision_only_reasons(monkeypatch):
+    c = get_client()
+    from api.settings import settings as live_settings
+    live_settings.api_key = "secret"
+    headers = {"Authorization": "Bearer secret"}
+    import uuid
+    from api.db import SessionLocal
+    from api.endpoints import traces as traces_module
+    from api.models import Trace as TraceModel
+    from api.write_behind import WriteBehindBuffer
+    tag = uuid.uuid4().hex[:8]
+    for name, pattern, decision in (("wbd_block", r"\bnuke_" + tag, "block"), ("wbd_warn", r"\bwarnme_" + tag, "warn")):
+        rule = {"name": f"{name}_{tag}", "pattern": pattern, "severity": "warning", "decision": decision}
+        assert c.post("/rules", json=rule, headers=headers).status_code == 200
+
+    sid = c.post("/sessions").json()["id"]
+    buffer = WriteBehindBuffer(batch_size=100, flush_ms=60_000)
+    monkeypatch.setattr(traces_module, "writer", buffer)
+    monkeypatch.setattr(live_settings, "trace_write_behind", True)
+    content = {"text": f"warnme_{tag} then nuke_{tag}"}
+    r = c.post("/traces", json={"session_id": sid, "role": "assistant", "content": content, "mode": "decision"})
+    assert r.status_code == 200 and r.json()["reasons_complete"] is False
+
+    buffer.close()
+    db = SessionLocal()
+    row = db.get(TraceModel, r.json()["id"])
+    assert row.reasons_complete is True
+    assert {f"wbd_block_{tag}", f"wbd_warn_{tag}"} <= {x["rule"] for x in row.reasons}
+    db.close()
+
+
+def test_verify_is_stateless():
+    c = get_client()
+    from api.settings import settings as live_settings
+    live_settings.api_key = "secret"
+    headers = {"Authorization": "Bearer secret"}
+    import uuid
+    tag = uuid.uuid4().hex[:8]
+    rule = {"name": f"verify_{tag}", "pattern": rf"\bshred_{tag}\b", "severity": "critical", "decision": "block"}
+    assert c.post("/rules", json=rule, headers=headers).status_code == 200
+    assert c.post("/rules/reload", headers=headers).status_code == 200
+    audit_before = len(c.get("/audit/logs", params={"action": "trace_block", "limit": 200}).json())
+
+    content = {"tool": "shell", "args": {"cmd": f"shred_{tag} disk"}}
+    r = c.post("/verify", json={"content": content, "mode": "decision"})
+    assert r.status_code == 200
+    data = r.json()
+    assert data["decision"] == "block"
+    assert data["reasons"][0]["rule"] == f"verify_{tag}"
+    assert c.post("/verify", json={"content": content, "mode": "fast"}).status_code == 422
+
+    r = c.post("/verify/batch", json={"contents": [{"text": "fine"}, content]})
+    assert [x["decision"] for x in r.json()["results"]] == ["allow", "block"]
+    assert all(x["reasons_complete"] for x in r.json()["results"])
+    # Nothing was recorded
+    assert len(c.get("/audit/logs", params={"action": "trace_block", "limit": 200}).json()) == audit_before
+
+def test_assistant_stream_never_hands_out_a_match_held_at_the_chunk_edge():
+    c = get_client()
+    from api.settings import settings as live_settings
+    live_settings.api_key = "secret"
+    headers = {"Authorization": "Bearer secret"}
+    import uuid
+    from agentsentry.sdk import AgentSentryClient
+    from agentsentry.tracer import AssistantStream
+    rule = {
+        "name": f"edge_rule_{uuid.uuid4().hex[:8]}",
+        "pattern": r"\bshred\s+-u\b",
+        "severity": "critical",
+        "decision": "block",
+    }
+    assert c.post("/rules", json=rule, headers=headers).status_code == 200
+
+    client = AgentSentryClient(base_url="http://testserver", api_key="secret")
+    c.headers.update(client._session.headers)
+    client._session = c
+    client.create_session()
+    # The first chunk ends on a complete match that only the next chunk confirms
+    chunks = ["Cleaning up: shred -u", " secrets.txt", " and done."]
+    stream = AssistantStream(client, iter(chunks), min_chars=1)
+    assert list(stream) == []
+    assert stream.blocked and stream.trace["decision"] == "block"
+
+    chunks = ["Cleaning up: shred -u", "nknown.txt", " and done."]
+    stream = AssistantStream(client, iter(chunks), min_chars=1)
+    assert list(stream) == chunks
+    assert not stream.blocked
+
+def test_lean_ingest_omits_payload():
+    c = get_client()
+    sid = c.post("/sessions").json()["id"]
+    content = {"tool": "kv_store.write", "args": {"value": "x" * 4096}}
+    full = c.post("/traces", json={"session_id": sid, "role": "tool", "content": content})
+    assert full.status_code == 200
+    assert full.json()["payload"] == content
+
+    lean = c.post("/traces", params={"lean": "true"}, json={"session_id": sid, "role": "tool", "content": content})
+    assert lean.status_code == 200
+    data = lean.json()
+    assert "payload" not in data
+    assert data["decision"] == full.json()["decision"]
+    assert set(data) == {"id", "decision", "reasons", "reasons_complete"}
+    assert len(lean.content) < len(full.content) - 4096
+    # The stored trace still has the full content
+    assert c.get(f"/traces/{data['id']}").json()["content"] == content
+
+def test_values_orjson_rejects_fall_back_to_json():
+    c = get_client()
+    sid = c.post("/sessions").json()["id"]
+    content = {"tool": "calc", "args": {"n": 2 ** 70}}
+    r = c.post("/traces", json={"session_id": sid, "role": "tool", "content": content})
+    assert r.status_code == 200
+    assert r.json()["payload"] == content
+    assert c.get(f"/traces/{r.json()['id']}").json()["content"] == content
+
+    from agentsentry.sdk import _dumps
+    import json
+    assert json.loads(_dumps({"n": 2 ** 70})) == {"n": 2 ** 70}
+    assert json.loads(_dumps({1: "a", "b": {2: 3}})) == {"1": "a", "b": {"2": 3}}
+
+def test_rule_version_is_bumped_recorded_and_picked_up_by_other_processes():
+    c = get_client()
+    from api.settings import settings as live_settings
+    live_settings.api_key = "secret"
+    headers = {"Authorization": "Bearer secret"}
+    import uuid
+    from api.db import SessionLocal
+    from api.models import Rule as RuleModel
+    from api.rule_version import bump, watcher
+    from api.verifier_store import store
+    tag = uuid.uuid4().hex[:8]
+
+    # A rule write bumps the version and reloads this process without /rules/reload
+    before = store.rule_version
+    rule = {"name": f"version_{tag}", "pattern": rf"\bzap_{tag}\b", "severity": "critical", "decision": "block"}
+    assert c.post("/rules", json=rule, headers=headers).status_code == 200
+    assert store.rule_version == before + 1
+    sid = c.post("/sessions").json()["id"]
+    r = c.post("/traces", json={"session_id": sid, "role": "tool", "content": {"text": f"zap_{tag} now"}})
+    assert r.json()["decision"] == "block"
+    assert c.get(f"/traces/{r.json()['id']}").json()["rule_version"] == store.rule_version
+    assert c.post("/verify", json={"content": {"text": "fine"}}).json()["rule_version"] == store.rule_version
+
+    # Another process changes the rules: the watcher reloads once, only when the version moved
+    db = SessionLocal()
+    try:
+        db.add(RuleModel(name=f"elsewhere_{tag}", pattern=rf"\bzip_{tag}\b", severity="critical", decision="block"))
+        bump(db)
+        db.commit()
+    finally:
+        db.close()
+    assert store.evaluate({"text": f"zip_{tag}"})["decision"] == "allow"
+    assert watcher.sync() is True
+    assert store.rule_version == before + 2
+    assert store.evaluate({"text": f"zip_{tag}"})["decision"] == "block"
+    assert watcher.sync() is False
+
+def test_rule_listing_and_export_support_conditional_get():
+    c = get_client()
+    from api.settings import settings as live_settings
+    live_settings.api_key = "secret"
+    headers = {"Authorization": "Bearer secret"}
+    import uuid
+    tag = uuid.uuid4().hex[:8]
+
+    for path in ("/rules", "/rules/export"):
+        r = c.get(path)
+        assert r.status_code == 200
+        etag = r.headers["etag"]
+        assert c.get(path).content == r.content
+        unchanged = c.get(path, headers={"If-None-Match": f'W/{etag}, "other"'})
+        assert unchanged.status_code == 304
+        assert unchanged.content == b""
+        assert unchanged.headers["etag"] == etag
+
+    # Any rule write moves the version: new ETag and a freshly built body
+    etag = c.get("/rules").headers["etag"]
+    export_etag = c.get("/rules/export").headers["etag"]
+    rule = {"name": f"etag_{tag}", "pattern": rf"\bfoo_{tag}\b", "severity": "warning", "decision": "warn"}
+    assert c.post("/rules", json=rule, headers=headers).status_code == 200
+    r = c.get("/rules", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+    assert any(x["name"] == f"etag_{tag}" for x in r.json())
+    r = c.get("/rules/export", headers={"If-None-Match": export_etag})
+    assert r.status_code == 200
+    assert f"etag_{tag}" in r.json()["yaml"]
+
+def test_snapshot_started_store_keeps_the_db_rule_version(tmp_path, monkeypatch):
+    get_client()
+    from api import rule_version
+    from api.db import SessionLocal
+    from api.rule_loader import db_rule_version
+    from api.snapshot import build_snapshot
+    from api.verifier_store import VerifierStore
+
+    db = SessionLocal()
+    try:
+        rule_version.bump(db)
+        db.commit()
+        version = db_rule_version(db)
+    finally:
+        db.close()
+    path = str(tmp_path / "rules.snap")
+    assert build_snapshot(path)["rule_version"] == version
+
+    fresh = VerifierStore()
+    fresh.load_snapshot(path)
+    assert fresh.rule_version == version
+
+    # A process started from the snapshot does not rebuild from the DB
+    def no_reload(db):
+        raise AssertionError("reloaded from the DB")
+    monkeypatch.setattr(fresh, "load_from_db", no_reload)
+    monkeypatch.setattr(rule_version, "store", fresh)
+    assert rule_version.watcher.sync() is False
+    assert fresh.evaluate({"text": "hello"})["rule_version"] == version
+
+def test_reload_without_changes_keeps_the_rule_version():
+    c = get_client()
+    from api.settings import settings as live_settings
+    live_settings.api_key = "secret"
+    headers = {"Authorization": "Bearer secret"}
+    import uuid
+    from api.db import SessionLocal
+    from api.models import Rule as RuleModel
+
+    version = c.post("/rules/reload", headers=headers).json()["rule_version"]
+    etag = c.get("/rules").headers["etag"]
+    assert c.post("/rules/reload", headers=headers).json()["rule_version"] == version
+    assert c.get("/rules", headers={"If-None-Match": etag}).status_code == 304
+
+    # A rule added behind the API's back does move it
+    db = SessionLocal()
+    try:
+        db.add(RuleModel(name=f"direct_{uuid.uuid4().hex[:8]}", pattern="direct", severity="info", decision="warn"))
+        db.commit()
+    finally:
+        db.close()
+    assert c.post("/rules/reload", headers=headers).json()["rule_version"] == version + 1
+    assert c.get("/rules", headers={"If-None-Match": etag}).status_code == 200
+
+def test_enforcer_flush_raises_background_recording_errors():
+    from agentsentry.enforcer import Enforcer
+
+    class Client:
+        def verify(self, content, mode=None):
+            return {"decision": "allow", "reasons": []}
+
+    class FailingTracer:
+        client = Client()
+
+        def tool(self, name, args, result=None, error=None):
+            raise RuntimeError("ingest down")
+
+    e = Enforcer(FailingTracer())
+    # The guarded call itself does not wait on (or fail with) the recording
+    assert e.guard_and_call("kv_store.read", {"key": "a"}, call_fn=lambda: 1) == 1
+    assert e.guard_and_call("kv_store.read", {"key": "b"}, call_fn=lambda: 2) == 2
+    with pytest.raises(RuntimeError, match="ingest down"):
+        e.flush()
+    # Reported once
+    e.flush()
+
+    inline = Enforcer(FailingTracer(), record_in_background=False)
+    with pytest.raises(RuntimeError, match="ingest down"):
+        inline.guard_and_call("kv_store.read", {"key": "a"}, call_fn=lambda: 1)
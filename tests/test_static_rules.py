@@ -0,0 +1,472 @@
+import re
+import sys
+from pathlib import Path
+import pytest
+
+try:
+    import spacy  # type: ignore
+    _SPACY_OK = True
+except Exception:
+    _SPACY_OK = False
+
+try:
+    import regex  # type: ignore
+    _REGEX_OK = True
+except Exception:
+    _REGEX_OK = False
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from agentsentry.verifier.static_rules import StaticVerifier, Rule, DEFAULT_RULES
+from agentsentry.verifier.regex_engine import extract_literals, slow_input
+from agentsentry.verifier.payload import PayloadWalker
+from agentsentry.verifier.snapshot import (
+    SnapshotError, dump_snapshot, load_snapshot, read_header, ruleset_digest,
+)
+
+
+def _rule(name, pattern, decision="warn", **kw):
+    return Rule(name=name, pattern=pattern, severity="warning", decision=decision, **kw)
+
+
+def test_extract_literals():
+    assert extract_literals(r"\brm\s+-rf\b|\brmdir\s+/s\s+/q\b") is not None
+    secrets = extract_literals(r"(?i)(api[_-]?key|secret|token)")
+    assert secrets is not None and {"secret", "token"} <= secrets and len(secrets) == 3
+    assert extract_literals(r"ABC+def") == frozenset({"def"})
+    # Optional parts and single characters give no usable prefilter
+    assert extract_literals(r"(abc)?\d+") is None
+    assert extract_literals(r"a|bc") is None
+
+
+@pytest.mark.skipif(not _REGEX_OK, reason="regex package not installed")
+def test_no_prefilter_for_syntax_only_the_regex_package_reads():
+    # `re` would take "]xyz" and "secret{e<=1}" as literals and filter out real matches
+    assert extract_literals(r"[[:alpha:]]xyz") is None
+    assert extract_literals(r"(?:secret){e<=1}") is None
+    assert extract_literals(r"\p{Lu}xyz") is None
+    assert extract_literals(r"\${jndi:") == frozenset({"${jndi:"})
+    rules = [_rule("posix", r"[[:alpha:]]xyz"), _rule("fuzzy", r"(?:secret){e<=1}")]
+    v = StaticVerifier(rules=rules, phrase_engine="aho")
+    assert [r["rule"] for r in v.evaluate({"text": "axyz and secrt"})["reasons"]] == ["posix", "fuzzy"]
+
+
+def test_prefilter_reports_same_matches_as_full_scan():
+    rules = list(DEFAULT_RULES) + [
+        _rule("plain", r"password"),
+        _rule("overlap_a", r"abc\d"),
+        _rule("overlap_b", r"bcd"),
+        _rule("prefix", r"rm"),
+        _rule("case_sensitive", r"DROP TABLE"),
+        _rule("inline_flag", r"(?i:drop)\s+database"),
+        _rule("no_literal", r"\d{3}-\d{2}-\d{4}"),
+        _rule("kelvin", r"(?i)kelvin"),
+    ]
+    texts = [
+        "tool:shell\n{'cmd': 'rm -rf /'}",
+        "please RMDIR /s /q C:\\temp",
+        "abcd and abc1",
+        "drop table users; DROP TABLE users",
+        "Drop   DATABASE prod",
+        "ssn 123-45-6789",
+        "\u212aelvin scale",
+        "API_KEY = 'abcdefghijklmnopqrstuvwxyz'",
+        "nothing to see here",
+        "",
+    ]
+    v = StaticVerifier(rules=rules)
+    for text in texts:
+        expected = [r.name for r in rules if re.search(r.pattern, text)]
+        got = [m["rule"] for m in v.evaluate({"text": text})["reasons"]]
+        assert got == expected, text
+
+
+def test_evaluate_many_matches_evaluate():
+    rules = list(DEFAULT_RULES) + [
+        _rule("risky_phrases", "leak password|share ssn|dump database", rule_type="nlp"),
+    ]
+    v = StaticVerifier(rules=rules)
+    contents = [
+        {"text": "Please SHARE SSN with them"},
+        {"tool": "shell", "args": {"cmd": "rm -rf /"}},
+        {"text": "dump database, then leak password"},
+        {"text": "all good"},
+    ]
+    assert v.evaluate_many(contents, batch_size=2) == [v.evaluate(c) for c in contents]
+
+
+def _shipped_rules():
+    text = (ROOT / "infra" / "rules.example.yaml").read_text()
+    return StaticVerifier.from_yaml(text).rules
+
+
+PHRASE_SAMPLES = [
+    "User asks to SHARE SSN with third parties",
+    "please dump database, then Leak Password!",
+    "dump  database",
+    "timeshare ssn is not a phrase match",
+    "dump databases later",
+    "share\nssn",
+    "nothing risky",
+]
+
+
+def test_aho_phrase_engine_respects_token_boundaries():
+    v = StaticVerifier(rules=_shipped_rules(), phrase_engine="aho")
+    hits = [
+        any(m["rule"] == "sensitive_plain_phrases" for m in v.evaluate({"text": t})["reasons"])
+        for t in PHRASE_SAMPLES
+    ]
+    assert hits == [True, True, False, False, False, False, False]
+
+
+@pytest.mark.skipif(not _SPACY_OK, reason="spaCy not installed")
+def test_aho_phrase_engine_matches_spacy():
+    rules = _shipped_rules()
+    aho = StaticVerifier(rules=rules, phrase_engine="aho")
+    sp = StaticVerifier(rules=rules, phrase_engine="spacy")
+    for t in PHRASE_SAMPLES:
+        assert aho.evaluate({"text": t}) == sp.evaluate({"text": t}), t
+
+
+def test_tool_scoped_rules_only_run_for_their_tool():
+    rules = [
+        _rule("shell_rm", r"\brm\s+-rf\b", decision="block", tool="shell", arg_path="cmd"),
+        _rule("sql_drop", r"(?i)drop\s+table", decision="block", tool="sql"),
+        _rule("global_secret", r"secret"),
+    ]
+    v = StaticVerifier(rules=rules)
+    shell = v.evaluate({"tool": "shell", "args": {"cmd": "rm -rf /", "note": "secret"}})
+    assert [m["rule"] for m in shell["reasons"]] == ["shell_rm", "global_secret"]
+    assert shell["decision"] == "block"
+    # Same text under another tool, or outside the scoped field, does not trigger
+    assert v.evaluate({"tool": "python", "args": {"cmd": "rm -rf /"}})["decision"] == "allow"
+    assert v.evaluate({"tool": "shell", "args": {"note": "rm -rf /"}})["decision"] == "allow"
+    assert v.evaluate({"text": "drop table users"})["decision"] == "allow"
+    nested = StaticVerifier(rules=[_rule("path", r"/etc/", tool="fs", arg_path="files.1.path")])
+    hit = nested.evaluate({"tool": "fs", "args": {"files": [{"path": "/tmp"}, {"path": "/etc/passwd"}]}})
+    assert [m["rule"] for m in hit["reasons"]] == ["path"]
+
+
+def test_rebuild_from_previous_reuses_unchanged_rules():
+    rules = [_rule(f"r{i}", rf"\bword{i}\b", tool="shell" if i % 2 else None) for i in range(200)]
+    rules.append(_rule("phrases", "share ssn|dump database", rule_type="nlp"))
+    old = StaticVerifier(rules=rules, phrase_engine="aho")
+
+    changed = list(rules)
+    changed[3] = _rule("r3", r"\bchanged\b", tool="shell")
+    new = StaticVerifier(rules=changed, previous=old, phrase_engine="aho")
+
+    old_compiled = {r.name: c for r, c in old._compiled_regex}
+    new_compiled = {r.name: c for r, c in new._compiled_regex}
+    assert new_compiled["r0"] is old_compiled["r0"]
+    assert new_compiled["r3"] is not old_compiled["r3"]
+    # The global scope did not change, so its prefilter and automaton are shared
+    old_global, new_global = old._by_tool[None][0], new._by_tool[None][0]
+    assert new_global.regex_set is old_global.regex_set
+    assert new_global.automaton is old_global.automaton
+    assert new._by_tool["shell"][0].regex_set is not old._by_tool["shell"][0].regex_set
+
+    for content in [{"tool": "shell", "args": {"cmd": "changed word3 word5"}}, {"text": "word0, share ssn"}]:
+        assert new.evaluate(content) == StaticVerifier(rules=changed, phrase_engine="aho").evaluate(content)
+
+
+@pytest.mark.skipif(not _REGEX_OK, reason="regex package not installed")
+def test_regex_timeout_is_reported_instead_of_hanging():
+    rules = [_rule("evil", r"^(a|aa)+$", decision="block"), _rule("plain", r"aaa")]
+    v = StaticVerifier(rules=rules, rule_timeout_ms=20, eval_budget_ms=1000)
+    verdict = v.evaluate({"text": "a" * 60 + "!"})
+    # The block rule could not finish, so it fails closed
+    assert verdict["decision"] == "block"
+    evil, plain = verdict["reasons"]
+    assert evil["rule"] == "evil" and evil["timed_out"] is True and evil["decision"] == "block"
+    assert plain["rule"] == "plain" and "timed_out" not in plain
+
+    v = StaticVerifier(rules=rules, rule_timeout_ms=20, eval_budget_ms=1000, fail_closed=False)
+    assert v.evaluate({"text": "a" * 60 + "!"})["decision"] == "warn"
+
+
+@pytest.mark.skipif(not _REGEX_OK, reason="regex package not installed")
+def test_block_rule_starved_by_the_budget_only_warns():
+    # The slow rule ranks first (higher severity) and uses up the whole budget, so the
+    # other block rule is never run: that says nothing about the input, so no block
+    rules = [
+        Rule(name="evil", pattern=r"^(a|aa)+$", severity="critical", decision="block"),
+        Rule(name="late_block", pattern=r"aaa", severity="info", decision="block"),
+    ]
+    for mode in ("full", "decision"):
+        v = StaticVerifier(rules=rules, rule_timeout_ms=0, eval_budget_ms=20)
+        verdict = v.evaluate({"text": "a" * 60 + "!"}, mode)
+        late = next(r for r in verdict["reasons"] if r["rule"] == "late_block")
+        assert late["timed_out"] is True and late["decision"] == "warn", mode
+        assert verdict["decision"] == "warn", mode
+
+
+@pytest.mark.skipif(not _REGEX_OK, reason="regex package not installed")
+def test_slow_input_flags_catastrophic_patterns():
+    assert slow_input(r"^(a|aa)+$", timeout=0.05) is not None
+    assert slow_input(r"\brm\s+-rf\b", timeout=0.05) is None
+
+
+def test_stats_count_evaluations_and_matches():
+    v = StaticVerifier(rules=[_rule("pw", r"password"), _rule("digits", r"\d{4}")])
+    v.evaluate({"text": "password 1234"})
+    v.evaluate({"text": "nothing"})
+    rules = {r["rule"]: r for r in v.stats()["rules"]}
+    # "pw" is skipped by the literal prefilter on the second trace
+    assert rules["pw"]["evaluations"] == 1 and rules["pw"]["matches"] == 1
+    assert rules["digits"]["evaluations"] == 2 and rules["digits"]["matches"] == 1
+    assert v.stats()["engines"]["regex"]["evaluations"] == 2
+    # Counters survive an incremental rebuild
+    rebuilt = StaticVerifier(rules=[_rule("pw", r"password")], previous=v)
+    assert rebuilt.stats()["rules"][0]["evaluations"] == 1
+
+
+def test_snapshot_roundtrip(tmp_path):
+    rules = _shipped_rules() + [_rule("scoped", r"\bcurl\b", tool="shell", arg_path="cmd")]
+    v = StaticVerifier(rules=rules, phrase_engine="aho")
+    path = str(tmp_path / "rules.snap")
+    header = dump_snapshot(v, path)
+    assert read_header(path) == header
+    assert header["digest"] == ruleset_digest(rules)
+
+    loaded = load_snapshot(path)
+    assert loaded.rules == rules
+    samples = PHRASE_SAMPLES + ["rm -rf /", "api_key='abcdefghijklmnopqrst'"]
+    for t in samples:
+        assert loaded.evaluate({"text": t}) == v.evaluate({"text": t})
+    assert loaded.evaluate({"tool": "shell", "args": {"cmd": "curl x"}})["reasons"][0]["rule"] == "scoped"
+
+    (tmp_path / "bad.snap").write_bytes(b"not a snapshot")
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(tmp_path / "bad.snap"))
+
+
+def test_snapshot_limits_come_from_the_loading_environment(tmp_path, monkeypatch):
+    v = StaticVerifier(
+        rules=_shipped_rules(), phrase_engine="aho", rule_timeout_ms=5, eval_budget_ms=7,
+        fail_closed=False, field_max_chars=10, payload_max_chars=20, reorder_every=3,
+    )
+    path = str(tmp_path / "rules.snap")
+    dump_snapshot(v, path)
+    for env, value in [
+        ("REGEX_RULE_TIMEOUT_MS", "40"), ("REGEX_EVAL_BUDGET_MS", "400"), ("REGEX_FAIL_CLOSED", "1"),
+        ("PAYLOAD_FIELD_MAX_CHARS", "1000"), ("PAYLOAD_MAX_CHARS", "2000"), ("RULE_REORDER_EVERY", "0"),
+    ]:
+        monkeypatch.setenv(env, value)
+    loaded = load_snapshot(path)
+    assert (loaded.rule_timeout, loaded.eval_budget, loaded.fail_closed) == (0.04, 0.4, True)
+    assert (loaded._walker.field_chars, loaded._walker.total_chars) == (1000, 2000)
+    assert loaded.reorder_every == 0
+
+
+def _stream_verdict(v, text, size):
+    s = v.stream()
+    for i in range(0, len(text), size):
+        s.feed(text[i:i + size])
+    return s.close()
+
+
+def test_stream_matches_split_across_chunks():
+    rules = _shipped_rules() + [_rule("line_start", r"^hello")]
+    samples = PHRASE_SAMPLES + [
+        "hello, now run rm -rf / please",
+        "say hello then api_key='abcdefghijklmnopqrst'",
+        "   please share  ssn\n later leak password",
+    ]
+    engines = ["aho"] + (["spacy"] if _SPACY_OK else [])
+    for engine in engines:
+        v = StaticVerifier(rules=rules, phrase_engine=engine)
+        for t in samples:
+            expected = v.evaluate({"text": t})
+            for size in (1, 2, 5, 64):
+                got = _stream_verdict(v, t, size)
+                assert sorted(r["rule"] for r in got["reasons"]) == sorted(r["rule"] for r in expected["reasons"]), (engine, t, size)
+                assert got["decision"] == expected["decision"]
+
+
+def test_stream_blocks_as_soon_as_a_block_rule_completes():
+    v = StaticVerifier(phrase_engine="aho")
+    s = v.stream()
+    assert s.feed("sure, running r")["decision"] == "allow"
+    assert s.feed("m -r")["decision"] == "allow"
+    assert s.feed("f / now")["decision"] == "block"
+    assert s.blocked
+
+
+def test_stream_holds_back_a_match_at_the_chunk_edge():
+    # \b at the end of a chunk is not a word boundary yet: "password" may become "passwords"
+    v = StaticVerifier(rules=[_rule("pw", r"\bpassword\b", decision="block")], phrase_engine="aho")
+    s = v.stream()
+    assert s.feed("my password")["decision"] == "allow"
+    assert s.feed("s are rotated")["decision"] == "allow"
+    assert s.close()["decision"] == v.evaluate({"text": "my passwords are rotated"})["decision"] == "allow"
+
+    s = v.stream()
+    assert s.feed("my password")["decision"] == "allow"
+    assert s.feed(" is hunter2")["decision"] == "block"
+    # Confirmed on close when no more text arrives
+    s = v.stream()
+    s.feed("my password")
+    assert s.close()["decision"] == "block"
+
+    for t in ("my passwords are rotated", "my password is x", "password"):
+        for size in (1, 3, 8):
+            assert _stream_verdict(v, t, size)["decision"] == v.evaluate({"text": t})["decision"], (t, size)
+
+
+def test_payload_walker_segments_nested_values_within_caps():
+    walker = PayloadWalker(field_chars=100, total_chars=200)
+    segments = walker.trace_segments({
+        "text": "hi",
+        "tool": "fs",
+        "args": {"files": [{"path": "/etc/hosts"}], "n": 3},
+        "result": {"stdout": "ok"},
+    })
+    assert segments == ["hi", "tool:fs", "args.files.0.path: /etc/hosts", "args.n: 3", "result.stdout: ok"]
+    assert not segments.truncated
+
+    segments = walker.trace_segments({"args": {"a": "x" * 500, "b": "y" * 500, "c": "z" * 500}})
+    assert segments.truncated
+    assert segments[:2] == ["args.a: " + "x" * 100, "args.b: " + "y" * 100]
+    assert not any("z" in s for s in segments)
+
+
+def test_large_payloads_are_scanned_in_bounded_segments():
+    v = StaticVerifier(rules=_shipped_rules(), phrase_engine="aho", field_max_chars=50_000, payload_max_chars=200_000)
+    padding = "lorem ipsum " * 2000
+    content = {
+        "tool": "fs.write",
+        "args": {"path": "/srv/out.txt", "content": padding + "then rm -rf / and more" + padding},
+        "result": {"stdout": "please leak password"},
+    }
+    reasons = {r["rule"] for r in v.evaluate(content)["reasons"]}
+    assert {"no_shell_rm_rf", "sensitive_plain_phrases"} <= reasons
+    assert "payload_truncated" not in reasons
+
+    content["args"]["content"] = "a" * 60_000 + " rm -rf /"
+    verdict = v.evaluate(content)
+    assert "no_shell_rm_rf" not in {r["rule"] for r in verdict["reasons"]}
+    truncated = [r for r in verdict["reasons"] if r["rule"] == "payload_truncated"]
+    # Padding past the cap cannot turn a payload into a silent allow
+    assert truncated and truncated[0]["decision"] == "warn"
+    assert verdict["decision"] == "warn"
+
+
+def test_long_fields_anchor_and_match_as_one_segment():
+    rules = [_rule("only_digits", r"^\d+$"), _rule("framed", r"BEGIN[a-z]{400}END")]
+    v = StaticVerifier(rules=rules, phrase_engine="aho")
+    # No anchor inside a long field
+    assert v.evaluate({"text": "1" * 20_000 + "x"})["decision"] == "allow"
+    assert v.evaluate({"text": "1" * 20_000})["decision"] == "warn"
+    # A match longer than any window overlap, straddling where a window would end
+    verdict = v.evaluate({"text": "q" * 8000 + "BEGIN" + "a" * 400 + "END"})
+    assert [r["rule"] for r in verdict["reasons"]] == ["framed"]
+
+
+def test_wide_payloads_pack_small_fields_under_default_budgets():
+    rules = [_rule(f"kw{i}", rf"\btoken_{i}\s*=\s*\w+") for i in range(40)] + [
+        _rule("ssn", r"\b\d{3}-\d{2}-\d{4}\b"),
+        _rule("card", r"\b(?:\d[ -]?){13,16}\b", decision="block"),
+        _rule("name_only", r"^args\.name: \w+$"),
+        _rule("across_fields", r"Paris\s+rows"),
+    ]
+    v = StaticVerifier(rules=rules, phrase_engine="aho")
+    rows = [{"id": i, "name": f"user{i}", "email": f"u{i}@ex.com", "city": "Paris"} for i in range(2000)]
+    content = {"tool": "db_write", "args": {"rows": rows}}
+    verdict = v.evaluate(content)
+    # No rule runs out of budget and nothing matches across the joins between fields
+    assert verdict == {"decision": "allow", "reasons": []}
+    stats = {s["rule"]: s for s in v.stats()["rules"]}
+    # Context-free rules search a few packed chunks, not 8000 fields
+    assert stats["ssn"]["evaluations"] < 100
+
+    rows[1500]["email"] = "123-45-6789"
+    rows[700]["name"] = "args.name: x"
+    reasons = [r["rule"] for r in v.evaluate(content)["reasons"]]
+    assert reasons == ["ssn"]
+    content["args"]["name"] = "x"
+    assert "name_only" in [r["rule"] for r in v.evaluate(content)["reasons"]]
+
+
+def test_decision_mode_settles_the_same_decision():
+    rules = _shipped_rules() + [_rule("late_block", r"\bshutdown\s+-h\b", decision="block")]
+    v = StaticVerifier(rules=rules, phrase_engine="aho")
+    samples = PHRASE_SAMPLES + [
+        "rm -rf / && api_key='abcdefghijklmnopqrst' and shutdown -h now",
+        "api_key='abcdefghijklmnopqrst' written to /etc/hosts",
+        "please leak password, then shutdown -h now",
+    ]
+    for t in samples:
+        full = v.evaluate({"text": t})
+        quick = v.evaluate({"text": t}, mode="decision")
+        assert quick["decision"] == full["decision"], t
+        assert len(quick["reasons"]) <= 1
+        assert {r["rule"] for r in quick["reasons"]} <= {r["rule"] for r in full["reasons"]}
+        assert quick.get("partial", False) == (full["decision"] != "allow")
+    # Block rules run before warn rules, in rule order
+    quick = v.evaluate({"text": samples[-3]}, mode="decision")
+    assert [r["rule"] for r in quick["reasons"]] == ["no_shell_rm_rf"]
+    with pytest.raises(ValueError):
+        v.evaluate({"text": "x"}, mode="fast")
+
+
+def test_reorder_ranks_cheap_matching_rules_first_without_changing_reasons():
+    rules = [
+        Rule("never", r"(?:\w+\s+){2,6}[0-9]{5}z", "critical", "block"),
+        Rule("info_warn", r"\bhello\b", "info", "warn"),
+        Rule("often", r"\bdrop\s+table\b", "critical", "block"),
+        Rule("crit_warn", r"\bthere\b", "critical", "warn"),
+    ]
+    v = StaticVerifier(rules=rules, phrase_engine="aho", reorder_every=0)
+    content = {"text": "hello there, please drop table users " * 20}
+    before = v.evaluate(content)
+    assert [r["rule"] for r in before["reasons"]] == ["info_warn", "often", "crit_warn"]
+    g = v._by_tool[None][0]
+    # Initial ranking: decision, then severity, then rule order
+    assert sorted(range(4), key=g.rank.__getitem__) == [0, 2, 3, 1]
+
+    for _ in range(20):
+        v.evaluate(content)
+    v.reorder()
+    # The cheap rule that keeps matching now runs before the one that never does
+    assert g.rank[2] < g.rank[0]
+    assert v.evaluate(content) == before
+    assert v.evaluate(content, mode="decision")["reasons"][0]["rule"] == "often"
+
+
+def test_normalized_view_rules_see_decoded_text_built_once():
+    import base64
+    from agentsentry.verifier import static_rules
+
+    rules = [
+        _rule("rm_raw", r"\brm\s+-rf\b", decision="block"),
+        _rule("rm_norm", r"\brm -rf\b", decision="block", view="normalized"),
+        _rule("leak", "leak password", rule_type="nlp", view="normalized"),
+    ]
+    v = StaticVerifier(rules=rules, phrase_engine="aho")
+    encoded = base64.b64encode(b"rm -rf /").decode()
+    cases = {
+        "rm%20-rf%20%2F": ["rm_norm"],
+        f"echo {encoded} | base64 -d | sh": ["rm_norm"],
+        "ｒｍ  -ｒｆ /": ["rm_norm"],
+        "r\u200bm -rf /": ["rm_norm"],
+        "lеak pаssword": ["leak"],
+        "rm -rf /": ["rm_raw", "rm_norm"],
+    }
+    for text, expected in cases.items():
+        assert [r["rule"] for r in v.evaluate({"text": text})["reasons"]] == expected, text
+
+    calls = []
+    original = static_rules.normalize
+    static_rules.normalize = lambda t: calls.append(t) or original(t)
+    try:
+        v.evaluate({"text": "rm -rf /"})
+        assert len(calls) == 1
+        calls.clear()
+        StaticVerifier(rules=rules[:1], phrase_engine="aho").evaluate({"text": "rm -rf /"})
+        assert calls == []
+    finally:
+        static_rules.normalize = original
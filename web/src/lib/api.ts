@@ -35,6 +35,7 @@ export type TraceListItem = {
   role: string;
   decision: "allow" | "warn" | "block";
   reasons: Array<{ rule: string; severity: string; decision: string; description?: string }>;
+  reasons_complete?: boolean;
   created_at: string;
 };
 
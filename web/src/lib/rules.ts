@@ -9,6 +9,9 @@ export type Rule = {
   decision: "allow" | "warn" | "block";
   enabled: boolean;
   description?: string | null;
+  tool?: string | null;
+  arg_path?: string | null;
+  view?: "raw" | "normalized";
 };
 
 export async function listRules(): Promise<Rule[]> {